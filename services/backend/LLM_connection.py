@@ -1,8 +1,24 @@
 from google import genai
+import asyncio
 import os
+import threading
+import time
+from collections import namedtuple
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 from pinecone import Pinecone
 from dotenv import load_dotenv
 import pandas as pd
+from backend.response_cache import SemanticResponseCache
+from backend.query_embedder import QueryEmbedder
+from backend.prompt_builder import PromptBuilder
+from backend.gazetteer import Gazetteer
+from backend.geo_index import GeoIndex
+from backend.query_filters import STAR_RATINGS, filter_conditions, matches_filter, relaxed_filters
+from backend.bm25_index import BM25Index, reciprocal_rank_fusion
+from backend.metrics import MetricsRegistry
+from backend.local_index import LocalIndex
 
 # Load environment variables from .env file
 load_dotenv(dotenv_path=os.path.join(os.path.dirname(__file__), '.env'))
@@ -11,26 +27,271 @@ load_dotenv(dotenv_path=os.path.join(os.path.dirname(__file__), '.env'))
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
 PINECONE_API_KEY = os.getenv("PINECONE_API_KEY")
 
-# Initialize the Gemini client using the GEMINI_API_KEY
-client = genai.Client(api_key=GEMINI_API_KEY)
+# The Gemini client and the Pinecone index are created on first use (see get_client and get_index) or
+# at startup, so importing this module neither needs the API keys nor reaches the network
+client = None
+index = None
+# Pinecone looks up the host of the index when the handle is created, which pool threads may do at once
+index_lock = threading.Lock()
+# Assume that the index "hotels-gemini" is already created and populated.
+PINECONE_INDEX_NAME = os.getenv("PINECONE_INDEX_NAME", "hotels-gemini")
+# Host of the index (see the Pinecone console); if set, the lookup of the host is skipped
+PINECONE_INDEX_HOST = os.getenv("PINECONE_INDEX_HOST")
+# "local" queries the vectors the data service stored locally (StorageType.LOCAL) instead of Pinecone
+STORAGE_TYPE = os.getenv("STORAGE_TYPE", "pinecone").lower()
+# Directory of the local vector indexes (LOCAL_INDEX_PATH of the data service) and their dimension
+LOCAL_INDEX_PATH = os.getenv("LOCAL_INDEX_PATH", os.path.join(os.path.dirname(__file__), "indexes"))
+LOCAL_INDEX_DIMENSION = int(os.getenv("LOCAL_INDEX_DIMENSION", "768"))
+
+# Maximum number of seconds each stage of a recommendation may take
+EMBEDDING_TIMEOUT = float(os.getenv("EMBEDDING_TIMEOUT", "10"))
+VECTOR_QUERY_TIMEOUT = float(os.getenv("VECTOR_QUERY_TIMEOUT", "10"))
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "60"))
+
+# Metadata fields of the hotels in the index (see Hotel.to_dict in the data service)
+HOTEL_METADATA_FIELDS = ["country_code", "country_name", "city_code", "city_name", "hotel_code", "hotel_name", "hotel_rating", "address",
+                         "attractions", "description", "fax_number", "hotel_facilities", "map_coordinates", "phone_number", "pin_code", "hotel_website_url"]
+
+# Number of hotels retrieved by an unfiltered query and by a query filtered on the metadata of the
+# prompt (all of whose matches fulfil the constraints of the prompt)
+VECTOR_QUERY_TOP_K = int(os.getenv("VECTOR_QUERY_TOP_K", "100"))
+FILTERED_VECTOR_QUERY_TOP_K = int(os.getenv("FILTERED_VECTOR_QUERY_TOP_K", "30"))
+
+# Numeric metadata the data service derives at ingestion time, which the hotels are sorted by:
+# metadata category chosen by Gemini -> (numeric column, ascending)
+SORT_COLUMNS = {
+    "distance_km": ("distance_km", True),
+    "hotel_rating": ("star_rating", False),
+    "attractions": ("nearest_attraction_km", True),
+    "map_coordinates": ("nearest_attraction_km", True),
+}
+# Number of relaxed metadata filters a recommendation tries at most (the last one without a filter);
+# all of its vector queries together must finish within VECTOR_QUERY_TIMEOUT
+MAX_VECTOR_QUERIES = int(os.getenv("MAX_VECTOR_QUERIES", "3"))
+
+# The Pinecone index client is synchronous; its queries run in this pool instead of the event loop
+pinecone_executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv("VECTOR_QUERY_THREADS", "32")), thread_name_prefix="pinecone")
+
+# Directory of the search artifacts built by the data service, which load_indexes loads
+INDEX_DIR = os.getenv("INDEX_DIR", os.path.join(os.path.dirname(__file__), "indexes"))
+# Gazetteer of the city and country names of the dataset; without it Gemini extracts the locations
+GAZETTEER_PATH = os.path.join(INDEX_DIR, "gazetteer.json")
+gazetteer = None
+# Grid index of the hotel positions and attractions, which answers "near X" prompts
+GEO_INDEX_PATH = os.path.join(INDEX_DIR, "geo_index.npz")
+geo_index = None
+# Inverted index of the hotel texts; its BM25 hits are fused with the vector query results
+BM25_INDEX_PATH = os.path.join(INDEX_DIR, "bm25_index.npz")
+bm25_index = None
+BM25_TOP_K = int(os.getenv("BM25_TOP_K", "50"))
+# Constant of the reciprocal rank fusion, larger values weigh lower ranks more
+RRF_K = int(os.getenv("RRF_K", "60"))
+# Hotels "near X" are searched within this radius, widened until it holds GEO_MIN_HOTELS hotels
+GEO_RADIUS_KM = float(os.getenv("GEO_RADIUS_KM", "3"))
+GEO_MIN_HOTELS = int(os.getenv("GEO_MIN_HOTELS", "10"))
+
+# Answers to repeated and near-duplicate prompts are served from this cache
+response_cache = SemanticResponseCache(
+    max_entries=int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "1000")),
+    ttl_seconds=float(os.getenv("RESPONSE_CACHE_TTL", "3600")),
+    similarity_threshold=float(os.getenv("RESPONSE_CACHE_SIMILARITY", "0.95")))
+# Seconds between two checks of the index version, which invalidate the cache when it changes
+INDEX_VERSION_REFRESH = float(os.getenv("INDEX_VERSION_REFRESH", "60"))
+index_version_state = {"version": None, "checked": None}
+
+# Result of prepare_recommendation: either a cached answer or the prompt for the final generation,
+# with the constraints (the metadata filter of the prompt) its answer is cached under
+Preparation = namedtuple(
+    "Preparation", ["answer", "prompt", "vector", "index_version", "prompt_stats", "constraints"])
+
+# The recommendation prompt is kept within this many (estimated) tokens
+prompt_builder = PromptBuilder(
+    token_budget=int(os.getenv("PROMPT_TOKEN_BUDGET", "2500")),
+    description_chars=int(os.getenv("PROMPT_DESCRIPTION_CHARS", "400")))
+
+# Latency histograms and counters of the pipeline, served by /metrics
+metrics = MetricsRegistry()
+stage_latency = metrics.histogram(
+    "hotel_recommendation_stage_seconds", "Duration of the stages of a recommendation.", ["stage"])
+gemini_latency = metrics.histogram(
+    "gemini_request_seconds", "Duration of the Gemini requests by purpose.", ["call"])
+gemini_errors = metrics.counter(
+    "gemini_request_errors_total", "Gemini requests that failed or timed out by purpose.", ["call"])
+
+# Progress of the startup (see load_indexes and warm_up), reported by the readiness endpoint
+startup_state = {"indexes_loaded": False, "clients_ready": False, "warmed_up": False, "timings": {}, "errors": {}}
+# Synthetic prompt the warm-up sends through the pipeline
+WARM_UP_PROMPT = os.getenv("WARM_UP_PROMPT", "Four star hotel with a pool near the beach in Barcelona")
+# Whether the warm-up also embeds the synthetic prompt and queries Pinecone (one request each)
+WARM_UP_REMOTE = os.getenv("WARM_UP_REMOTE", "true").lower() == "true"
+# Seconds before the warm-up tries again to create the clients, doubled after every failure up to the maximum
+WARM_UP_RETRY_SECONDS = float(os.getenv("WARM_UP_RETRY_SECONDS", "5"))
+WARM_UP_MAX_RETRY_SECONDS = float(os.getenv("WARM_UP_MAX_RETRY_SECONDS", "300"))
+
+
+def get_client():
+    """
+    Return the Gemini client, created on first use.
+    """
+    global client
+    if client is None:
+        client = genai.Client(api_key=GEMINI_API_KEY)
+    return client
 
-# Initialize Pinecone using the new Pinecone class
-pc = Pinecone(PINECONE_API_KEY)
-# Assume that the index "hotels-index" is already created and populated.
-index = pc.Index("hotels-gemini")
+
+def get_index():
+    """
+    Return the handle of the Pinecone index, created on first use. Unless PINECONE_INDEX_HOST is set,
+    creating it looks up the host of the index, so it should happen in a pool thread.
+    If STORAGE_TYPE is "local", the local index with the same query surface is returned instead.
+    """
+    global index
+    if index is None:
+        with index_lock:
+            if index is None and STORAGE_TYPE == "local":
+                index = LocalIndex(LOCAL_INDEX_PATH, PINECONE_INDEX_NAME, LOCAL_INDEX_DIMENSION)
+            elif index is None:
+                index = Pinecone(PINECONE_API_KEY).Index(PINECONE_INDEX_NAME, host=PINECONE_INDEX_HOST or "")
+    return index
 
 
-def query_gemini(content):
+def call_index(method, *args, **kwargs):
     """
-    Query Gemini with the provided content.
+    Call a method of the Pinecone index (e.g. in pinecone_executor).
     """
-    response = client.models.generate_content(
-        model="gemini-2.0-flash",
-        contents=content,
-    )
+    return getattr(get_index(), method)(*args, **kwargs)
+
+
+def load_indexes():
+    """
+    Load the search artifacts of INDEX_DIR that exist, each of them is optional.
+    Called once at startup (or by the first request), later calls do nothing.
+    """
+    global gazetteer, geo_index, bm25_index
+    if startup_state["indexes_loaded"]:
+        return
+    start = time.perf_counter()
+    if os.path.exists(GAZETTEER_PATH):
+        gazetteer = Gazetteer.load(GAZETTEER_PATH)
+    if os.path.exists(GEO_INDEX_PATH):
+        geo_index = GeoIndex.load(GEO_INDEX_PATH)
+    if os.path.exists(BM25_INDEX_PATH):
+        bm25_index = BM25Index.load(BM25_INDEX_PATH)
+    startup_state["timings"]["indexes"] = round((time.perf_counter() - start) * 1000, 1)
+    startup_state["indexes_loaded"] = True
+    print(f"Loaded indexes: gazetteer={gazetteer is not None}, geo={geo_index is not None}, "
+          f"bm25={bm25_index is not None}")
+
+
+class StageTimeoutError(Exception):
+    """
+    Raised when a stage of the recommendation pipeline exceeds its timeout.
+    """
+
+    def __init__(self, stage, timeout):
+        super().__init__(f"{stage} timed out after {timeout} s")
+        self.stage = stage
+        self.timeout = timeout
+
+
+async def run_stage(stage, awaitable, timeout):
+    """
+    Await a stage of the recommendation pipeline, cancelling it after timeout seconds.
+    """
+    try:
+        return await asyncio.wait_for(awaitable, timeout)
+    except asyncio.TimeoutError:
+        raise StageTimeoutError(stage, timeout) from None
+
+
+@contextmanager
+def span(timings, stage):
+    """
+    Record the duration of the with block in milliseconds in the timings dictionary (if given).
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        if timings is not None:
+            timings[stage] = round((time.perf_counter() - start) * 1000, 1)
+
+
+async def timed(timings, stage, awaitable):
+    """
+    Await a stage and record its duration in milliseconds in the timings dictionary (if given).
+    """
+    with span(timings, stage):
+        return await awaitable
+
+
+def observe_timings(timings):
+    """
+    Add the stage durations of a request (see timed) to the stage latency histogram.
+    """
+    for stage, milliseconds in timings.items():
+        stage_latency.observe(milliseconds / 1000, stage=stage)
+
+
+@contextmanager
+def gemini_call(call):
+    """
+    Record the duration of a Gemini request in the latency histogram and count it if it fails.
+    """
+    with gemini_latency.time(call=call):
+        try:
+            yield
+        except Exception:
+            gemini_errors.inc(call=call)
+            raise
+
+
+async def gather_stages(*awaitables):
+    """
+    Run independent stages concurrently and return their results. If one stage fails, the others are cancelled.
+    """
+    tasks = [asyncio.ensure_future(awaitable) for awaitable in awaitables]
+    try:
+        return await asyncio.gather(*tasks)
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        raise
+
+
+async def query_gemini(content, call="generation"):
+    """
+    Query Gemini with the provided content. The call names the purpose of the request in the metrics.
+    """
+    with gemini_call(call):
+        response = await run_stage("Gemini", get_client().aio.models.generate_content(
+            model="gemini-2.0-flash",
+            contents=content,
+        ), LLM_TIMEOUT)
     return response.text
 
 
+async def stream_gemini(content):
+    """
+    Query Gemini with the provided content and yield the text of the response as it is generated.
+    LLM_TIMEOUT applies to the start of the response and to every pause between two chunks.
+    """
+    with gemini_call("generation_stream"):
+        stream = await run_stage("Gemini", get_client().aio.models.generate_content_stream(
+            model="gemini-2.0-flash",
+            contents=content,
+        ), LLM_TIMEOUT)
+        chunks = stream.__aiter__()
+        while True:
+            try:
+                chunk = await run_stage("Gemini", chunks.__anext__(), LLM_TIMEOUT)
+            except StopAsyncIteration:
+                return
+            if chunk.text:
+                yield chunk.text
+
+
 def get_category_from_text(response_text, categories):
     """
     From Gemini's response text, extract which of the given categories were mentioned.
@@ -40,25 +301,118 @@ def get_category_from_text(response_text, categories):
     return occurring_categories
 
 
-def query_pinecone_hotels(user_prompt):
+async def embed_prompts(prompts):
     """
-    Embed the user prompt using Pinecone's inference API and query the hotel index.
-    Returns the top 100 matching hotels (with metadata) from namespace "ns1".
+    Embed a batch of prompts with one Gemini request.
     """
-    embedding_result = client.models.embed_content(
-        model="text-embedding-004",
-        contents=[user_prompt]
-    )
+    with gemini_call("embedding"):
+        embedding_result = await run_stage("Embedding", get_client().aio.models.embed_content(
+            model="text-embedding-004",
+            contents=prompts
+        ), EMBEDDING_TIMEOUT)
+    return [embedding.values for embedding in embedding_result.embeddings]
 
-    results = index.query(
-        namespace="hotels",
-        vector=embedding_result.embeddings[0].values,
-        top_k=100,
-        include_values=False,
-        include_metadata=True
-    )
 
-    return results.get("matches", [])
+# Query embeddings are cached, and the prompts of concurrent requests are embedded together
+query_embedder = QueryEmbedder(
+    embed_prompts,
+    max_entries=int(os.getenv("QUERY_EMBEDDING_CACHE_MAX_ENTRIES", "10000")),
+    ttl_seconds=float(os.getenv("QUERY_EMBEDDING_CACHE_TTL", "86400")),
+    max_wait=float(os.getenv("QUERY_EMBEDDING_BATCH_WAIT", "0.005")),
+    max_batch_size=int(os.getenv("QUERY_EMBEDDING_BATCH_SIZE", "100")))
+
+
+async def embed_user_prompt(user_prompt):
+    """
+    Embed the user prompt using Gemini (cached and batched with concurrent prompts, see QueryEmbedder).
+    """
+    return await query_embedder.embed(user_prompt)
+
+
+async def query_pinecone_hotels(vector, filters=None):
+    """
+    Query the hotel index with the embedding of the user prompt.
+    Returns the top matching hotels (with metadata) from namespace "hotels" and the filter they match.
+    The metadata filters (see relaxed_filters) are tried in order until one matches hotels, so the
+    top-k is only taken over the hotels that fulfil the constraints of the prompt. All queries share
+    one VECTOR_QUERY_TIMEOUT.
+    """
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + VECTOR_QUERY_TIMEOUT
+    for query_filter in filters or [None]:
+        results = await run_stage("Pinecone query", loop.run_in_executor(pinecone_executor, partial(
+            call_index, "query",
+            namespace="hotels",
+            vector=vector,
+            top_k=VECTOR_QUERY_TOP_K if query_filter is None else FILTERED_VECTOR_QUERY_TOP_K,
+            include_values=False,
+            include_metadata=True,
+            filter=query_filter
+        )), deadline - loop.time())
+        matches = results.get("matches", [])
+        if matches:
+            return matches, query_filter
+    return [], None
+
+
+async def keyword_search(user_prompt):
+    """
+    Return the ids of the best hotels for the words of the prompt by BM25, best first.
+    The search runs in a thread, since scoring the postings of long words takes a few milliseconds.
+    """
+    loop = asyncio.get_running_loop()
+    ids, _ = await loop.run_in_executor(None, bm25_index.search, user_prompt, BM25_TOP_K)
+    return [str(id) for id in ids.tolist()]
+
+
+async def fetch_pinecone_hotels(ids):
+    """
+    Fetch the metadata of the given hotels from the index, as matches without a score.
+    """
+    loop = asyncio.get_running_loop()
+    response = await run_stage("Pinecone fetch", loop.run_in_executor(pinecone_executor, partial(
+        call_index, "fetch", ids=ids, namespace="hotels")), VECTOR_QUERY_TIMEOUT)
+    return [{"id": id, "metadata": vector.metadata or {}} for id, vector in response.vectors.items()]
+
+
+async def fuse_keyword_hits(hotels, keyword_ids, query_filter):
+    """
+    Fuse the hotels of the vector query with the keyword hits by reciprocal rank fusion and keep as many
+    hotels as the vector query returned. Keyword hits that the vector query did not return are fetched
+    from the index and kept only if they match the filter of the vector query.
+    The score of every hotel becomes its fused score.
+    """
+    if not keyword_ids:
+        return hotels
+    size = max(len(hotels), 1)
+    by_id = {hotel["id"]: hotel for hotel in hotels}
+    # twice as many candidates, since keyword hits that do not match the filter are dropped
+    fused = reciprocal_rank_fusion([list(by_id), keyword_ids], RRF_K)[:2 * size]
+    missing = [id for id, _ in fused if id not in by_id]
+    if missing:
+        by_id.update((hotel["id"], hotel) for hotel in await fetch_pinecone_hotels(missing)
+                     if matches_filter(hotel["metadata"], query_filter))
+    return [{**by_id[id], "score": score} for id, score in fused if id in by_id][:size]
+
+
+async def current_index_version():
+    """
+    Return the number of vectors in the index, checked at most every INDEX_VERSION_REFRESH seconds.
+    Ingestion adds hotels, so the count changes whenever new data is searchable.
+    """
+    now = time.monotonic()
+    checked = index_version_state["checked"]
+    if checked is None or now - checked >= INDEX_VERSION_REFRESH:
+        index_version_state["checked"] = now
+        loop = asyncio.get_running_loop()
+        try:
+            stats = await run_stage("Pinecone stats", loop.run_in_executor(
+                pinecone_executor, call_index, "describe_index_stats"), VECTOR_QUERY_TIMEOUT)
+            index_version_state["version"] = stats.total_vector_count
+        except Exception as e:
+            # keep the cache of the last known version
+            print(f"Could not check the index version: {e!r}")
+    return index_version_state["version"]
 
 
 def hotels_to_df(hotels):
@@ -74,131 +428,347 @@ def hotels_to_df(hotels):
     return pd.DataFrame(hotel_data)
 
 
-def filter_hotels_by_location_df(df, user_prompt):
+async def extract_locations(user_prompt):
     """
-    Nutzt Gemini, um aus dem Prompt die Stadt bzw. das Land zu extrahieren und filtert den Hotels-DataFrame so,
-    dass nur Zeilen enthalten sind, bei denen einer der extrahierten Orte vorkommt. Es wird auch eine Spalte
-    'matched_location' hinzugefügt, die alle passenden Elemente als kommaseparierten String enthält.
+    Findet die im Prompt genannten Orte im Gazetteer des Datensatzes (Mikrosekunden, kein LLM-Aufruf).
+    Nur ohne Gazetteer wird Gemini gefragt.
     """
-    # Liste der eindeutigen Ortsnamen aus dem DataFrame bilden.
-    unique_cities = df['city_name'].dropna().unique().tolist() if 'city_name' in df.columns else []
-    unique_countries = df['country_name'].dropna().unique().tolist() if 'country_name' in df.columns else []
-    unique_location_names = list(set(unique_cities + unique_countries))
+    if gazetteer is not None:
+        return gazetteer.find(user_prompt)
+    return await extract_locations_with_gemini(user_prompt)
 
 
-    # Gemini-Prompt formulieren, der alle relevanten Ortsnamen prüfen soll.
+async def extract_locations_with_gemini(user_prompt):
+    """
+    Nutzt Gemini, um aus dem Prompt die gesuchten Städte bzw. Länder zu extrahieren. Da die Ortsnamen im
+    Datensatz teils englisch, teils in der Landessprache sind, wird jeder Ort in beiden Schreibweisen geliefert.
+    Hängt nur vom Prompt ab und kann daher parallel zur Pinecone-Abfrage laufen.
+    """
     extraction_prompt = (
-        f"Given the following list of unique location names from our dataset: {unique_location_names}, "
-        f"extract from the following prompt which of these locations are mentioned: \"{user_prompt}\". "
-        "Return the one location name from the list which is asked for in the language from the given list for example if the list says albanien instead of albania, return albanien!   "
+        f"Extract the cities and countries the following hotel search asks for: \"{user_prompt}\". "
+        "For each location return the name as written in the prompt, its English name and its name in the local language, "
+        "for example Albanien, Albania, Shqipëria. "
+        "Return only the names separated by commas, or nothing if no location is mentioned."
     )
-    extraction_response = query_gemini(extraction_prompt)
+    extraction_response = await query_gemini(extraction_prompt, "location_extraction")
     extraction_response = extraction_response.replace("\n", "").replace("\t", "").strip()
 
-
     # Falls Gemini mehrere Elemente zurückliefert, diese zu einer Liste aufsplitten.
-    locations = [loc.strip() for loc in extraction_response.split(",")] if extraction_response else []
-
-
-    def location_match(row):
-        matches = []
-        # Extrahiere und normalisiere den city_name und country_name der Zeile.
-        city = str(row.get("city_name", "")).lower().strip()
-        country = str(row.get("country_name", "")).lower().strip()
-        for loc in locations:
-            loc_norm = loc.lower().strip()
-            # Prüfe auf exakte Übereinstimmung oder Teilübereinstimmung.
-            if loc_norm == city or loc_norm == country or loc_norm in city or loc_norm in country:
-                matches.append(loc)
-        if matches:
-            # Doppelte Einträge entfernen und als kommaseparierten String zurückgeben.
-            unique_matches = list(dict.fromkeys(matches))
-            return ", ".join(unique_matches)
-        else:
-            return None
+    return [loc.strip() for loc in extraction_response.split(",") if loc.strip()] if extraction_response else []
 
-    df["matched_location"] = df.apply(location_match, axis=1)
 
-    df_filtered = df[df["matched_location"].notnull()]
+def filter_hotels_by_location_df(df, locations):
+    """
+    Filtert den Hotels-DataFrame so, dass nur Zeilen enthalten sind, bei denen einer der extrahierten Orte vorkommt.
+    Es wird auch eine Spalte 'matched_location' hinzugefügt, die alle passenden Elemente als kommaseparierten
+    String enthält. Ohne extrahierte Orte werden alle Hotels behalten.
+    """
+    if not locations or df.empty:
+        return df
+
+    # Spaltenweise statt zeilenweise: city_name und country_name einmal normalisieren.
+    cities = df["city_name"].astype(str).str.lower().str.strip() if "city_name" in df.columns else pd.Series("", index=df.index)
+    countries = df["country_name"].astype(str).str.lower().str.strip() if "country_name" in df.columns else pd.Series("", index=df.index)
+
+    matched = pd.Series("", index=df.index)
+    for loc in dict.fromkeys(locations):
+        loc_norm = loc.lower().strip()
+        if not loc_norm:
+            continue
+        # Prüfe auf exakte Übereinstimmung oder Teilübereinstimmung.
+        mask = cities.str.contains(loc_norm, regex=False) | countries.str.contains(loc_norm, regex=False)
+        matched = matched.mask(mask, matched + ", " + loc)
+
+    # Alle passenden Orte als kommaseparierten String (ohne das führende Komma).
+    df["matched_location"] = matched.str[2:]
+
+    df_filtered = df[matched != ""]
 
     return df_filtered
 
 
+async def select_ordering_categories(user_prompt):
+    """
+    Use Gemini to determine by which metadata categories the hotels should be ordered.
+    Only depends on the prompt and the known metadata schema, so it runs in parallel to the retrieval.
+    """
+    sorting_prompt = (
+        f"Here is the original prompt:\n{user_prompt}\n\n"
+        f"We now have some hotel recommendations. Which of these categories are most important to the user? "
+        f"Therefore, by which category should we order by: {', '.join(HOTEL_METADATA_FIELDS)}.\n\n"
+        "Please provide the category names and only that."
+    )
+    sorting_response = await query_gemini(sorting_prompt, "category_selection")
+    ordering_categories = get_category_from_text(sorting_response, HOTEL_METADATA_FIELDS)
+
+    # Default to sorting by hotel_rating if Gemini returns no valid category.
+    return ordering_categories or ["hotel_rating"]
 
 
 def sort_hotels_df(df, ordering_categories):
     """
-    Sort hotels by the first ordering category provided (or default to hotel_rating)
-    and then by hotel_rating as a secondary tiebreaker.
+    Sort hotels by the numeric column of the first ordering category that has one (see SORT_COLUMNS)
+    and then by star rating as a tiebreaker. Hotels that are equal keep the order of similarity,
+    hotels without a value come last.
     Returns the top 10 sorted hotels as a DataFrame.
     """
-    primary_category = ordering_categories[0] if ordering_categories else "hotel_rating"
-    # Ensure the sorting columns exist and are numeric
-    for col in [primary_category, "hotel_rating"]:
-        if col in df.columns:
-            df[col] = pd.to_numeric(df[col], errors="coerce").fillna(0)
-        else:
-            df[col] = 0
-    df_sorted = df.sort_values(
-        by=[primary_category, "hotel_rating"], ascending=False)
+    if df.empty:
+        return df
+    if "star_rating" not in df.columns:
+        df["star_rating"] = df["hotel_rating"].map(STAR_RATINGS).fillna(0) if "hotel_rating" in df.columns else 0
+
+    columns, ascending = [], []
+    for category in ordering_categories:
+        column, column_ascending = SORT_COLUMNS.get(category, (None, None))
+        if column in df.columns:
+            columns.append(column)
+            ascending.append(column_ascending)
+            break
+    if "star_rating" not in columns:
+        columns.append("star_rating")
+        ascending.append(False)
+    df_sorted = df.sort_values(by=columns, ascending=ascending, kind="stable", na_position="last")
     return df_sorted.head(10)
 
 
-def get_hotel_recommendations(user_prompt):
+def filter_hotels_by_anchor_df(df, anchor):
     """
-    Process hotel recommendations as follows:
-      1. Query Pinecone for similar hotels based on the user prompt.
-      2. Convert the results to a Pandas DataFrame.
-      3. Filter hotels based on location (city/county) in the user prompt.
-      4. Use Gemini to determine the most important hotel metadata category for sorting.
-      5. Sort the hotels using DataFrame operations and select the top 10.
-      6. Ask Gemini to generate additional details and a compelling case for the top hotels.
+    Add the distance of each hotel to the anchor as 'distance_km' and keep the hotels within its radius.
+    If none of the hotels is within the radius (the area filter of the vector query was relaxed),
+    all hotels are kept, so they are still ordered by distance.
     """
-    # Step 1: Retrieve similar hotels from Pinecone.
-    hotels = query_pinecone_hotels(user_prompt)
+    if df.empty:
+        return df
+    df["distance_km"] = geo_index.distances(
+        anchor.latitude, anchor.longitude, pd.to_numeric(df["id"]).to_numpy()).round(2)
+    within = df["distance_km"] <= anchor.radius_km
+    return df[within] if within.any() else df
 
-    # Step 2: Convert the hotels list into a DataFrame.
-    hotels_df = hotels_to_df(hotels)
-    # Step 3: Filter hotels based on location (if applicable).
-    hotels_df = filter_hotels_by_location_df(hotels_df, user_prompt)
 
-    # Step 4: Determine the ordering category using Gemini.
-    categories = hotels_df.columns
-    sorting_prompt = (
-        f"Here is the original prompt:\n{user_prompt}\n\n"
-        f"We now have some hotel recommendations. Which of these categories are most important to the user? "
-        f"Therefore, by which category should we order by: {', '.join(categories)}.\n\n"
-        "Please provide the category names and only that."
-    )
-    sorting_response = query_gemini(sorting_prompt)
-    ordering_categories = get_category_from_text(sorting_response, categories)
+def build_recommendation_prompt(hotels, locations, ordering_categories, anchor=None, timings=None):
+    """
+    Filter the retrieved hotels by the extracted locations (and the area around the anchor), sort them
+    by the ordering categories (nearest first for an anchor) and build the prompt asking Gemini for
+    a compelling case for the top 10 hotels (see PromptBuilder). Returns the prompt and its PromptStats.
+    If a timings dictionary is given, the duration of every step (in ms) is recorded in it.
+    """
+    # Convert the hotels list into a DataFrame and filter it by location (if applicable).
+    with span(timings, "dataframe"):
+        hotels_df = hotels_to_df(hotels)
+    with span(timings, "location_filter"):
+        hotels_df = filter_hotels_by_location_df(hotels_df, locations)
+    if anchor is not None:
+        with span(timings, "anchor_filter"):
+            hotels_df = filter_hotels_by_anchor_df(hotels_df, anchor)
+        ordering_categories = ["distance_km"] + ordering_categories
+
+    # Sort the hotels using the DataFrame.
+    with span(timings, "sorting"):
+        top_hotels_df = sort_hotels_df(hotels_df, ordering_categories)
+
+    # Ask Gemini for additional details and a compelling case, within the token budget.
+    additional_info = "descriptions about nearby attractions, amenities, or service"
+    with span(timings, "prompt_building"):
+        return prompt_builder.build(
+            top_hotels_df.to_dict("records"),
+            "Here are the top hotel recommendations:",
+            f"Can you provide additional information about these hotels? For example, {additional_info}. "
+            "Then, please make a compelling case for each hotel to the user.")
 
-    # Default to sorting by hotel_rating if Gemini returns no valid category.
-    if not ordering_categories:
-        ordering_categories = ["hotel_rating"]
 
-    # Step 5: Sort the hotels using the DataFrame.
-    top_hotels_df = sort_hotels_df(hotels_df, ordering_categories)
+async def prepare_recommendation(user_prompt, timings=None):
+    """
+    Answer the prompt from the response cache or prepare the final Gemini prompt as follows:
+      1. Return the cached answer if the same prompt was answered before.
+      2. Run the independent stages concurrently:
+         - embed the user prompt, answer it from the cache if a similar prompt was answered before,
+           and otherwise query Pinecone for similar hotels, filtered on the area around an attraction
+           the prompt asks to be near (geo index), the locations of the gazetteer, the star rating
+           and the facilities the prompt asks for,
+         - search the words of the prompt in the BM25 index (if there is one),
+         - extract the locations (city/country) asked for in the user prompt from the gazetteer
+           (or with Gemini if there is none),
+         - use Gemini to determine the most important hotel metadata category for sorting.
+         The other stages are cancelled on a cache hit.
+      3. Fuse the hotels of the vector query with the keyword hits (fuse_keyword_hits).
+      4. Filter and sort the hotels and build the prompt for the top 10 (build_recommendation_prompt).
+    """
+    # the indexes are loaded at startup, unless the module is used without the API
+    load_indexes()
+    index_version = await timed(timings, "index_version", current_index_version())
+    response_cache.check_index_version(index_version)
+    answer = response_cache.get(user_prompt)
+    if answer is not None:
+        print("Response cache hit (exact prompt)")
+        return Preparation(answer, None, None, index_version, None, None)
+
+    # the locations of the gazetteer are dataset values and can be pushed down into the vector query
+    known_locations = gazetteer.find(user_prompt) if gazetteer is not None else []
+    anchor = geo_index.find_anchor(user_prompt, known_locations, GEO_RADIUS_KM, GEO_MIN_HOTELS) \
+        if geo_index is not None else None
+    filters = relaxed_filters(filter_conditions(
+        user_prompt, known_locations, GeoIndex.bounding_box(anchor) if anchor is not None else None),
+        MAX_VECTOR_QUERIES)
+    # a similar prompt only answers this one if it has the same locations, star rating, facilities and area
+    constraints = filters[0]
+
+    embedding = asyncio.ensure_future(timed(timings, "embedding", embed_user_prompt(user_prompt)))
+    prompt_stages = [
+        asyncio.ensure_future(timed(timings, "location_extraction", extract_locations(user_prompt))),
+        asyncio.ensure_future(timed(timings, "category_selection", select_ordering_categories(user_prompt))),
+        asyncio.ensure_future(timed(timings, "keyword_search", keyword_search(user_prompt)))
+        if bm25_index is not None else asyncio.ensure_future(asyncio.sleep(0, [])),
+    ]
+    try:
+        vector = await embedding
+        answer = response_cache.get_similar(vector, constraints)
+        if answer is not None:
+            print("Response cache hit (similar prompt)")
+            for stage in prompt_stages:
+                stage.cancel()
+            return Preparation(answer, None, vector, index_version, None, constraints)
+
+        (hotels, query_filter), locations, ordering_categories, keyword_ids = await gather_stages(
+            timed(timings, "vector_query", query_pinecone_hotels(vector, filters)), *prompt_stages)
+        hotels = await timed(timings, "fusion", fuse_keyword_hits(hotels, keyword_ids, query_filter))
+    except BaseException:
+        for stage in [embedding] + prompt_stages:
+            stage.cancel()
+        raise
+
+    prompt, prompt_stats = build_recommendation_prompt(hotels, locations, ordering_categories, anchor, timings)
+    print(f"Recommendation prompt: {prompt_stats.tokens} tokens (estimated) for {prompt_stats.hotels} hotels")
+    return Preparation(None, prompt, vector, index_version, prompt_stats, constraints)
+
+
+async def get_hotel_recommendations(user_prompt, timings=None, prompt_size=None):
+    """
+    Prepare the recommendation prompt and let Gemini generate the answer for the top hotels.
+    Repeated and near-duplicate prompts are answered from the response cache.
+    Every I/O stage is awaited with a timeout, so concurrent requests share the event loop.
+    If a timings dictionary is given, the duration of every stage (in ms) is recorded in it.
+    If a prompt_size dictionary is given, the PromptStats of the generated prompt are recorded in it.
+    """
+    start = time.perf_counter()
+    preparation = await prepare_recommendation(user_prompt, timings)
+    if prompt_size is not None and preparation.prompt_stats is not None:
+        prompt_size.update(preparation.prompt_stats._asdict())
+    answer = preparation.answer
+    if answer is None:
+        answer = await timed(timings, "generation", query_gemini(preparation.prompt))
+        response_cache.put(user_prompt, preparation.vector, answer, preparation.index_version,
+                           preparation.constraints)
+
+    if timings is not None:
+        timings["total"] = round((time.perf_counter() - start) * 1000, 1)
+    return answer
+
+
+async def stream_hotel_recommendations(user_prompt, preparation, timings=None):
+    """
+    Yield the answer for a result of prepare_recommendation as Gemini generates it (or the cached answer).
+    Records the time to the first chunk ('first_token') and the duration of the 'generation'.
+    """
+    if preparation.answer is not None:
+        yield preparation.answer
+        return
+
+    start = time.perf_counter()
+    chunks = []
+    async for text in stream_gemini(preparation.prompt):
+        if timings is not None and "first_token" not in timings:
+            timings["first_token"] = round((time.perf_counter() - start) * 1000, 1)
+        chunks.append(text)
+        yield text
+    if timings is not None:
+        timings["generation"] = round((time.perf_counter() - start) * 1000, 1)
+    response_cache.put(user_prompt, preparation.vector, "".join(chunks), preparation.index_version,
+                       preparation.constraints)
+
+
+def create_clients():
+    """
+    Create the Gemini client and the Pinecone index handle (blocking, see get_index).
+    """
+    get_client()
+    get_index()
 
-    # Prepare a list of hotel names for the final prompt.
-    hotel_strings = top_hotels_df.apply(
-        lambda row: f"{row['id']}: {row.to_dict()}", axis=1).tolist()
 
-    # Step 6: Ask Gemini for additional details and a compelling case.
-    additional_info = "descriptions about nearby attractions, amenities, or service"
-    additional_info_prompt = (
-        f"Here are the top hotel recommendations:\n{', '.join(hotel_strings)}\n\n"
-        f"Can you provide additional information about these hotels? For example, {additional_info}. "
-        "Then, please make a compelling case for each hotel to the user. ignore columns which are marked unknown. "
-    )
-    additional_info_response = query_gemini(additional_info_prompt)
+def warm_up_local(prompt):
+    """
+    Send the prompt through the local stages of a recommendation: the gazetteer, the geo index, the
+    metadata filters, the BM25 index and the filtering, sorting and prompt building of a hotel.
+    Fills the caches (e.g. the term hashes) and first-use costs the first request would pay otherwise.
+    """
+    locations = gazetteer.find(prompt) if gazetteer is not None else []
+    anchor = geo_index.find_anchor(prompt, locations, GEO_RADIUS_KM, GEO_MIN_HOTELS) \
+        if geo_index is not None else None
+    relaxed_filters(filter_conditions(
+        prompt, locations, GeoIndex.bounding_box(anchor) if anchor is not None else None), MAX_VECTOR_QUERIES)
+    if bm25_index is not None:
+        bm25_index.search(prompt, BM25_TOP_K)
+    hotel = {"id": "0", "metadata": {"hotel_name": "Warm-up Hotel", "hotel_rating": "FourStar",
+                                     "city_name": locations[0] if locations else "Barcelona",
+                                     "description": prompt, "hotel_facilities": "Pool"}}
+    build_recommendation_prompt([hotel], locations, ["hotel_rating"])
+
+
+async def warm_up_step(step, awaitable):
+    """
+    Await a step of the warm-up and record its duration. A failed step is recorded instead of raised.
+    """
+    try:
+        result = await timed(startup_state["timings"], step, awaitable)
+        startup_state["errors"].pop(step, None)
+        return result
+    except Exception as e:
+        print(f"Warm-up step {step} failed: {e!r}")
+        startup_state["errors"][step] = repr(e)
+        return None
 
-    return additional_info_response
+
+async def warm_up(prompt=WARM_UP_PROMPT):
+    """
+    Prepare the service for the first request after the indexes are loaded: create the clients, run
+    the prompt through the local stages and, if WARM_UP_REMOTE, embed it, check the index version
+    and query Pinecone, which opens the connections to both. Nothing is added to the caches.
+    Creating the clients is retried with a growing delay until it succeeds, so a temporary outage
+    of Gemini or Pinecone at startup does not leave the service unready.
+    """
+    loop = asyncio.get_running_loop()
+    start = time.perf_counter()
+    await warm_up_step("local", loop.run_in_executor(None, warm_up_local, prompt))
+    delay = WARM_UP_RETRY_SECONDS
+    while True:
+        await warm_up_step("clients", loop.run_in_executor(pinecone_executor, create_clients))
+        startup_state["clients_ready"] = client is not None and index is not None
+        if startup_state["clients_ready"]:
+            break
+        print(f"Creating the clients again in {delay:g} s...")
+        await asyncio.sleep(delay)
+        delay = min(delay * 2, WARM_UP_MAX_RETRY_SECONDS)
+    if WARM_UP_REMOTE:
+        vectors = await warm_up_step("embedding", embed_prompts([prompt]))
+        await warm_up_step("index_version", current_index_version())
+        if vectors:
+            await warm_up_step("vector_query", query_pinecone_hotels(vectors[0]))
+    startup_state["timings"]["warm_up"] = round((time.perf_counter() - start) * 1000, 1)
+    startup_state["warmed_up"] = True
+    print(f"Warm-up done (ms): {startup_state['timings']}")
+
+
+def is_ready():
+    """
+    Whether the indexes are loaded, the warm-up is done and the clients could be created.
+    """
+    return startup_state["indexes_loaded"] and startup_state["warmed_up"] and startup_state["clients_ready"]
 
 
 # Example usage:
 if __name__ == "__main__":
     user_prompt = "I'm looking for luxury hotels in Albanien with excellent reviews and a great location."
-    recommendations = get_hotel_recommendations(user_prompt)
+    timings = {}
+    recommendations = asyncio.run(get_hotel_recommendations(user_prompt, timings))
     print("Hotel Recommendations:")
     print(recommendations)
+    print("Stage timings (ms):", timings)
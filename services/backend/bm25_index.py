@@ -0,0 +1,113 @@
+import hashlib
+from functools import lru_cache
+import numpy as np
+from backend.gazetteer import normalize_name
+
+# The same stopwords the data service leaves out of the index (see bm25_index.py there)
+STOPWORDS = {"a", "an", "and", "are", "as", "at", "be", "by", "for", "from", "has", "have", "in", "is",
+             "it", "its", "of", "on", "or", "our", "the", "this", "to", "with", "you", "your", "der", "die",
+             "das", "und", "mit", "im", "am"}
+
+
+def tokenize(text):
+    return [word for word in normalize_name(text).split() if word not in STOPWORDS]
+
+
+@lru_cache(maxsize=1 << 20)
+def term_hash(term):
+    return int.from_bytes(hashlib.blake2b(term.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+def decode_varints(encoded):
+    """
+    Decode LEB128 varints (7 bits per byte, high bit set on all but the last byte).
+    """
+    ends = np.flatnonzero(encoded < 0x80)
+    if len(ends) == 0:
+        return np.empty(0, dtype=np.int64)
+    starts = np.concatenate([[0], ends[:-1] + 1])
+    positions = np.arange(len(encoded)) - np.repeat(starts, ends - starts + 1)
+    parts = (encoded & 0x7F).astype(np.uint64) << (7 * positions).astype(np.uint64)
+    return np.add.reduceat(parts, starts).astype(np.int64)
+
+
+class BM25Index:
+    """
+    BM25 keyword search over the hotel texts, on the inverted index built by the data service.
+    The postings of a term are varint-encoded gaps between rows and are only decoded for the terms of
+    a query. Terms contained in more than max_document_fraction of the hotels are skipped, since they
+    barely change the ranking but have the longest postings.
+    """
+
+    def __init__(self, index, k1=1.2, b=0.75, max_document_fraction=0.2):
+        self.k1 = k1
+        self.b = b
+        self.max_document_fraction = max_document_fraction
+        self.ids = index["ids"]
+        self.term_hashes = index["term_hashes"]
+        self.document_frequencies = index["document_frequencies"].astype(np.int64)
+        self.offsets = index["offsets"]
+        self.postings = index["postings"]
+        self.term_frequencies = index["term_frequencies"]
+        # start of the term frequencies of each term
+        self.frequency_offsets = np.concatenate([[0], np.cumsum(self.document_frequencies)])
+        lengths = index["lengths"].astype(np.float32)
+        # BM25 length normalization of every hotel
+        self.length_norms = k1 * (1 - b + b * lengths / max(float(lengths.mean()), 1.0)) \
+            if len(lengths) else lengths
+
+    @classmethod
+    def load(cls, path, **kwargs):
+        with np.load(path) as index:
+            return cls({key: index[key] for key in index.files}, **kwargs)
+
+    def term_position(self, term):
+        hashed = np.uint64(term_hash(term))
+        position = int(np.searchsorted(self.term_hashes, hashed))
+        if position < len(self.term_hashes) and self.term_hashes[position] == hashed:
+            return position
+        return None
+
+    def search(self, query, top_k):
+        """
+        Return the ids of the top_k hotels by BM25 score for the query and their scores, best first.
+        """
+        hotels = len(self.ids)
+        all_rows, all_scores = [], []
+        for term in dict.fromkeys(tokenize(query)):
+            position = self.term_position(term)
+            if position is None:
+                continue
+            document_frequency = self.document_frequencies[position]
+            if document_frequency > self.max_document_fraction * hotels:
+                continue
+            rows = np.cumsum(decode_varints(
+                self.postings[self.offsets[position]:self.offsets[position + 1]]))
+            frequencies = self.term_frequencies[self.frequency_offsets[position]:
+                                                self.frequency_offsets[position + 1]].astype(np.float32)
+            idf = np.log(1 + (hotels - document_frequency + 0.5) / (document_frequency + 0.5))
+            all_rows.append(rows)
+            all_scores.append(idf * frequencies * (self.k1 + 1) / (frequencies + self.length_norms[rows]))
+        if not all_rows:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+
+        rows, inverse = np.unique(np.concatenate(all_rows), return_inverse=True)
+        scores = np.bincount(inverse, weights=np.concatenate(all_scores))
+        if top_k < len(rows):
+            best = np.argpartition(-scores, top_k - 1)[:top_k]
+        else:
+            best = np.arange(len(rows))
+        best = best[np.argsort(-scores[best], kind="stable")]
+        return self.ids[rows[best]], scores[best]
+
+
+def reciprocal_rank_fusion(rankings, k=60):
+    """
+    Fuse rankings (lists of ids, best first) by the sum of 1 / (k + rank) of each id over the rankings.
+    Returns the ids with their fused scores, best first.
+    """
+    scores = {}
+    for ranking in rankings:
+        for rank, id in enumerate(ranking, start=1):
+            scores[id] = scores.get(id, 0.0) + 1.0 / (k + rank)
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)
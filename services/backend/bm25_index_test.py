@@ -0,0 +1,24 @@
+import unittest
+from backend.bm25_index import reciprocal_rank_fusion, tokenize
+
+
+class TestReciprocalRankFusion(unittest.TestCase):
+
+    def test_ids_ranked_high_in_both_rankings_win(self):
+        fused = reciprocal_rank_fusion([["a", "b", "c"], ["c", "a", "d"]], k=1)
+
+        self.assertEqual(["a", "c", "b", "d"], [id for id, _ in fused])
+        self.assertAlmostEqual(1 / 2 + 1 / 3, fused[0][1])
+
+    def test_empty_rankings(self):
+        self.assertEqual([], reciprocal_rank_fusion([[], []]))
+
+
+class TestTokenize(unittest.TestCase):
+
+    def test_stopwords_are_left_out(self):
+        self.assertEqual(["hotel", "pool", "munchen"], tokenize("A hotel with a pool in München"))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,36 @@
+import os
+import sys
+import unittest
+from backend import query_filters
+from backend.gazetteer import normalize_name
+
+# The backend image does not contain the data service, so its tables are copied instead of imported
+DATA_SERVICE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data")
+
+
+@unittest.skipUnless(os.path.isdir(DATA_SERVICE_DIR), "the data service is not available")
+class TestDataTables(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        sys.path.insert(0, DATA_SERVICE_DIR)
+        try:
+            import gazetteer
+            import hotel_metadata
+        finally:
+            sys.path.remove(DATA_SERVICE_DIR)
+        cls.gazetteer = gazetteer
+        cls.hotel_metadata = hotel_metadata
+
+    def test_tables_equal_those_of_the_data_service(self):
+        self.assertEqual(self.hotel_metadata.STAR_RATINGS, query_filters.STAR_RATINGS)
+        self.assertEqual(self.hotel_metadata.FACILITY_KEYWORDS, query_filters.FACILITY_KEYWORDS)
+        self.assertEqual(self.hotel_metadata.FACILITY_PATTERN.pattern, query_filters.FACILITY_PATTERN.pattern)
+
+    def test_names_are_normalized_like_in_the_data_service(self):
+        for name in ["Tiranë, Shqipëria!", "New York,   New York", "Köln_Bonn", "Αθήνα", "São Paulo (SP)"]:
+            self.assertEqual(self.gazetteer.normalize_name(name), normalize_name(name))
+
+
+if __name__ == '__main__':
+    unittest.main()
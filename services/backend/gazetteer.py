@@ -0,0 +1,80 @@
+import json
+import re
+import unicodedata
+
+NON_ALPHANUMERIC_PATTERN = re.compile(r"[\W_]+")
+
+# Words before a location in English and German prompts ("hotel in Spa", "nahe Bath")
+LOCATION_CUES = {"in", "near", "at", "around", "to", "from", "of", "visit", "visiting",
+                 "nach", "bei", "im", "nahe", "um", "von"}
+
+
+def normalize_name(name):
+    """
+    Lowercase a name, remove its accents and replace punctuation by single spaces
+    (a copy of the normalization the data service applies to the aliases of the gazetteer, kept
+    equal by data_tables_test.py).
+    """
+    folded = name.lower()
+    # ASCII text has no accents to remove
+    if not folded.isascii():
+        folded = "".join(character for character in unicodedata.normalize("NFKD", folded)
+                         if not unicodedata.combining(character))
+    return NON_ALPHANUMERIC_PATTERN.sub(" ", folded).strip()
+
+
+class Gazetteer:
+    """
+    Finds the cities and countries of the dataset that a prompt mentions.
+    The aliases of the gazetteer built by the data service are stored in a trie of words, so a
+    prompt is matched in a single pass over its words and only whole words match.
+    Cued aliases are place names that are also everyday words or facility keywords ("spa", "nice");
+    they only match right after a location cue, so "hotel with a spa" mentions no location.
+    """
+
+    # key of the trie node at which an alias ends
+    VALUES = ""
+    # key of the flag whether the alias ending at the node needs a location cue
+    CUED = " "
+
+    def __init__(self, aliases, cued_aliases=()):
+        self.cued_aliases = set(cued_aliases)
+        self.trie = {}
+        for alias, values in aliases.items():
+            node = self.trie
+            for word in alias.split():
+                node = node.setdefault(word, {})
+            node[self.VALUES] = values
+            node[self.CUED] = alias in self.cued_aliases
+
+    @classmethod
+    def load(cls, path):
+        with open(path, encoding="utf-8") as f:
+            gazetteer = json.load(f)
+        return cls(gazetteer["aliases"], gazetteer.get("cued_aliases", ()))
+
+    def find(self, prompt):
+        """
+        Return the dataset values of the locations mentioned in the prompt, in the order they occur.
+        At every word the longest alias starting there wins ("new york" over "york"); a cued alias
+        only counts after a location cue.
+        """
+        words = normalize_name(prompt).split()
+        locations = []
+        position = 0
+        while position < len(words):
+            node = self.trie
+            cued = position > 0 and words[position - 1] in LOCATION_CUES
+            match, match_end = None, position
+            for end in range(position, len(words)):
+                node = node.get(words[end])
+                if node is None:
+                    break
+                if self.VALUES in node and (not node[self.CUED] or cued):
+                    match, match_end = node[self.VALUES], end
+            if match:
+                locations.extend(value for value in match if value not in locations)
+                position = match_end + 1
+            else:
+                position += 1
+        return locations
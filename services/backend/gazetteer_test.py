@@ -0,0 +1,27 @@
+import unittest
+from backend.gazetteer import Gazetteer, normalize_name
+
+
+class TestGazetteer(unittest.TestCase):
+
+    def setUp(self):
+        self.gazetteer = Gazetteer({"new york": ["New York,   New York"], "york": ["York"],
+                                    "spa": ["Spa"], "nice": ["Nice"], "paris": ["Paris"]},
+                                   cued_aliases=["spa", "nice"])
+
+    def test_longest_alias_wins(self):
+        self.assertEqual(["New York,   New York"], self.gazetteer.find("Hotels in New York"))
+        self.assertEqual(["York", "Paris"], self.gazetteer.find("York or Paris?"))
+
+    def test_cued_aliases_need_a_location_cue(self):
+        self.assertEqual([], self.gazetteer.find("hotel with a spa"))
+        self.assertEqual(["Paris"], self.gazetteer.find("a nice hotel with a spa in Paris"))
+        self.assertEqual(["Spa"], self.gazetteer.find("hotel in Spa"))
+        self.assertEqual(["Nice"], self.gazetteer.find("Hotels near Nice with a spa"))
+
+    def test_normalize_name(self):
+        self.assertEqual("tirane shqiperia", normalize_name(" Tiranë, Shqipëria!"))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,160 @@
+import re
+import numpy as np
+from collections import namedtuple
+from backend.gazetteer import normalize_name
+
+EARTH_RADIUS_KM = 6371.0
+KM_PER_DEGREE = np.pi * EARTH_RADIUS_KM / 180
+
+# "near X", "close to X", ... followed by up to MAX_ATTRACTION_WORDS words naming an attraction
+ANCHOR_PATTERN = re.compile(
+    r"\b(?:near|nearby|close to|next to|around|walking distance (?:to|from)|within walking distance of)\s+(?:the\s+)?")
+MAX_ATTRACTION_WORDS = 6
+
+# Attraction a prompt asks to be near and the radius around it in which hotels are searched
+Anchor = namedtuple("Anchor", ["name", "latitude", "longitude", "radius_km"])
+
+
+def haversine_km(latitude, longitude, latitudes, longitudes):
+    """
+    Return the great-circle distances in km between a position and an array of positions.
+    """
+    latitude, longitude = np.radians(latitude), np.radians(longitude)
+    latitudes, longitudes = np.radians(latitudes), np.radians(longitudes)
+    a = np.sin((latitudes - latitude) / 2) ** 2 + np.cos(latitude) * \
+        np.cos(latitudes) * np.sin((longitudes - longitude) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1)))
+
+
+class GeoIndex:
+    """
+    Grid index of the hotel positions built by the data service (see geo_index.py there).
+    The hotels are sorted by grid cell, so a radius query takes one slice of hotels per row of cells
+    it overlaps and computes exact distances only for them. k-nearest queries grow the radius until
+    it holds k hotels. Attractions are located at the hotel closest to them.
+    """
+
+    def __init__(self, index):
+        self.cell_degrees = float(index["cell_degrees"])
+        self.longitude_cells = int(round(360 / self.cell_degrees))
+        self.latitude_cells = int(round(180 / self.cell_degrees))
+        self.ids = index["ids"]
+        self.cell_keys = index["cell_keys"]
+        self.latitudes = index["latitudes"]
+        self.longitudes = index["longitudes"]
+        # hotel id -> position in the arrays
+        self.id_order = np.argsort(self.ids)
+        self.sorted_ids = self.ids[self.id_order]
+
+        # normalized attraction name -> [(city name, latitude, longitude), ...]
+        self.attractions = {}
+        names = self.decode(index["attraction_names"])
+        cities = self.decode(index["attraction_cities"])
+        for name, city, latitude, longitude in zip(names, cities, index["attraction_latitudes"].tolist(),
+                                                   index["attraction_longitudes"].tolist()):
+            self.attractions.setdefault(name, []).append((city, latitude, longitude))
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as index:
+            return cls({key: index[key] for key in index.files})
+
+    @staticmethod
+    def decode(encoded):
+        return encoded.tobytes().decode("utf-8").split("\n") if len(encoded) else []
+
+    def cell(self, latitude, longitude):
+        return (int(np.floor((latitude + 90) / self.cell_degrees)),
+                int(np.floor((longitude + 180) / self.cell_degrees)))
+
+    def radius(self, latitude, longitude, radius_km):
+        """
+        Return the ids of the hotels within radius_km of the position and their distances, nearest first.
+        """
+        latitude_span = radius_km / KM_PER_DEGREE
+        longitude_span = radius_km / (KM_PER_DEGREE * max(np.cos(np.radians(latitude)), 1e-6))
+        first_row, first_column = self.cell(latitude - latitude_span, longitude - longitude_span)
+        last_row, last_column = self.cell(latitude + latitude_span, longitude + longitude_span)
+        first_row, last_row = max(first_row, 0), min(last_row, self.latitude_cells - 1)
+        if longitude_span >= 180 or last_column - first_column >= self.longitude_cells:
+            column_ranges = [(0, self.longitude_cells - 1)]
+        elif first_column < 0:
+            column_ranges = [(first_column + self.longitude_cells, self.longitude_cells - 1), (0, last_column)]
+        elif last_column >= self.longitude_cells:
+            column_ranges = [(first_column, self.longitude_cells - 1), (0, last_column - self.longitude_cells)]
+        else:
+            column_ranges = [(first_column, last_column)]
+
+        slices = []
+        for row in range(first_row, last_row + 1):
+            for first, last in column_ranges:
+                start, end = np.searchsorted(self.cell_keys, [row * self.longitude_cells + first,
+                                                              row * self.longitude_cells + last + 1])
+                if start < end:
+                    slices.append(np.arange(start, end))
+        if not slices:
+            return np.empty(0, dtype=np.int64), np.empty(0)
+        candidates = np.concatenate(slices)
+        distances = haversine_km(latitude, longitude,
+                                 self.latitudes[candidates], self.longitudes[candidates])
+        within = distances <= radius_km
+        candidates, distances = candidates[within], distances[within]
+        order = np.argsort(distances, kind="stable")
+        return self.ids[candidates[order]], distances[order]
+
+    def nearest(self, latitude, longitude, k, radius_km=1.0):
+        """
+        Return the ids of the k hotels nearest to the position and their distances, nearest first.
+        """
+        while True:
+            ids, distances = self.radius(latitude, longitude, radius_km)
+            if len(ids) >= k or radius_km >= np.pi * EARTH_RADIUS_KM:
+                return ids[:k], distances[:k]
+            radius_km *= 2
+
+    def distances(self, latitude, longitude, ids):
+        """
+        Return the distances in km from the position to the given hotels (NaN for unknown hotels).
+        """
+        ids = np.asarray(ids, dtype=np.int64)
+        positions = np.searchsorted(self.sorted_ids, ids).clip(max=max(len(self.sorted_ids) - 1, 0))
+        distances = np.full(len(ids), np.nan)
+        if len(self.sorted_ids):
+            known = self.sorted_ids[positions] == ids
+            rows = self.id_order[positions[known]]
+            distances[known] = haversine_km(latitude, longitude, self.latitudes[rows], self.longitudes[rows])
+        return distances
+
+    def find_anchor(self, prompt, cities=(), radius_km=3.0, min_hotels=10):
+        """
+        Return the Anchor of the attraction the prompt asks to be near ("near the Colosseum"), or None.
+        Attractions in one of the given cities are preferred over namesakes elsewhere. The radius is
+        widened to the distance of the min_hotels nearest hotels if fewer hotels are within radius_km.
+        """
+        lowered = prompt.lower()
+        for match in ANCHOR_PATTERN.finditer(lowered):
+            words = normalize_name(lowered[match.end():]).split()[:MAX_ATTRACTION_WORDS]
+            for count in range(len(words), 0, -1):
+                name = " ".join(words[:count])
+                locations = self.attractions.get(name)
+                if locations:
+                    _, latitude, longitude = next(
+                        (location for location in locations if location[0] in cities), locations[0])
+                    _, distances = self.nearest(latitude, longitude, min_hotels)
+                    if len(distances):
+                        radius_km = max(radius_km, float(distances[-1]))
+                    return Anchor(name, latitude, longitude, radius_km)
+        return None
+
+    @staticmethod
+    def bounding_box(anchor):
+        """
+        Return the Pinecone condition on the 'latitude' and 'longitude' metadata of the hotels that
+        selects a box around the radius of the anchor.
+        """
+        latitude_span = anchor.radius_km / KM_PER_DEGREE
+        longitude_span = float(min(anchor.radius_km / (KM_PER_DEGREE * max(np.cos(np.radians(anchor.latitude)), 1e-6)), 180))
+        return {"$and": [
+            {"latitude": {"$gte": anchor.latitude - latitude_span, "$lte": anchor.latitude + latitude_span}},
+            {"longitude": {"$gte": anchor.longitude - longitude_span, "$lte": anchor.longitude + longitude_span}},
+        ]}
@@ -0,0 +1,107 @@
+import json
+import os
+import threading
+from collections import namedtuple
+import numpy as np
+from backend.query_filters import matches_filter
+
+# The file names of a namespace written by the data service (see LocalEmbeddingStorage in embedding_storage.py there)
+VECTORS_FILE = "vectors.f32"
+METADATA_FILE = "metadata.jsonl"
+
+# Responses with the attributes of the Pinecone responses that LLM_connection reads
+FetchedVector = namedtuple("FetchedVector", ["id", "values", "metadata"])
+FetchResponse = namedtuple("FetchResponse", ["namespace", "vectors"])
+IndexStats = namedtuple("IndexStats", ["dimension", "total_vector_count", "namespaces"])
+
+
+class LocalIndex:
+    """
+    Read-only Pinecone-compatible index over the vectors stored locally by the data service.
+    Every namespace is a directory of unit-normalised float32 vectors and a JSON lines metadata file,
+    so a query is a matrix-vector product over the memory-mapped vectors. Metadata filters are
+    evaluated like the filters of hotels fetched without them (see matches_filter).
+    A namespace is reloaded when its metadata file changed, e.g. while the ingestion is running.
+    """
+
+    def __init__(self, path, index_name, dimension):
+        self.directory = os.path.join(path, index_name)
+        self.dimension = dimension
+        self.namespaces = {}
+        # queries run in the threads of pinecone_executor
+        self.lock = threading.Lock()
+
+    def query(self, vector, top_k=10, namespace="", include_values=False, include_metadata=False, filter=None):
+        ids, metadata, matrix, _ = self.get_namespace(namespace)
+        query = np.asarray(vector, dtype=np.float32)
+        query /= max(np.linalg.norm(query), 1e-12)
+        scores = matrix @ query if len(ids) else np.empty(0, dtype=np.float32)
+        if filter is not None:
+            scores = np.where([matches_filter(entry, filter) for entry in metadata], scores, -np.inf)
+        rows = np.argsort(-scores, kind="stable")[:top_k]
+        matches = []
+        for row in rows[np.isfinite(scores[rows])].tolist():
+            match = {"id": ids[row], "score": float(scores[row])}
+            if include_values:
+                match["values"] = matrix[row].tolist()
+            if include_metadata:
+                match["metadata"] = metadata[row]
+            matches.append(match)
+        return {"namespace": namespace, "matches": matches}
+
+    def fetch(self, ids, namespace=""):
+        _, metadata, matrix, rows = self.get_namespace(namespace)
+        return FetchResponse(namespace, {
+            id: FetchedVector(id, matrix[rows[id]].tolist(), metadata[rows[id]]) for id in ids if id in rows})
+
+    def describe_index_stats(self):
+        namespaces = {}
+        if os.path.isdir(self.directory):
+            for namespace in sorted(os.listdir(self.directory)):
+                namespaces[namespace] = {"vector_count": len(self.get_namespace(namespace)[0])}
+        return IndexStats(self.dimension, sum(stats["vector_count"] for stats in namespaces.values()), namespaces)
+
+    def get_namespace(self, namespace):
+        """
+        Return the ids, the metadata, the vectors and the rows by id of a namespace, loaded again if the
+        files changed.
+        """
+        directory = os.path.join(self.directory, namespace)
+        metadata_path = os.path.join(directory, METADATA_FILE)
+        stat = os.stat(metadata_path) if os.path.exists(metadata_path) else None
+        version = (stat.st_mtime_ns, stat.st_size) if stat else None
+        with self.lock:
+            loaded = self.namespaces.get(namespace)
+            if loaded is None or loaded[0] != version:
+                loaded = (version,) + load_namespace(directory, self.dimension)
+                self.namespaces[namespace] = loaded
+            return loaded[1:]
+
+
+def load_namespace(directory, dimension):
+    """
+    Read the ids, the metadata, the vectors and the rows by id of a namespace. Later metadata lines overwrite earlier
+    lines of the same row, and rows without a vector (being appended right now) are left out.
+    """
+    ids, metadata = [], []
+    metadata_path = os.path.join(directory, METADATA_FILE)
+    if os.path.exists(metadata_path):
+        with open(metadata_path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                row = entry["row"]
+                if row == len(ids):
+                    ids.append(entry["id"])
+                    metadata.append(entry["metadata"])
+                elif row < len(ids):
+                    ids[row] = entry["id"]
+                    metadata[row] = entry["metadata"]
+    vectors_path = os.path.join(directory, VECTORS_FILE)
+    rows = min(len(ids), os.path.getsize(vectors_path) // (4 * dimension) if os.path.exists(vectors_path) else 0)
+    if rows == 0:
+        return [], [], np.empty((0, dimension), dtype=np.float32), {}
+    matrix = np.memmap(vectors_path, dtype=np.float32, mode="r", shape=(rows, dimension))
+    return ids[:rows], metadata[:rows], matrix, {id: row for row, id in enumerate(ids[:rows])}
@@ -0,0 +1,67 @@
+import json
+import os
+import tempfile
+import unittest
+import numpy as np
+from backend.local_index import LocalIndex
+
+
+class TestLocalIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.namespace_directory = os.path.join(self.directory.name, "hotels-gemini", "hotels")
+        os.makedirs(self.namespace_directory)
+        self.index = LocalIndex(self.directory.name, "hotels-gemini", 2)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def append(self, rows):
+        """
+        Append rows (id, vector, metadata) the way the data service stores them.
+        """
+        with open(os.path.join(self.namespace_directory, "vectors.f32"), "ab") as f:
+            vectors = np.asarray([vector for _, vector, _ in rows], dtype=np.float32)
+            f.write((vectors / np.linalg.norm(vectors, axis=1, keepdims=True)).tobytes())
+        with open(os.path.join(self.namespace_directory, "metadata.jsonl"), "a", encoding="utf-8") as f:
+            start = len(self.index.get_namespace("hotels")[0])
+            for row, (id, _, metadata) in enumerate(rows, start):
+                f.write(json.dumps({"row": row, "id": id, "metadata": metadata}) + "\n")
+
+    def test_query_returns_matches_like_pinecone(self):
+        self.append([("1", [1, 0], {"city_name": "Rome"}), ("2", [0, 1], {"city_name": "Rome"}),
+                     ("3", [1, 1], {"city_name": "Milan"})])
+
+        results = self.index.query(vector=[1, 0.1], top_k=2, namespace="hotels", include_metadata=True)
+        filtered = self.index.query(vector=[1, 0.1], top_k=5, namespace="hotels",
+                                    include_metadata=True, filter={"city_name": {"$eq": "Rome"}})
+
+        self.assertEqual(["1", "3"], [match["id"] for match in results.get("matches", [])])
+        self.assertEqual({"city_name": "Rome"}, results["matches"][0]["metadata"])
+        self.assertEqual(["1", "2"], [match["id"] for match in filtered["matches"]])
+
+    def test_fetch_and_stats(self):
+        self.append([("1", [1, 0], {"hotel_name": "A"}), ("2", [0, 1], {"hotel_name": "B"})])
+
+        response = self.index.fetch(ids=["2", "9"], namespace="hotels")
+
+        self.assertEqual(["2"], list(response.vectors))
+        self.assertEqual({"hotel_name": "B"}, response.vectors["2"].metadata)
+        self.assertEqual(2, self.index.describe_index_stats().total_vector_count)
+
+    def test_rows_stored_later_are_found(self):
+        self.append([("1", [1, 0], {})])
+        self.assertEqual(1, len(self.index.query(vector=[0, 1], top_k=5, namespace="hotels")["matches"]))
+
+        self.append([("2", [0, 1], {})])
+
+        self.assertEqual("2", self.index.query(vector=[0, 1], top_k=5, namespace="hotels")["matches"][0]["id"])
+
+    def test_missing_namespace_is_empty(self):
+        self.assertEqual([], self.index.query(vector=[1, 0], namespace="other")["matches"])
+        self.assertEqual({}, self.index.fetch(ids=["1"], namespace="other").vectors)
+
+
+if __name__ == '__main__':
+    unittest.main()
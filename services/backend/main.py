@@ -1,15 +1,199 @@
-from fastapi import FastAPI
+import asyncio
+import time
+import uuid
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException, Request, Response
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from pydantic import BaseModel
-from backend.LLM_connection import get_hotel_recommendations
+from backend.LLM_connection import get_hotel_recommendations, prepare_recommendation, stream_hotel_recommendations, response_cache, query_embedder, StageTimeoutError
+from backend.LLM_connection import load_indexes, warm_up, is_ready, startup_state, pinecone_executor
+from backend.LLM_connection import metrics, observe_timings
 
-app = FastAPI()
+# Seconds between checks whether the client is still connected
+DISCONNECT_POLL_INTERVAL = 0.5
+# Status code logged for requests whose client disconnected (as in nginx)
+CLIENT_CLOSED_REQUEST = 499
+# Returned by cancel_on_disconnect instead of a result
+DISCONNECTED = object()
+# Header carrying the trace id of a request, taken from the request if the client sets it
+TRACE_ID_HEADER = "X-Trace-Id"
+
+request_latency = metrics.histogram(
+    "http_request_duration_seconds", "Duration of the requests until the last byte of the response.", ["path"])
+requests_total = metrics.counter(
+    "http_requests_total", "Requests by path and status code.", ["method", "path", "status"])
+
+
+
+class RequestMetricsMiddleware:
+    """
+    Gives every request a trace id (request.state.trace_id, returned in the X-Trace-Id header and
+    logged with unhandled errors) and records its duration and status code. Streamed responses are measured until their last chunk.
+    Paths that are not routes of the app are counted as "other", to bound the number of label values.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        headers = dict(scope["headers"])
+        trace_id = headers.get(TRACE_ID_HEADER.lower().encode(), b"").decode("latin-1")[:64] or uuid.uuid4().hex
+        scope.setdefault("state", {})["trace_id"] = trace_id
+        routes = {route.path for route in scope["app"].routes} if "app" in scope else set()
+        path = scope["path"] if scope["path"] in routes else "other"
+        start = time.perf_counter()
+        # the status code, 500 until the response starts
+        status = [500]
+
+        async def send_with_trace_id(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+                message["headers"] = list(message.get("headers", [])) + [
+                    (TRACE_ID_HEADER.lower().encode(), trace_id.encode("latin-1"))]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_trace_id)
+        except Exception as e:
+            # the error response is sent by Starlette, without the trace id
+            print(f"[{trace_id}] Request failed: {e!r}")
+            raise
+        finally:
+            request_latency.observe(time.perf_counter() - start, path=path)
+            requests_total.inc(method=scope["method"], path=path, status=status[0])
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Load the local indexes before the server accepts requests, then create the clients and warm up
+    in the background, so the server starts without waiting for Gemini and Pinecone.
+    /api/health reports that the server is up, /api/ready when the warm-up is done.
+    """
+    await asyncio.get_running_loop().run_in_executor(None, load_indexes)
+    warm_up_task = asyncio.create_task(warm_up())
+    yield
+    warm_up_task.cancel()
+    pinecone_executor.shutdown(wait=False, cancel_futures=True)
+
+
+app = FastAPI(lifespan=lifespan)
+app.add_middleware(RequestMetricsMiddleware)
 
 class UserInput(BaseModel):
     user_prompt: str
 
+
+async def cancel_on_disconnect(request: Request, task: asyncio.Task):
+    """
+    Wait for the task, cancelling it when the client disconnects. Returns DISCONNECTED if it was cancelled.
+    """
+    try:
+        while True:
+            done, _ = await asyncio.wait({task}, timeout=DISCONNECT_POLL_INTERVAL)
+            if done:
+                return task.result()
+            if await request.is_disconnected():
+                print("Client disconnected, cancelling the recommendation")
+                task.cancel()
+                return DISCONNECTED
+    finally:
+        # the request handler itself may be cancelled, e.g. on shutdown
+        task.cancel()
+
+
 @app.post("/api/hotel")
-async def get_hotels(input: UserInput):
-    print("Received user prompt:", input.user_prompt)
-    hotels = get_hotel_recommendations(input.user_prompt)
-    print("Generated hotel recommendations:", hotels)
-    return {"answer": hotels }
+async def get_hotels(input: UserInput, request: Request):
+    trace_id = request.state.trace_id
+    print(f"[{trace_id}] Received user prompt:", input.user_prompt)
+    timings = {}
+    prompt_size = {}
+    task = asyncio.create_task(get_hotel_recommendations(input.user_prompt, timings, prompt_size))
+    try:
+        hotels = await cancel_on_disconnect(request, task)
+    except StageTimeoutError as e:
+        raise HTTPException(status_code=504, detail=str(e))
+    finally:
+        observe_timings(timings)
+    if hotels is DISCONNECTED:
+        return Response(status_code=CLIENT_CLOSED_REQUEST)
+    print(f"[{trace_id}] Generated hotel recommendations:", hotels)
+    print(f"[{trace_id}] Stage timings (ms):", timings)
+    return {"answer": hotels, "timings": timings, "prompt": prompt_size}
+
+
+@app.post("/api/hotel/stream")
+async def stream_hotels(input: UserInput, request: Request):
+    """
+    Like /api/hotel, but the answer is streamed as plain text while Gemini generates it.
+    Errors before the first chunk are returned as status codes, later ones are appended to the text.
+    """
+    trace_id = request.state.trace_id
+    print(f"[{trace_id}] Received user prompt (stream):", input.user_prompt)
+    timings = {}
+    task = asyncio.create_task(prepare_recommendation(input.user_prompt, timings))
+    try:
+        preparation = await cancel_on_disconnect(request, task)
+    except BaseException as e:
+        observe_timings(timings)
+        if isinstance(e, StageTimeoutError):
+            raise HTTPException(status_code=504, detail=str(e))
+        raise
+    if preparation is DISCONNECTED:
+        observe_timings(timings)
+        return Response(status_code=CLIENT_CLOSED_REQUEST)
+
+    async def answer_chunks():
+        # the response is cancelled by Starlette if the client disconnects while streaming
+        try:
+            async for text in stream_hotel_recommendations(input.user_prompt, preparation, timings):
+                yield text
+        except StageTimeoutError as e:
+            yield f"\n\nError: {e}"
+        finally:
+            observe_timings(timings)
+        print(f"[{trace_id}] Stage timings (ms):", timings)
+
+    # disable response buffering of proxies such as nginx
+    headers = {"X-Accel-Buffering": "no"}
+    if preparation.prompt_stats is not None:
+        headers["X-Prompt-Tokens"] = str(preparation.prompt_stats.tokens)
+    return StreamingResponse(answer_chunks(), media_type="text/plain; charset=utf-8", headers=headers)
+
+
+@app.get("/api/hotel/cache")
+async def get_cache_stats():
+    """
+    Hit rate and size of the response cache and of the query embedding cache.
+    """
+    return {**response_cache.stats(), "query_embeddings": query_embedder.stats()}
+
+
+@app.get("/api/health")
+async def get_health():
+    """
+    Liveness of the service: 200 as soon as it accepts requests (readiness is reported by /api/ready).
+    """
+    return {"status": "ok"}
+
+
+@app.get("/api/ready")
+async def get_readiness():
+    """
+    Readiness of the service: 200 once the indexes are loaded and the warm-up is done, 503 before,
+    e.g. while the clients cannot be created yet (the warm-up keeps trying). Includes the duration
+    of every startup step (ms) and the errors of the steps that failed last.
+    """
+    return JSONResponse({"ready": is_ready(), **startup_state}, status_code=200 if is_ready() else 503)
+
+
+@app.get("/metrics")
+async def get_metrics():
+    """
+    Latency histograms of the requests, the pipeline stages and the Gemini requests, and the request
+    and error counters, in the Prometheus text format.
+    """
+    return PlainTextResponse(metrics.render(), media_type=metrics.CONTENT_TYPE)
@@ -0,0 +1,50 @@
+import unittest
+from backend.metrics import MetricsRegistry
+
+
+class TestMetricsRegistry(unittest.TestCase):
+
+    def test_counters_and_histograms_are_rendered_for_prometheus(self):
+        registry = MetricsRegistry()
+        requests = registry.counter("requests_total", "Requests.", ["path"])
+        latency = registry.histogram("latency_seconds", "Latency.", ["stage"], buckets=(0.1, 1))
+        requests.inc(path="/a")
+        requests.inc(2, path="/b\"")
+        latency.observe(0.05, stage="llm")
+        latency.observe(0.5, stage="llm")
+        latency.observe(5, stage="llm")
+
+        self.assertEqual("\n".join([
+            "# HELP requests_total Requests.",
+            "# TYPE requests_total counter",
+            "requests_total{path=\"/a\"} 1",
+            "requests_total{path=\"/b\\\"\"} 2",
+            "# HELP latency_seconds Latency.",
+            "# TYPE latency_seconds histogram",
+            "latency_seconds_bucket{stage=\"llm\",le=\"0.1\"} 1",
+            "latency_seconds_bucket{stage=\"llm\",le=\"1\"} 2",
+            "latency_seconds_bucket{stage=\"llm\",le=\"+Inf\"} 3",
+            "latency_seconds_sum{stage=\"llm\"} 5.55",
+            "latency_seconds_count{stage=\"llm\"} 3",
+        ]) + "\n", registry.render())
+
+    def test_time_observes_also_if_the_block_raises(self):
+        registry = MetricsRegistry()
+        latency = registry.histogram("latency_seconds", "Latency.")
+
+        with self.assertRaises(RuntimeError):
+            with latency.time():
+                raise RuntimeError()
+
+        self.assertEqual(1, sum(latency.values[()][0]))
+
+    def test_names_are_unique(self):
+        registry = MetricsRegistry()
+        registry.counter("requests_total", "Requests.")
+
+        with self.assertRaises(ValueError):
+            registry.counter("requests_total", "Requests.")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,138 @@
+import math
+import re
+from collections import namedtuple
+
+# Fields of a hotel that go into a prompt, with their label, in this order
+PROMPT_FIELDS = [
+    ("hotel_name", "name"),
+    ("star_rating", "stars"),
+    ("city_name", "city"),
+    ("country_name", "country"),
+    ("address", "address"),
+    ("distance_km", "distance to the requested place (km)"),
+    ("nearest_attraction_km", "nearest attraction (km)"),
+    ("airport_km", "airport (km)"),
+    ("facilities", "facilities"),
+    ("attractions", "attractions"),
+    ("description", "description"),
+]
+# Fields that are left out one after another, from the first, while a prompt exceeds its budget
+OPTIONAL_FIELDS = ["attractions", "facilities", "description"]
+
+UNKNOWN_VALUES = {"", "Unknown", "unknown", "All"}
+TAG_PATTERN = re.compile(r"<[^>]+>")
+# line breaks and paragraphs between the entries of the Attractions field
+ENTRY_SEPARATOR_PATTERN = re.compile(r"(\s*(<br\s*/?>|</?p>)\s*)+")
+ATTRACTIONS_HEADER_PATTERN = re.compile(r"^\s*Distances are.*?(<br\s*/?>|$)", re.IGNORECASE)
+WHITESPACE_PATTERN = re.compile(r"\s+")
+
+# Size of a prompt: estimated tokens, characters, hotels in the prompt and what was cut to fit the budget
+PromptStats = namedtuple("PromptStats", ["tokens", "characters", "hotels", "dropped_hotels",
+                                         "description_chars", "dropped_fields"])
+
+
+def estimate_tokens(text, chars_per_token=4):
+    """
+    Estimate the number of tokens of a text (Gemini averages about four characters per token).
+    """
+    return math.ceil(len(text) / chars_per_token)
+
+
+def is_unknown(value):
+    if value is None:
+        return True
+    if isinstance(value, float):
+        return math.isnan(value)
+    if isinstance(value, list):
+        return not value
+    return str(value).strip() in UNKNOWN_VALUES
+
+
+def plain_text(html):
+    return WHITESPACE_PATTERN.sub(" ", TAG_PATTERN.sub(" ", html)).strip()
+
+
+def truncate(text, max_chars):
+    """
+    Cut a text at the last word boundary before max_chars and mark the cut.
+    """
+    if len(text) <= max_chars:
+        return text
+    cut = text[:max_chars].rsplit(" ", 1)[0]
+    return cut.rstrip(" ,.;:") + " …"
+
+
+class PromptBuilder:
+    """
+    Builds the recommendation prompt within a token budget.
+    Only the fields of PROMPT_FIELDS that are known are listed per hotel, facilities are given as the
+    tags derived at ingestion (or the shortened facility text of hotels ingested before) and HTML is
+    reduced to text. Descriptions are truncated to description_chars. While the prompt exceeds the
+    budget, the descriptions are halved down to min_description_chars, then the OPTIONAL_FIELDS are
+    left out and finally the last hotels are dropped.
+    """
+
+    def __init__(self, token_budget=2500, description_chars=400, min_description_chars=100,
+                 attraction_chars=250, facility_chars=250):
+        self.token_budget = token_budget
+        self.description_chars = description_chars
+        self.min_description_chars = min_description_chars
+        self.attraction_chars = attraction_chars
+        self.facility_chars = facility_chars
+
+    def field_value(self, hotel, field, description_chars):
+        if field == "facilities":
+            tags = hotel.get("facilities")
+            if isinstance(tags, list) and tags:
+                return ", ".join(tag.replace("_", " ") for tag in tags)
+            text = hotel.get("hotel_facilities")
+            return None if is_unknown(text) else truncate(plain_text(str(text)), self.facility_chars)
+        value = hotel.get(field)
+        if is_unknown(value):
+            return None
+        if field == "star_rating":
+            return None if value == 0 else str(int(value))
+        if isinstance(value, float):
+            return f"{value:g}"
+        if field == "attractions":
+            text = ATTRACTIONS_HEADER_PATTERN.sub("", str(value), count=1)
+            text = plain_text(ENTRY_SEPARATOR_PATTERN.sub("; ", text)).strip("; ")
+            return truncate(text, self.attraction_chars) if text else None
+        if field == "description":
+            return truncate(plain_text(str(value)), description_chars)
+        return str(value)
+
+    def hotel_line(self, hotel, description_chars, dropped_fields):
+        parts = []
+        for field, label in PROMPT_FIELDS:
+            if field in dropped_fields:
+                continue
+            value = self.field_value(hotel, field, description_chars)
+            if value is not None:
+                parts.append(f"{label}: {value}")
+        return "- " + "; ".join(parts)
+
+    def build(self, hotels, header, footer):
+        """
+        Return the prompt listing the hotels (dictionaries of metadata) between header and footer,
+        and its PromptStats.
+        """
+        description_chars = self.description_chars
+        dropped_fields = []
+        count = len(hotels)
+        while True:
+            lines = [self.hotel_line(hotel, description_chars, dropped_fields) for hotel in hotels[:count]]
+            prompt = f"{header}\n" + "\n".join(lines) + f"\n\n{footer}"
+            tokens = estimate_tokens(prompt)
+            if tokens <= self.token_budget:
+                break
+            if description_chars > self.min_description_chars:
+                description_chars = max(description_chars // 2, self.min_description_chars)
+            elif len(dropped_fields) < len(OPTIONAL_FIELDS):
+                dropped_fields.append(OPTIONAL_FIELDS[len(dropped_fields)])
+            elif count > 1:
+                count -= 1
+            else:
+                break
+        return prompt, PromptStats(tokens, len(prompt), count, len(hotels) - count,
+                                   description_chars, dropped_fields)
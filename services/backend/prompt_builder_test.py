@@ -0,0 +1,43 @@
+import unittest
+from backend.prompt_builder import PromptBuilder, estimate_tokens
+
+
+def hotel(name, description_length=0):
+    return {"hotel_name": name, "star_rating": 4, "city_name": "Rome", "country_name": "Unknown",
+            "facilities": ["wifi", "room_service"], "attractions": "Distances are displayed<br />Colosseum - 1 km<br />Forum - 2 km",
+            "description": "<p>" + "word " * (description_length // 5) + "</p>"}
+
+
+class TestPromptBuilder(unittest.TestCase):
+
+    def test_only_known_fields_are_listed(self):
+        prompt, stats = PromptBuilder().build([hotel("A", 20)], "Hotels:", "Answer.")
+
+        self.assertEqual("Hotels:\n- name: A; stars: 4; city: Rome; facilities: wifi, room service; "
+                         "attractions: Colosseum - 1 km; Forum - 2 km; description: word word word word\n\nAnswer.", prompt)
+        self.assertEqual((1, 0, []), (stats.hotels, stats.dropped_hotels, stats.dropped_fields))
+        self.assertEqual(estimate_tokens(prompt), stats.tokens)
+
+    def test_descriptions_are_shortened_before_fields_are_dropped(self):
+        builder = PromptBuilder(token_budget=120, description_chars=400, min_description_chars=100)
+
+        prompt, stats = builder.build([hotel("A", 400), hotel("B", 400)], "Hotels:", "Answer.")
+
+        self.assertLessEqual(stats.tokens, 120)
+        self.assertEqual(2, stats.hotels)
+        self.assertEqual(100, stats.description_chars)
+        self.assertIn("…", prompt)
+
+    def test_optional_fields_and_then_hotels_are_dropped(self):
+        builder = PromptBuilder(token_budget=15, min_description_chars=50)
+
+        prompt, stats = builder.build([hotel("A", 400), hotel("B", 400)], "Hotels:", "Answer.")
+
+        self.assertEqual(["attractions", "facilities", "description"], stats.dropped_fields)
+        self.assertEqual((1, 1), (stats.hotels, stats.dropped_hotels))
+        self.assertNotIn("name: B", prompt)
+        self.assertLessEqual(stats.tokens, 15)
+
+
+if __name__ == '__main__':
+    unittest.main()
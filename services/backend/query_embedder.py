@@ -0,0 +1,103 @@
+import asyncio
+import time
+from collections import OrderedDict
+from backend.response_cache import SemanticResponseCache
+
+
+class QueryEmbedder:
+    """
+    Embeds user prompts for the vector query.
+    Embeddings are cached by prompt (ignoring case and whitespace) for ttl_seconds, the least recently
+    used beyond max_entries are evicted. Prompts that are not cached are collected for max_wait seconds
+    (or until max_batch_size prompts are waiting) and embedded with a single request, so concurrent
+    requests share one embedding call. Identical prompts in flight are embedded once.
+    """
+
+    def __init__(self, embed_batch, max_entries=10000, ttl_seconds=3600, max_wait=0.005, max_batch_size=100):
+        # coroutine function that embeds a list of texts and returns one vector per text
+        self.embed_batch = embed_batch
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.max_wait = max_wait
+        self.max_batch_size = max_batch_size
+        # key -> (vector, time it was cached)
+        self.entries = OrderedDict()
+        # key -> future of the embedding, for the prompts waiting for or in the current batch requests
+        self.pending = {}
+        self.batch = []
+        self.flush_handle = None
+        self.hits = 0
+        self.misses = 0
+        self.batches = 0
+        self.batched_prompts = 0
+
+    async def embed(self, prompt):
+        key = SemanticResponseCache.key(prompt)
+        entry = self.entries.get(key)
+        if entry is not None and time.monotonic() - entry[1] <= self.ttl_seconds:
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+        self.misses += 1
+
+        future = self.pending.get(key)
+        if future is None:
+            future = asyncio.get_running_loop().create_future()
+            self.pending[key] = future
+            self.batch.append((key, prompt))
+            if len(self.batch) >= self.max_batch_size:
+                self.flush()
+            elif self.flush_handle is None:
+                self.flush_handle = asyncio.get_running_loop().call_later(self.max_wait, self.flush)
+        # a cancelled request must not cancel the embedding other requests wait for
+        return await asyncio.shield(future)
+
+    def flush(self):
+        """
+        Send the waiting prompts as one embedding request.
+        """
+        if self.flush_handle is not None:
+            self.flush_handle.cancel()
+            self.flush_handle = None
+        batch, self.batch = self.batch, []
+        if batch:
+            self.batches += 1
+            self.batched_prompts += len(batch)
+            asyncio.ensure_future(self.run_batch(batch))
+
+    async def run_batch(self, batch):
+        try:
+            vectors = await self.embed_batch([prompt for _, prompt in batch])
+        except BaseException as e:
+            for key, _ in batch:
+                future = self.pending.pop(key)
+                if not future.done():
+                    future.set_exception(e)
+                    # retrieved here, in case every waiting request was cancelled meanwhile
+                    future.exception()
+            if not isinstance(e, Exception):
+                raise
+            return
+        now = time.monotonic()
+        for (key, _), vector in zip(batch, vectors):
+            self.entries[key] = (vector, now)
+            self.entries.move_to_end(key)
+            future = self.pending.pop(key)
+            if not future.done():
+                future.set_result(vector)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    def clear(self):
+        self.entries.clear()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self.entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else None,
+            "batches": self.batches,
+            "average_batch_size": self.batched_prompts / self.batches if self.batches else None,
+        }
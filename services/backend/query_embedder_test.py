@@ -0,0 +1,57 @@
+import asyncio
+import unittest
+from backend.query_embedder import QueryEmbedder
+
+
+class TestQueryEmbedder(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.requests = []
+
+    async def embed_batch(self, texts):
+        self.requests.append(list(texts))
+        await asyncio.sleep(0)
+        return [[float(len(text))] for text in texts]
+
+    async def test_concurrent_prompts_are_embedded_in_one_request(self):
+        embedder = QueryEmbedder(self.embed_batch, max_wait=0.01)
+
+        vectors = await asyncio.gather(embedder.embed("rome"), embedder.embed("paris"),
+                                       embedder.embed("Rome "))
+
+        self.assertEqual([[4.0], [5.0], [4.0]], vectors)
+        # identical prompts in flight are embedded once
+        self.assertEqual([["rome", "paris"]], self.requests)
+        self.assertEqual(2.0, embedder.stats()["average_batch_size"])
+
+    async def test_full_batches_are_sent_without_waiting(self):
+        embedder = QueryEmbedder(self.embed_batch, max_wait=60, max_batch_size=2)
+
+        vectors = await asyncio.wait_for(asyncio.gather(embedder.embed("a"), embedder.embed("bb")), 1)
+
+        self.assertEqual([[1.0], [2.0]], vectors)
+
+    async def test_cached_prompts_are_not_embedded_again(self):
+        embedder = QueryEmbedder(self.embed_batch, max_entries=1, max_wait=0)
+
+        await embedder.embed("rome")
+        await embedder.embed("ROME")
+        await embedder.embed("paris")
+        await embedder.embed("rome")
+
+        self.assertEqual([["rome"], ["paris"], ["rome"]], self.requests)
+        self.assertEqual((1, 3), (embedder.hits, embedder.misses))
+
+    async def test_errors_reach_every_waiting_prompt(self):
+        async def failing_batch(texts):
+            raise RuntimeError("embedding failed")
+
+        embedder = QueryEmbedder(failing_batch, max_wait=0.01)
+        results = await asyncio.gather(embedder.embed("a"), embedder.embed("b"), return_exceptions=True)
+
+        self.assertTrue(all(isinstance(result, RuntimeError) for result in results))
+        self.assertEqual({}, embedder.pending)
+
+
+if __name__ == '__main__':
+    unittest.main()
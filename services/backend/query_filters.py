@@ -0,0 +1,140 @@
+import re
+from backend.gazetteer import normalize_name
+
+# Stars of the hotel_rating values, and the facilities a prompt can ask for with the phrases that
+# indicate them: copies of the tables the data service uses to derive the 'star_rating' and
+# 'facilities' metadata of the hotels (hotel_metadata.py), kept equal by data_tables_test.py
+STAR_RATINGS = {"OneStar": 1, "TwoStar": 2, "ThreeStar": 3, "FourStar": 4, "FiveStar": 5}
+
+FACILITY_KEYWORDS = {
+    "wifi": ["wifi", "wi fi", "wireless internet", "internet access"],
+    "parking": ["parking"],
+    "pool": ["pool", "swimming"],
+    "spa": ["spa", "sauna", "massage", "hot tub", "jacuzzi"],
+    "gym": ["fitness", "gym"],
+    "restaurant": ["restaurant"],
+    "bar": ["bar", "bars", "lounge"],
+    "breakfast": ["breakfast"],
+    "airport_shuttle": ["airport shuttle", "airport transfer", "airport transportation"],
+    "accessible": ["wheelchair"],
+    "air_conditioning": ["air conditioning", "air conditioned"],
+    "beach": ["beach"],
+    "family": ["kids club", "childrens club", "playground", "babysitting", "family rooms"],
+    "laundry": ["laundry"],
+    "room_service": ["room service"],
+    "non_smoking": ["smoke free", "non smoking"],
+    "meeting_rooms": ["meeting room", "meeting rooms", "conference"],
+    "kitchen": ["kitchen", "kitchenette"],
+    "ev_charging": ["electric vehicle charging", "ev charging"],
+}
+
+FACILITY_PATTERN = re.compile(r"\b(" + "|".join(sorted(
+    (re.escape(phrase) for phrases in FACILITY_KEYWORDS.values() for phrase in phrases), key=len, reverse=True)) + r")\b")
+FACILITY_OF_PHRASE = {phrase: facility for facility,
+                      phrases in FACILITY_KEYWORDS.items() for phrase in phrases}
+
+STAR_NUMBERS = {"one": 1, "two": 2, "three": 3, "four": 4, "five": 5}
+# "4 star", "four-star", "at least 4 stars", "4 stars or more", "4+ stars" (on normalized prompts,
+# where "4+" has become "4")
+STAR_PATTERN = re.compile(
+    r"\b(at least |minimum |min )?([1-5]|one|two|three|four|five) ?stars?\b( or more| or better| and above| and up| plus)?")
+MIN_STAR_PATTERN = re.compile(r"\b([1-5])\+ ?stars?\b")
+
+
+def prompt_facilities(user_prompt):
+    """
+    Return the facilities of FACILITY_KEYWORDS the prompt asks for, in the order they occur.
+    """
+    facilities = [FACILITY_OF_PHRASE[phrase]
+                  for phrase in FACILITY_PATTERN.findall(normalize_name(user_prompt))]
+    return list(dict.fromkeys(facilities))
+
+
+def prompt_star_condition(user_prompt):
+    """
+    Return the Pinecone condition on 'star_rating' the prompt asks for, or None.
+    "4 star" asks for exactly four stars, "at least 4 stars" and "4+ stars" for four or more.
+    """
+    match = MIN_STAR_PATTERN.search(user_prompt.lower())
+    if match:
+        return {"$gte": int(match.group(1))}
+    match = STAR_PATTERN.search(normalize_name(user_prompt))
+    if match is None:
+        return None
+    stars = STAR_NUMBERS.get(match.group(2)) or int(match.group(2))
+    return {"$gte": stars} if match.group(1) or match.group(3) else {"$eq": stars}
+
+
+def filter_conditions(user_prompt, locations, area=None):
+    """
+    Return the metadata conditions of the prompt, most important first: the area around an
+    attraction (a condition on latitude and longitude), the locations (dataset values of the
+    gazetteer), the star rating and each requested facility.
+    """
+    conditions = [area] if area is not None else []
+    if locations:
+        conditions.append({"$or": [{"country_name": {"$in": locations}},
+                                   {"city_name": {"$in": locations}}]})
+    star_condition = prompt_star_condition(user_prompt)
+    if star_condition is not None:
+        conditions.append({"star_rating": star_condition})
+    conditions.extend({"facilities": {"$in": [facility]}}
+                      for facility in prompt_facilities(user_prompt))
+    return conditions
+
+
+def relaxed_filters(conditions, max_filters=None):
+    """
+    Return the filters to try one after another until a query matches hotels: all conditions first,
+    then with the least important condition dropped one at a time and finally no filter (None).
+    With max_filters, only the most specific filters are tried before falling back to no filter.
+    """
+    filters = [{"$and": conditions[:count]} if count > 1 else conditions[0]
+               for count in range(len(conditions), 0, -1)]
+    if max_filters is not None:
+        filters = filters[:max(max_filters - 1, 0)]
+    return filters + [None]
+
+
+def matches_filter(metadata, query_filter):
+    """
+    Return whether metadata fulfil a Pinecone metadata filter (for hotels retrieved without it).
+    """
+    if query_filter is None:
+        return True
+    for key, condition in query_filter.items():
+        if key == "$and":
+            if not all(matches_filter(metadata, sub_filter) for sub_filter in condition):
+                return False
+        elif key == "$or":
+            if not any(matches_filter(metadata, sub_filter) for sub_filter in condition):
+                return False
+        elif not matches_condition(metadata.get(key), condition):
+            return False
+    return True
+
+
+def matches_condition(value, condition):
+    if not isinstance(condition, dict):
+        condition = {"$eq": condition}
+    values = value if isinstance(value, list) else [] if value is None else [value]
+    for operator, operand in condition.items():
+        if operator == "$eq":
+            matched = operand in values
+        elif operator == "$ne":
+            matched = operand not in values
+        elif operator == "$in":
+            matched = any(element in operand for element in values)
+        elif operator == "$nin":
+            matched = not any(element in operand for element in values)
+        elif operator == "$exists":
+            matched = bool(values) == operand
+        elif operator in ("$gt", "$gte", "$lt", "$lte"):
+            numbers = [element for element in values if isinstance(element, (int, float))]
+            matched = any({"$gt": element > operand, "$gte": element >= operand,
+                           "$lt": element < operand, "$lte": element <= operand}[operator] for element in numbers)
+        else:
+            raise ValueError(f"Unsupported filter operator: {operator}")
+        if not matched:
+            return False
+    return True
@@ -0,0 +1,64 @@
+import unittest
+from backend.query_filters import filter_conditions, matches_filter, prompt_facilities, prompt_star_condition, relaxed_filters
+
+
+class TestFilterConditions(unittest.TestCase):
+
+    def test_star_ratings_of_prompts(self):
+        self.assertEqual({"$eq": 4}, prompt_star_condition("a four-star hotel"))
+        self.assertEqual({"$gte": 4}, prompt_star_condition("at least 4 stars"))
+        self.assertEqual({"$gte": 3}, prompt_star_condition("3+ stars please"))
+        self.assertEqual({"$gte": 5}, prompt_star_condition("5 stars or better"))
+        self.assertIsNone(prompt_star_condition("a hotel with stars on the ceiling"))
+
+    def test_facilities_of_prompts(self):
+        self.assertEqual(["spa", "wifi", "pool"], prompt_facilities("Sauna, Wi-Fi and a swimming pool"))
+        self.assertEqual([], prompt_facilities("a barbecue"))
+
+    def test_conditions_are_ordered_by_importance(self):
+        area = {"latitude": {"$gte": 1}}
+
+        conditions = filter_conditions("4 star hotel with parking", ["Rome"], area)
+
+        self.assertEqual([area,
+                          {"$or": [{"country_name": {"$in": ["Rome"]}}, {"city_name": {"$in": ["Rome"]}}]},
+                          {"star_rating": {"$eq": 4}},
+                          {"facilities": {"$in": ["parking"]}}], conditions)
+
+
+class TestMatchesFilter(unittest.TestCase):
+
+    def test_metadata_is_matched_like_by_pinecone(self):
+        metadata = {"city_name": "Rome", "star_rating": 4, "facilities": ["pool", "spa"]}
+
+        self.assertTrue(matches_filter(metadata, None))
+        self.assertTrue(matches_filter(metadata, {"$and": [{"star_rating": {"$gte": 4}},
+                                                           {"facilities": {"$in": ["spa"]}}]}))
+        self.assertTrue(matches_filter(metadata, {"$or": [{"country_name": {"$in": ["Rome"]}},
+                                                          {"city_name": {"$in": ["Rome"]}}]}))
+        self.assertTrue(matches_filter(metadata, {"city_name": "Rome", "country_name": {"$exists": False}}))
+        self.assertFalse(matches_filter(metadata, {"star_rating": {"$eq": 5}}))
+        self.assertFalse(matches_filter(metadata, {"facilities": {"$nin": ["pool"]}}))
+
+    def test_unsupported_operators_are_rejected(self):
+        with self.assertRaises(ValueError):
+            matches_filter({"city_name": "Rome"}, {"city_name": {"$regex": "R.*"}})
+
+
+class TestRelaxedFilters(unittest.TestCase):
+
+    def test_conditions_are_dropped_from_the_least_important(self):
+        a, b, c = {"a": 1}, {"b": 2}, {"c": 3}
+
+        self.assertEqual([{"$and": [a, b, c]}, {"$and": [a, b]}, a, None], relaxed_filters([a, b, c]))
+        self.assertEqual([None], relaxed_filters([]))
+
+    def test_number_of_filters_is_capped(self):
+        a, b, c = {"a": 1}, {"b": 2}, {"c": 3}
+
+        self.assertEqual([{"$and": [a, b, c]}, {"$and": [a, b]}, None], relaxed_filters([a, b, c], 3))
+        self.assertEqual([None], relaxed_filters([a, b, c], 1))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,135 @@
+import time
+from collections import OrderedDict
+import numpy as np
+
+
+class CacheEntry:
+    __slots__ = ("prompt", "vector", "answer", "created", "constraints")
+
+    def __init__(self, prompt, vector, answer, created, constraints=None):
+        self.prompt = prompt
+        self.vector = vector
+        self.answer = answer
+        self.created = created
+        self.constraints = constraints
+
+
+class SemanticResponseCache:
+    """
+    Cache of recommendation answers keyed by the user prompt.
+    A prompt is answered from the cache if the same prompt (ignoring case and whitespace) was answered
+    before, or if the cosine similarity of its embedding to a cached prompt is at least similarity_threshold
+    and both prompts have the same constraints (e.g. the city and star rating extracted from them, since
+    "4 star hotels in Rome" and "5 star hotels in Milan" embed almost alike).
+    Entries expire after ttl_seconds, the least recently used entries are evicted beyond max_entries,
+    and all entries are dropped when the version of the vector index changes.
+    """
+
+    def __init__(self, max_entries=1000, ttl_seconds=3600, similarity_threshold=0.95):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.similarity_threshold = similarity_threshold
+        self.entries = OrderedDict()
+        self.index_version = None
+        # unit vectors of the entries, rebuilt after the entries changed
+        self._matrix = None
+        self._keys = None
+        self.exact_hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def key(prompt):
+        return " ".join(prompt.lower().split())
+
+    def check_index_version(self, index_version):
+        """
+        Drop all entries if the index version changed since the entries were cached.
+        """
+        if index_version != self.index_version:
+            if self.entries:
+                self.invalidations += 1
+            self.clear()
+            self.index_version = index_version
+
+    def get(self, prompt):
+        """
+        Return the cached answer to the same prompt, or None.
+        """
+        entry = self.entries.get(self.key(prompt))
+        if entry is None or self.expired(entry):
+            return None
+        self.entries.move_to_end(self.key(prompt))
+        self.exact_hits += 1
+        return entry.answer
+
+    def get_similar(self, vector, constraints=None):
+        """
+        Return the cached answer to the most similar prompt with the same constraints if it is similar
+        enough, or None. Counts a miss otherwise, so call it after get.
+        """
+        self.remove_expired()
+        if self.entries:
+            if self._matrix is None:
+                self._keys = list(self.entries)
+                self._matrix = np.stack(
+                    [self.entries[key].vector for key in self._keys])
+            similarities = self._matrix @ unit_vector(vector)
+            similarities[[self.entries[key].constraints != constraints for key in self._keys]] = -np.inf
+            best = int(np.argmax(similarities))
+            if similarities[best] >= self.similarity_threshold:
+                key = self._keys[best]
+                self.entries.move_to_end(key)
+                self.semantic_hits += 1
+                return self.entries[key].answer
+        self.misses += 1
+        return None
+
+    def put(self, prompt, vector, answer, index_version, constraints=None):
+        """
+        Cache the answer to a prompt, unless the index changed while the answer was generated.
+        The constraints are any comparable value, e.g. the metadata filter of the prompt.
+        """
+        if index_version != self.index_version or not answer:
+            return
+        key = self.key(prompt)
+        self.entries[key] = CacheEntry(
+            prompt, unit_vector(vector), answer, time.monotonic(), constraints)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+        self._matrix = None
+
+    def expired(self, entry):
+        return time.monotonic() - entry.created > self.ttl_seconds
+
+    def remove_expired(self):
+        expired = [key for key, entry in self.entries.items()
+                   if self.expired(entry)]
+        for key in expired:
+            del self.entries[key]
+        if expired:
+            self._matrix = None
+
+    def clear(self):
+        self.entries.clear()
+        self._matrix = None
+
+    def stats(self):
+        lookups = self.exact_hits + self.semantic_hits + self.misses
+        return {
+            "entries": len(self.entries),
+            "index_version": self.index_version,
+            "exact_hits": self.exact_hits,
+            "semantic_hits": self.semantic_hits,
+            "misses": self.misses,
+            "hit_rate": (self.exact_hits + self.semantic_hits) / lookups if lookups else None,
+            "invalidations": self.invalidations,
+        }
+
+
+def unit_vector(vector):
+    vector = np.asarray(vector, dtype=np.float32)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm > 0 else vector
@@ -0,0 +1,61 @@
+import unittest
+from unittest import mock
+from backend.response_cache import SemanticResponseCache
+
+
+class TestSemanticResponseCache(unittest.TestCase):
+
+    def setUp(self):
+        self.cache = SemanticResponseCache(max_entries=2, ttl_seconds=60, similarity_threshold=0.95)
+        self.cache.check_index_version("v1")
+
+    def test_same_prompt_ignoring_case_and_whitespace_is_a_hit(self):
+        self.cache.put("Hotels in  Rome", [1, 0], "answer", "v1")
+
+        self.assertEqual("answer", self.cache.get(" hotels in rome "))
+        self.assertIsNone(self.cache.get("hotels in milan"))
+        self.assertEqual(1, self.cache.stats()["exact_hits"])
+
+    def test_similar_prompts_are_hits_above_the_threshold(self):
+        self.cache.put("hotels in rome", [1, 0], "answer", "v1")
+
+        self.assertEqual("answer", self.cache.get_similar([10, 1]))
+        self.assertIsNone(self.cache.get_similar([1, 1]))
+        self.assertEqual((1, 1), (self.cache.semantic_hits, self.cache.misses))
+
+    def test_similar_prompts_need_the_same_constraints(self):
+        rome = {"city_name": {"$in": ["Rome"]}}
+        self.cache.put("4 star hotels in rome", [1, 0], "Rome", "v1", rome)
+
+        self.assertIsNone(self.cache.get_similar([1, 0], {"city_name": {"$in": ["Milan"]}}))
+        self.assertIsNone(self.cache.get_similar([1, 0]))
+        self.assertEqual("Rome", self.cache.get_similar([1, 0], {"city_name": {"$in": ["Rome"]}}))
+
+    def test_least_recently_used_entries_are_evicted(self):
+        self.cache.put("a", [1, 0], "A", "v1")
+        self.cache.put("b", [0, 1], "B", "v1")
+        self.cache.get("a")
+        self.cache.put("c", [1, 1], "C", "v1")
+
+        self.assertEqual(["a", "c"], list(self.cache.entries))
+
+    def test_entries_expire(self):
+        with mock.patch("backend.response_cache.time.monotonic", return_value=100.0):
+            self.cache.put("a", [1, 0], "A", "v1")
+        with mock.patch("backend.response_cache.time.monotonic", return_value=161.0):
+            self.assertIsNone(self.cache.get("a"))
+            self.assertIsNone(self.cache.get_similar([1, 0]))
+
+    def test_a_new_index_version_drops_all_entries(self):
+        self.cache.put("a", [1, 0], "A", "v1")
+        # answers generated against the previous index are not cached
+        self.cache.put("b", [0, 1], "B", "v0")
+
+        self.cache.check_index_version("v2")
+
+        self.assertIsNone(self.cache.get("a"))
+        self.assertEqual((0, 1), (self.cache.stats()["entries"], self.cache.stats()["invalidations"]))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,249 @@
+import json
+import os
+import numpy as np
+from typing import Sequence
+from embedding_storage import LocalEmbeddingStorage, normalize, top_k_rows
+
+
+class IVFIndex:
+    """
+    Inverted file index for approximate cosine search over the rows of a LocalNamespace.
+    The vectors are clustered around nlist centroids with spherical k-means. A query only scores
+    the rows of the nprobe closest clusters, so nprobe trades recall for speed.
+    Rows are added incrementally: until train_size rows are available the index is untrained and
+    every row is a candidate, afterwards new rows are assigned to their closest centroid.
+    The rows arrive in the order of the dataset (e.g. grouped by country), so the first train_size
+    rows are no representative sample: whenever the rows have grown by retrain_growth since the
+    last training, the centroids are trained again on a sample of all rows and every row is re-assigned.
+    """
+
+    CENTROIDS_FILE = "ivf_centroids.npy"
+    ASSIGNMENTS_FILE = "ivf_assignments.i32"
+    INFO_FILE = "ivf_info.json"
+    UNASSIGNED = -1
+
+    def __init__(self, dimension: int, nlist: int = 1024, nprobe: int = 16, train_size: int = None, iterations: int = 10, seed: int = 0, retrain_growth: float = 4.0):
+        self.dimension = dimension
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.train_size = train_size or 39 * nlist
+        self.iterations = iterations
+        self.seed = seed
+        self.retrain_growth = retrain_growth
+        self.centroids = None
+        # rows the centroids were trained on
+        self.trained_rows = 0
+        self.assignments = np.empty(0, dtype=np.int32)
+        # assignments from this row on (and the centroids if retrained) are not saved yet
+        self.unsaved_from = 0
+        self.centroids_saved = True
+        self._lists = None
+
+    @property
+    def trained(self) -> bool:
+        return self.centroids is not None
+
+    def needs_training(self, rows: int) -> bool:
+        """
+        Return whether the index should be (re)trained on its rows, given how many there are.
+        """
+        if not self.trained:
+            return rows >= self.train_size
+        return rows >= self.retrain_growth * self.trained_rows
+
+    def train(self, vectors: np.ndarray):
+        """
+        Cluster the given unit vectors with spherical k-means.
+        The rows must be assigned again afterwards (see assign_all).
+        """
+        rng = np.random.default_rng(self.seed)
+        sample_size = min(len(vectors), 256 * self.nlist)
+        sample = vectors[np.sort(rng.choice(
+            len(vectors), sample_size, replace=False))]
+        sample = np.asarray(sample, dtype=np.float32)
+        nlist = min(self.nlist, len(sample))
+
+        centroids = sample[rng.choice(len(sample), nlist, replace=False)]
+        for _ in range(self.iterations):
+            labels = self.closest_centroids(sample, centroids)
+            order = np.argsort(labels, kind="stable")
+            clusters, starts = np.unique(labels[order], return_index=True)
+            sums = np.zeros_like(centroids)
+            sums[clusters] = np.add.reduceat(sample[order], starts)
+            empty = ~sums.any(axis=1)
+            # re-seed empty clusters with random points
+            sums[empty] = sample[rng.choice(len(sample), empty.sum())]
+            centroids = normalize(sums)
+
+        self.centroids = centroids
+        self.trained_rows = len(vectors)
+        self.centroids_saved = False
+
+    def add(self, rows: Sequence[int], vectors: np.ndarray):
+        """
+        Add (or re-assign) the given rows with their unit vectors.
+        """
+        rows = np.asarray(rows, dtype=np.int64)
+        if len(rows) == 0:
+            return
+        size = int(rows.max()) + 1
+        if size > len(self.assignments):
+            self.assignments = np.concatenate([self.assignments, np.full(
+                size - len(self.assignments), self.UNASSIGNED, dtype=np.int32)])
+        if self.trained:
+            self.assignments[rows] = self.closest_centroids(
+                vectors, self.centroids)
+        else:
+            self.assignments[rows] = self.UNASSIGNED
+        self.unsaved_from = min(self.unsaved_from, int(rows.min()))
+        self._lists = None
+
+    def assign_all(self, matrix: np.ndarray, batch_size: int = 100_000):
+        """
+        Assign every row of the matrix, e.g. after the index has been trained.
+        """
+        for offset in range(0, len(matrix), batch_size):
+            rows = np.arange(offset, min(offset + batch_size, len(matrix)))
+            self.add(rows, matrix[rows])
+
+    def search(self, matrix: np.ndarray, vector: Sequence[float], top_k: int, nprobe: int = None, mask: np.ndarray = None) -> tuple:
+        """
+        Return the rows and scores of the approximately top_k most similar rows, best first.
+        If a mask is given, only the candidates it selects are scored.
+        """
+        query = normalize(np.asarray(vector, dtype=np.float32))
+        candidates = self.candidates(query, nprobe or self.nprobe)
+        if mask is not None:
+            candidates = candidates[mask[candidates]]
+        if len(candidates) == 0 or top_k <= 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        rows, scores = top_k_rows(matrix[candidates] @ query, top_k)
+        return candidates[rows], scores
+
+    def candidates(self, query: np.ndarray, nprobe: int) -> np.ndarray:
+        lists, offsets = self.inverted_lists()
+        unassigned = lists[offsets[0]:offsets[1]]
+        if not self.trained:
+            return unassigned
+
+        probes = np.argsort(-(self.centroids @ query))[:nprobe] + 1
+        parts = [unassigned] + [lists[offsets[p]:offsets[p + 1]]
+                                for p in probes]
+        return np.sort(np.concatenate(parts))
+
+    def inverted_lists(self) -> tuple:
+        """
+        Return all rows grouped by cluster together with the start offset of each group.
+        Group 0 holds the unassigned rows, group i + 1 the rows of cluster i.
+        """
+        if self._lists is None:
+            groups = self.assignments.astype(np.int64) + 1
+            lists = np.argsort(groups, kind="stable")
+            nlist = len(self.centroids) if self.trained else 0
+            counts = np.bincount(groups, minlength=nlist + 1)
+            offsets = np.concatenate([[0], np.cumsum(counts)])
+            self._lists = (lists, offsets)
+        return self._lists
+
+    @staticmethod
+    def closest_centroids(vectors: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+        return np.argmax(np.asarray(vectors, dtype=np.float32) @ centroids.T, axis=1).astype(np.int32)
+
+    def save(self, directory: str):
+        """
+        Write the changes since the last save: usually only the assignments of the new rows are
+        appended, the whole index is only rewritten after a (re)training.
+        """
+        os.makedirs(directory, exist_ok=True)
+        if self.trained and not self.centroids_saved:
+            np.save(os.path.join(directory, self.CENTROIDS_FILE), self.centroids)
+            with open(os.path.join(directory, self.INFO_FILE), "w") as f:
+                json.dump({"trained_rows": self.trained_rows}, f)
+            self.centroids_saved = True
+
+        assignments_path = os.path.join(directory, self.ASSIGNMENTS_FILE)
+        saved = os.path.getsize(assignments_path) // self.assignments.itemsize \
+            if os.path.exists(assignments_path) else 0
+        start = min(self.unsaved_from, saved)
+        if start == 0:
+            self.assignments.tofile(assignments_path)
+        elif start < len(self.assignments):
+            with open(assignments_path, "r+b") as f:
+                f.seek(start * self.assignments.itemsize)
+                f.write(self.assignments[start:].tobytes())
+        self.unsaved_from = len(self.assignments)
+
+    def load(self, directory: str):
+        centroids_path = os.path.join(directory, self.CENTROIDS_FILE)
+        assignments_path = os.path.join(directory, self.ASSIGNMENTS_FILE)
+        info_path = os.path.join(directory, self.INFO_FILE)
+        if os.path.exists(assignments_path):
+            self.assignments = np.fromfile(assignments_path, dtype=np.int32)
+        if os.path.exists(centroids_path):
+            self.centroids = np.load(centroids_path)
+            self.trained_rows = len(self.assignments)
+            if os.path.exists(info_path):
+                with open(info_path) as f:
+                    self.trained_rows = json.load(f)["trained_rows"]
+        self.unsaved_from = len(self.assignments)
+        self.centroids_saved = True
+        self._lists = None
+
+
+class IVFEmbeddingStorage(LocalEmbeddingStorage):
+    """
+    Stores embeddings like LocalEmbeddingStorage and answers queries approximately with an IVFIndex.
+    The index is trained as soon as enough vectors have been stored, retrained as they grow, and is
+    persisted next to the vectors.
+    """
+
+    def __init__(self, index_name: str, dimension: int, namespace: str, path: str = "indexes", nlist: int = 1024, nprobe: int = 16, train_size: int = None):
+        super().__init__(index_name, dimension, namespace, path)
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.train_size = train_size
+        self.ivf_indexes = {}
+
+    def store(self, embeddings: dict):
+        with self.lock:
+            local_namespace = self.get_namespace(self.namespace)
+            ivf_index = self.get_ivf_index(self.namespace)
+            rows = local_namespace.upsert(embeddings)
+
+            matrix = local_namespace.matrix()
+            if ivf_index.needs_training(len(matrix)):
+                ivf_index.train(matrix)
+                ivf_index.assign_all(matrix)
+            else:
+                ivf_index.add(rows, matrix[rows])
+            ivf_index.save(local_namespace.directory)
+
+    def query(self, vector: Sequence[float], top_k: int = 10, namespace: str = None, include_values: bool = False, include_metadata: bool = False, filter: dict = None, nprobe: int = None) -> dict:
+        """
+        Like LocalEmbeddingStorage.query, but only the rows of the nprobe closest clusters are scored.
+        If the probed clusters hold fewer than top_k rows matching the filter, the matching rows are
+        scored exactly instead (a selective filter leaves few of them).
+        """
+        namespace = namespace or self.namespace
+        # the inverted lists and the namespace are updated by stores under the same lock
+        with self.lock:
+            local_namespace = self.get_namespace(namespace)
+            mask = local_namespace.filter_mask(filter)
+            rows, scores = self.get_ivf_index(namespace).search(
+                local_namespace.matrix(), vector, top_k, nprobe, mask)
+            if mask is not None and len(rows) < top_k and len(rows) < np.count_nonzero(mask):
+                rows, scores = local_namespace.search(vector, top_k, mask)
+            return self.to_response(namespace, local_namespace, rows, scores, include_values, include_metadata)
+
+    def get_ivf_index(self, namespace: str) -> IVFIndex:
+        if namespace not in self.ivf_indexes:
+            ivf_index = IVFIndex(self.dimension, self.nlist,
+                                 self.nprobe, self.train_size)
+            local_namespace = self.get_namespace(namespace)
+            ivf_index.load(local_namespace.directory)
+            # rows stored after the index was last saved
+            missing = np.arange(len(ivf_index.assignments),
+                                local_namespace.stored_rows())
+            ivf_index.add(missing, local_namespace.matrix()[missing])
+            self.ivf_indexes[namespace] = ivf_index
+        return self.ivf_indexes[namespace]
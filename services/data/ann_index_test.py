@@ -0,0 +1,113 @@
+import unittest
+import os
+import tempfile
+import numpy as np
+from ann_index import IVFEmbeddingStorage, IVFIndex
+
+
+class TestIVFEmbeddingStorage(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        rng = np.random.default_rng(42)
+        centers = rng.standard_normal((8, 16))
+        self.vectors = (np.repeat(centers, 50, axis=0) +
+                        0.05 * rng.standard_normal((400, 16))).astype(np.float32)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def create_storage(self, nprobe: int = 2) -> IVFEmbeddingStorage:
+        return IVFEmbeddingStorage("hotels", 16, "hotels", self.directory.name,
+                                   nlist=8, nprobe=nprobe, train_size=200)
+
+    def store_in_chunks(self, storage: IVFEmbeddingStorage, chunksize: int = 50):
+        for offset in range(0, len(self.vectors), chunksize):
+            storage.store({i: {"values": self.vectors[i], "metadata": {}}
+                           for i in range(offset, offset + chunksize)})
+
+    def test_index_is_trained_incrementally(self):
+        storage = self.create_storage()
+        storage.store({i: {"values": self.vectors[i], "metadata": {}}
+                       for i in range(100)})
+        self.assertFalse(storage.get_ivf_index("hotels").trained)
+
+        storage.store({i: {"values": self.vectors[i], "metadata": {}}
+                       for i in range(100, 400)})
+        ivf_index = storage.get_ivf_index("hotels")
+        self.assertTrue(ivf_index.trained)
+        self.assertTrue((ivf_index.assignments >= 0).all())
+
+    def test_query_finds_nearest_neighbour(self):
+        storage = self.create_storage()
+        self.store_in_chunks(storage)
+
+        for i in [0, 120, 399]:
+            result = storage.query(self.vectors[i], top_k=1)
+            self.assertEqual(str(i), result["matches"][0]["id"])
+
+    def test_all_probes_equal_exact_search(self):
+        storage = self.create_storage()
+        self.store_in_chunks(storage)
+
+        approximate = storage.query(self.vectors[7], top_k=20, nprobe=8)
+        exact = super(IVFEmbeddingStorage, storage).query(
+            self.vectors[7], top_k=20)
+        self.assertEqual([m["id"] for m in exact["matches"]],
+                         [m["id"] for m in approximate["matches"]])
+
+    def test_filtered_query_returns_only_matching_rows(self):
+        storage = self.create_storage()
+        storage.store({i: {"values": self.vectors[i], "metadata": {"cluster": i // 50}}
+                       for i in range(len(self.vectors))})
+
+        # the probed clusters around vector 0 hold no row of cluster 5
+        result = storage.query(self.vectors[0], top_k=10, filter={"cluster": 5})
+
+        self.assertEqual(10, len(result["matches"]))
+        self.assertTrue(all(250 <= int(m["id"]) < 300 for m in result["matches"]))
+
+    def test_index_is_reloaded_from_disk(self):
+        self.store_in_chunks(self.create_storage())
+
+        reloaded = self.create_storage()
+        result = reloaded.query(self.vectors[250], top_k=1)
+
+        self.assertTrue(reloaded.get_ivf_index("hotels").trained)
+        self.assertEqual("250", result["matches"][0]["id"])
+
+    def test_saves_only_append_the_new_assignments(self):
+        storage = self.create_storage()
+        self.store_in_chunks(storage, chunksize=100)
+        assignments_path = os.path.join(storage.get_namespace("hotels").directory,
+                                        IVFIndex.ASSIGNMENTS_FILE)
+        # mark the saved assignment of row 0, a rewrite of the file would replace it
+        with open(assignments_path, "r+b") as f:
+            f.write(np.int32(12345).tobytes())
+
+        storage.store({i: {"values": self.vectors[i % 400], "metadata": {}}
+                       for i in range(400, 450)})
+
+        saved = np.fromfile(assignments_path, dtype=np.int32)
+        self.assertEqual(450, len(saved))
+        self.assertEqual(12345, saved[0])
+        np.testing.assert_array_equal(storage.get_ivf_index("hotels").assignments[1:], saved[1:])
+
+    def test_index_is_retrained_as_it_grows(self):
+        storage = self.create_storage()
+        storage.store({i: {"values": self.vectors[i], "metadata": {}} for i in range(200)})
+        ivf_index = storage.get_ivf_index("hotels")
+        self.assertEqual(200, ivf_index.trained_rows)
+
+        storage.store({i: {"values": self.vectors[i % 400], "metadata": {}}
+                       for i in range(200, 800)})
+
+        self.assertEqual(800, ivf_index.trained_rows)
+        reloaded = self.create_storage().get_ivf_index("hotels")
+        self.assertEqual(800, reloaded.trained_rows)
+        np.testing.assert_array_equal(ivf_index.centroids, reloaded.centroids)
+        np.testing.assert_array_equal(ivf_index.assignments, reloaded.assignments)
+
+
+if __name__ == '__main__':
+    unittest.main()
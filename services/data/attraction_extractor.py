@@ -1,4 +1,18 @@
 import re
+import numpy as np
+from typing import Sequence
+
+# The Attractions field is HTML: a header line, then one "<name> - <km> km / <mi> mi" entry per
+# line, separated by <br /> and wrapped in <p> tags, and finally the preferred airport.
+SEPARATOR_PATTERN = re.compile(r"<br\s*/?>|</?p>")
+HEADER_PATTERN = re.compile(r"^Distances are(.*?)<br />")
+ENTRY_PATTERN = re.compile(r"(.*?) - (\d+(?:\.\d+)?) km / (\d+(?:\.\d+)?) mi")
+AIRPORT_PATTERN = re.compile(r" airport .*?\bis (.*)")
+
+# structured arrays returned by extract_attractions_batch, one row per attraction or airport
+ATTRACTION_DTYPE = np.dtype([("hotel_index", np.int32), ("name", object),
+                             ("distance_km", np.float32), ("distance_mi", np.float32)])
+
 
 class Attraction:
     attraction_name: str
@@ -48,61 +62,53 @@ class Airport:
         }
 
 
+def parse_entries(text: str) -> tuple:
+    """
+    Split the field once at its tags and return the (name, km, mi) tuples of the attractions
+    together with the tuple of the preferred airport (or None). Distances are kept as strings.
+    """
+    attractions = []
+    preferred_airport = None
+    for part in SEPARATOR_PATTERN.split(text):
+        match = ENTRY_PATTERN.match(part.strip())
+        if not match:
+            continue
+        name, km_distance, mi_distance = match.groups()
+        airport_match = AIRPORT_PATTERN.search(name) if "airport" in name else None
+        if airport_match:
+            preferred_airport = (airport_match.group(1).strip(), km_distance, mi_distance)
+            continue
+        name = name.strip()
+        if name:
+            attractions.append((name, km_distance, mi_distance))
+    return attractions, preferred_airport
+
+
 def extract_attractions(self, text):
 
     # convert to string if it is not a string
     if isinstance(text, str):
-        # Entferne die erste Zeile bis zum ersten <br />
-        text = re.sub(r'^Distances are(.*?)<br />',
-                      '', text, count=1).strip()
-
-        # Entferne alle Vorkommen von <p> und </p>
-        text = text.replace('</p>', '').replace('<p>', '')
-
-        # Splitte den Text basierend auf <br /> als Delimiter
-        parts = []
-        if ('<br />' not in text):
-            parts.append(text)
-        else:
-            while '<br />' in text:
-                line = re.search(r'^(.*?)<br />', text).group(1)
-                parts.append(line)
-                text = text[len(line) + 6:]
+        entries, airport_entry = parse_entries(text)
 
         attractions = []
-        preferred_airport = None
+        for attraction_name, km_distance, mi_distance in entries:
+            new_attraction = Attraction()
+            new_attraction.attraction_name = attraction_name
+            new_attraction.distance_km = float(km_distance)
+            new_attraction.distance_mi = float(mi_distance)
+            attractions.append(new_attraction)
 
-        attraction_pattern = re.compile(
-            r"(.*?) - (\d+\.\d+) km / (\d+\.\d+) mi")
-        preferred_airport_pattern = re.compile(
-            r".*? airport.*is (.*?) - (\d+\.\d+) km / (\d+\.\d+) mi")
-
-        # create regular expression that splits lines by <br />
-
-        for part in parts:
-            part = part.strip()
-            airport_match = preferred_airport_pattern.search(part)
-
-            if airport_match:
-                airport_name, km_distance, mi_distance = airport_match.groups()
-                preferred_airport = Airport()
-                preferred_airport.airport_name = airport_name.strip()
-                preferred_airport.distance_km = float(km_distance)
-                preferred_airport.distance_mi = float(mi_distance)
-                continue
-
-            match = attraction_pattern.match(part)
-            if match:
-                attraction_name, km_distance, mi_distance = match.groups()
-                new_attraction = Attraction()
-                new_attraction.attraction_name = attraction_name.strip()
-                if (not new_attraction.attraction_name):
-                    continue
-                new_attraction.distance_km = float(km_distance)
-                new_attraction.distance_mi = float(mi_distance)
-                attractions.append(new_attraction)
+        preferred_airport = None
+        if airport_entry:
+            preferred_airport = Airport()
+            preferred_airport.airport_name = airport_entry[0]
+            preferred_airport.distance_km = float(airport_entry[1])
+            preferred_airport.distance_mi = float(airport_entry[2])
 
         if len(attractions) == 0:
+            # Entferne die erste Zeile und alle <p> und </p>
+            text = HEADER_PATTERN.sub("", text, count=1)
+            text = text.replace('</p>', '').replace('<p>', '').strip()
             if text:
                 attractions = text
             else:
@@ -114,3 +120,47 @@ def extract_attractions(self, text):
         "attractions": attractions,
         "preferred_airport": preferred_airport if preferred_airport else self.UNKNOWN_VALUE
     }
+
+
+def extract_attractions_batch(texts: Sequence[str]) -> tuple:
+    """
+    Parse a whole column of Attractions values at once.
+    Returns two structured arrays of ATTRACTION_DTYPE, the attractions and the preferred airports.
+    The hotel_index of a row is the position of its value in texts, and rows are ordered by it.
+    Values that are not strings or contain no entries have no rows.
+    """
+    entries = []
+    counts = np.zeros(len(texts), dtype=np.int32)
+    airport_entries = []
+    airport_indexes = []
+    for index, text in enumerate(texts):
+        if not isinstance(text, str):
+            continue
+        text_entries, airport_entry = parse_entries(text)
+        entries.extend(text_entries)
+        counts[index] = len(text_entries)
+        if airport_entry:
+            airport_entries.append(airport_entry)
+            airport_indexes.append(index)
+    hotel_indexes = np.repeat(np.arange(len(texts), dtype=np.int32), counts)
+    return to_structured_array(hotel_indexes, entries), to_structured_array(airport_indexes, airport_entries)
+
+
+def to_structured_array(hotel_indexes: Sequence[int], entries: list) -> np.ndarray:
+    table = np.empty(len(entries), dtype=ATTRACTION_DTYPE)
+    table["hotel_index"] = hotel_indexes
+    table["name"] = [entry[0] for entry in entries]
+    table["distance_km"] = np.fromiter(
+        (float(entry[1]) for entry in entries), dtype=np.float32, count=len(entries))
+    table["distance_mi"] = np.fromiter(
+        (float(entry[2]) for entry in entries), dtype=np.float32, count=len(entries))
+    return table
+
+
+def attractions_of(table: np.ndarray, hotel_index: int) -> np.ndarray:
+    """
+    Return the rows of a structured array returned by extract_attractions_batch that belong to a hotel.
+    """
+    start, end = np.searchsorted(
+        table["hotel_index"], [hotel_index, hotel_index + 1])
+    return table[start:end]
@@ -0,0 +1,68 @@
+import unittest
+import numpy as np
+from attraction_extractor import extract_attractions, extract_attractions_batch, attractions_of
+
+ATTRACTIONS = (
+    "Distances are displayed to the nearest 0.1 mile and kilometer. <br />\n<p>\n"
+    "Ponte Fonnaia - 4 km / 2.5 mi <br />\n"
+    "Church of San Felice - 5.4 km / 3.4 mi <br /> Porta Aurea - 20.9 km / 13 mi <br />\n"
+    "</p>\n<p>The preferred airport for B&B Rossopeperoncino is Sant Egidio Airport (PEG) - 61.1 km / 38 mi </p>"
+)
+
+
+class Collector:
+    UNKNOWN_VALUE = "Unknown"
+
+
+class TestExtractAttractions(unittest.TestCase):
+
+    def test_extracts_attractions_and_airport(self):
+        result = extract_attractions(Collector(), ATTRACTIONS)
+
+        self.assertEqual(["Ponte Fonnaia", "Church of San Felice", "Porta Aurea"],
+                         [attraction.attraction_name for attraction in result["attractions"]])
+        self.assertEqual([4.0, 5.4, 20.9],
+                         [attraction.distance_km for attraction in result["attractions"]])
+        self.assertEqual({"airport_name": "Sant Egidio Airport (PEG)", "distance_km": 61.1, "distance_mi": 38.0},
+                         result["preferred_airport"].to_dict())
+
+    def test_text_without_entries_is_returned(self):
+        result = extract_attractions(
+            Collector(), "<p>AD Durrës Amphitheatre: within 9000 metre</p>")
+
+        self.assertEqual("AD Durrës Amphitheatre: within 9000 metre", result["attractions"])
+        self.assertEqual("Unknown", result["preferred_airport"])
+
+    def test_missing_value_is_unknown(self):
+        result = extract_attractions(Collector(), float("nan"))
+
+        self.assertEqual("Unknown", result["attractions"])
+        self.assertEqual("Unknown", result["preferred_airport"])
+
+
+class TestExtractAttractionsBatch(unittest.TestCase):
+
+    def test_batch_equals_single_values(self):
+        texts = [ATTRACTIONS, None, "Unknown", ATTRACTIONS.replace("Porta Aurea", "Porta Marzia")]
+        attractions, airports = extract_attractions_batch(texts)
+
+        self.assertEqual([0, 0, 0, 3, 3, 3], attractions["hotel_index"].tolist())
+        self.assertEqual([0, 3], airports["hotel_index"].tolist())
+        for index in [0, 3]:
+            expected = extract_attractions(Collector(), texts[index])["attractions"]
+            rows = attractions_of(attractions, index)
+            self.assertEqual([attraction.attraction_name for attraction in expected],
+                             rows["name"].tolist())
+            np.testing.assert_allclose([attraction.distance_mi for attraction in expected],
+                                       rows["distance_mi"], rtol=1e-6)
+        self.assertEqual(0, len(attractions_of(attractions, 1)))
+
+    def test_empty_column(self):
+        attractions, airports = extract_attractions_batch([])
+
+        self.assertEqual(0, len(attractions))
+        self.assertEqual(0, len(airports))
+
+
+if __name__ == '__main__':
+    unittest.main()
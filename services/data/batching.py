@@ -0,0 +1,123 @@
+import random
+import re
+import threading
+import time
+from typing import Callable, List, Sequence
+
+# HTTP status codes after which a request is retried
+RETRYABLE_STATUS_CODES = {408, 429, 500, 502, 503, 504}
+# HTTP status code of a request that exceeded the provider's size limits
+PAYLOAD_TOO_LARGE = 413
+# Gemini and Pinecone reject too large requests with a 400 as well, whose message names the limit
+# (other 400 errors, e.g. an invalid model, must not be retried in smaller batches)
+TOO_LARGE_MESSAGE_PATTERN = re.compile(
+    r"too (large|long|many)|exceed|payload|batch size|request size|token limit|at most \d+", re.IGNORECASE)
+
+
+def status_code(error: Exception) -> int:
+    """
+    Return the HTTP status code of a Pinecone, Gemini or HTTP client error, or None.
+    """
+    for attribute in ["status", "code", "status_code"]:
+        value = getattr(error, attribute, None)
+        if isinstance(value, int):
+            return value
+    response = getattr(error, "response", None)
+    value = getattr(response, "status_code", None)
+    return value if isinstance(value, int) else None
+
+
+def is_too_large(error: Exception) -> bool:
+    """
+    Return whether an error rejects a request for exceeding the provider's size or token limits.
+    """
+    code = status_code(error)
+    return code == PAYLOAD_TOO_LARGE or code == 400 and bool(TOO_LARGE_MESSAGE_PATTERN.search(str(error)))
+
+
+def estimate_tokens(text: str) -> int:
+    # about four characters per token for the languages in the dataset
+    return len(text) // 4 + 1
+
+
+class AdaptiveBatcher:
+    """
+    Sends texts to an embedding function in batches that respect the provider's limits.
+    A batch holds at most batch_size texts and max_tokens estimated tokens. Failed requests are
+    retried with exponential backoff and full jitter on rate limits and server errors. A request
+    rejected as too large is split in half, and batch_size grows back (merging batches again)
+    after grow_after successful requests.
+    """
+
+    def __init__(self, max_items: int, max_tokens: int = None, max_retries: int = 6, base_delay: float = 1.0, max_delay: float = 60.0, grow_after: int = 10):
+        self.max_items = max_items
+        self.max_tokens = max_tokens
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.grow_after = grow_after
+        self.batch_size = max_items
+        self.successes = 0
+        self.requests = 0
+        self.retries = 0
+        self.splits = 0
+        self.lock = threading.Lock()
+
+    def run(self, texts: Sequence[str], embed: Callable[[List[str]], List[List[float]]]) -> List[List[float]]:
+        """
+        Embed all texts and return their vectors in the same order.
+        """
+        vectors = []
+        start = 0
+        while start < len(texts):
+            batch = self.next_batch(texts, start)
+            try:
+                vectors.extend(self.call(embed, batch))
+            except Exception as e:
+                if not is_too_large(e) or len(batch) == 1:
+                    raise
+                with self.lock:
+                    self.splits += 1
+                    self.successes = 0
+                    self.batch_size = max(1, min(self.batch_size, len(batch) // 2))
+                continue
+
+            start += len(batch)
+            with self.lock:
+                self.successes += 1
+                if self.successes >= self.grow_after and self.batch_size < self.max_items:
+                    self.batch_size = min(self.max_items, self.batch_size * 2)
+                    self.successes = 0
+        return vectors
+
+    def next_batch(self, texts: Sequence[str], start: int) -> List[str]:
+        batch = []
+        tokens = 0
+        for text in texts[start:start + self.batch_size]:
+            text_tokens = estimate_tokens(text)
+            if batch and self.max_tokens and tokens + text_tokens > self.max_tokens:
+                break
+            batch.append(text)
+            tokens += text_tokens
+        return batch
+
+    def call(self, embed: Callable[[List[str]], List[List[float]]], batch: List[str]) -> List[List[float]]:
+        for attempt in range(self.max_retries + 1):
+            with self.lock:
+                self.requests += 1
+            try:
+                return embed(batch)
+            except Exception as e:
+                transient = status_code(e) in RETRYABLE_STATUS_CODES or isinstance(
+                    e, (ConnectionError, TimeoutError))
+                if not transient or attempt == self.max_retries:
+                    raise
+                delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+                print(f"Embedding request failed ({e}), retrying in {delay:.1f} s...")
+                with self.lock:
+                    self.retries += 1
+                time.sleep(delay)
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {"batch_size": self.batch_size, "requests": self.requests, "retries": self.retries, "splits": self.splits}
@@ -0,0 +1,93 @@
+import unittest
+from unittest import mock
+from batching import AdaptiveBatcher
+
+
+class ApiError(Exception):
+
+    def __init__(self, status: int, message: str = ""):
+        super().__init__(f"HTTP {status} {message}".strip())
+        self.status = status
+
+
+class TestAdaptiveBatcher(unittest.TestCase):
+
+    def setUp(self):
+        self.requests = []
+
+    def embed(self, texts):
+        self.requests.append(list(texts))
+        return [[float(text)] for text in texts]
+
+    def test_batches_respect_item_and_token_limits(self):
+        batcher = AdaptiveBatcher(max_items=3, max_tokens=4)
+        texts = [str(i) for i in range(7)]
+
+        vectors = batcher.run(texts, self.embed)
+
+        self.assertEqual([[float(i)] for i in range(7)], vectors)
+        # each text is estimated as one token
+        self.assertEqual([3, 3, 1], [len(batch) for batch in self.requests])
+
+    @mock.patch("batching.time.sleep")
+    def test_rate_limited_requests_are_retried(self, sleep):
+        failures = [ApiError(429), ApiError(503)]
+
+        def flaky_embed(texts):
+            if failures:
+                raise failures.pop(0)
+            return self.embed(texts)
+
+        batcher = AdaptiveBatcher(max_items=10)
+        vectors = batcher.run(["1", "2"], flaky_embed)
+
+        self.assertEqual([[1.0], [2.0]], vectors)
+        self.assertEqual(2, batcher.stats()["retries"])
+        self.assertEqual(2, sleep.call_count)
+
+    def test_client_errors_are_not_retried(self):
+        def failing_embed(texts):
+            raise ApiError(401)
+
+        batcher = AdaptiveBatcher(max_items=10)
+        with self.assertRaises(ApiError):
+            batcher.run(["1"], failing_embed)
+        self.assertEqual(0, batcher.stats()["retries"])
+
+    def test_too_large_requests_are_split_and_merged_again(self):
+        def limited_embed(texts):
+            if len(texts) > 2:
+                raise ApiError(413)
+            return self.embed(texts)
+
+        batcher = AdaptiveBatcher(max_items=8, grow_after=2)
+        vectors = batcher.run([str(i) for i in range(10)], limited_embed)
+
+        self.assertEqual([[float(i)] for i in range(10)], vectors)
+        # 8 -> 4 -> 2, then growing back to 4 is rejected once more
+        self.assertEqual(3, batcher.stats()["splits"])
+        self.assertTrue(all(len(batch) <= 2 for batch in self.requests))
+        self.assertEqual(4, batcher.stats()["batch_size"])
+
+    def test_only_bad_requests_naming_a_limit_are_split(self):
+        def limited_embed(texts):
+            if len(texts) > 2:
+                raise ApiError(400, "Batch size exceeds the limit of 2 texts")
+            return self.embed(texts)
+
+        def invalid_embed(texts):
+            raise ApiError(400, "Model text-embedding-x is not found")
+
+        batcher = AdaptiveBatcher(max_items=4)
+        self.assertEqual([[float(i)] for i in range(4)], batcher.run(
+            [str(i) for i in range(4)], limited_embed))
+        self.assertEqual(1, batcher.stats()["splits"])
+
+        batcher = AdaptiveBatcher(max_items=4)
+        with self.assertRaises(ApiError):
+            batcher.run([str(i) for i in range(4)], invalid_embed)
+        self.assertEqual(0, batcher.stats()["splits"])
+
+
+if __name__ == '__main__':
+    unittest.main()
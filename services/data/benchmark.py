@@ -0,0 +1,290 @@
+import argparse
+import csv
+import gc
+import os
+import tempfile
+import time
+import tracemalloc
+import numpy as np
+from pandas import read_csv
+from data_collector import HotelDataCollector
+from attraction_extractor import extract_attractions, extract_attractions_batch
+from embedding_storage import LocalEmbeddingStorage
+from ann_index import IVFEmbeddingStorage
+
+
+def random_embeddings(count: int, dimension: int, seed: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    return rng.standard_normal((count, dimension), dtype=np.float32)
+
+
+def clustered_embeddings(count: int, dimension: int, clusters: int, seed: int = 0) -> np.ndarray:
+    """
+    Random vectors around a number of centers, which resembles real embeddings more than uniform noise.
+    """
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((clusters, dimension), dtype=np.float32)
+    labels = rng.integers(0, clusters, count)
+    return centers[labels] + 0.5 * rng.standard_normal((count, dimension), dtype=np.float32)
+
+
+def write_synthetic_hotels(path: str, rows: int, seed: int = 0):
+    """
+    Write a CSV with the columns and the kind of values of the TBO hotels dataset.
+    """
+    rng = np.random.default_rng(seed)
+    locations = [("AL", "Albania", "Albanien"), ("DE", "Germany", "Berlin"), ("IT", "Italy", "Rome"),
+                 ("US", "United States", "New York,   New York"), ("IN", "India", "Mumbai")]
+    ratings = ["OneStar", "TwoStar", "ThreeStar", "FourStar", "FiveStar", "All"]
+    with open(path, "w", encoding="Windows-1252", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["countyCode", " countyName", " cityCode", " cityName", " HotelCode", " HotelName", " HotelRating", " Address", " Attractions",
+                         " Description", " FaxNumber", " HotelFacilities", " Map", " PhoneNumber", " PinCode", " HotelWebsiteUrl"])
+        for i in range(rows):
+            country_code, country_name, city_name = locations[rng.integers(len(locations))]
+            distances = np.sort(rng.uniform(0.1, 30, 15)).round(1)
+            attractions = "Distances are displayed to the nearest 0.1 mile and kilometer. <br /> <p>" + "".join(
+                f"Attraction {j} - {km} km / {round(km * 0.621, 1)} mi <br /> " for j, km in enumerate(distances)) + \
+                f"</p><p>The preferred airport for Hotel {i} is Airport {i % 97} - {distances[-1] + 10:.1f} km / {(distances[-1] + 10) * 0.621:.1f} mi </p>"
+            writer.writerow([
+                country_code, country_name, 100000 + i % 5000, city_name, 1000000 + i, f"Hotel {i}",
+                ratings[rng.integers(len(ratings))], f"Street {i} {city_name}",
+                attractions if rng.random() < 0.7 else "",
+                "A charming hotel close to the centre.\n\n" * int(rng.integers(1, 8)),
+                f"0{rng.integers(10 ** 8)}" if rng.random() < 0.5 else "",
+                " ".join(["Free WiFi", "Spa", "Airport shuttle", "Parking", "Pool"][:int(rng.integers(1, 6))]),
+                f"{rng.uniform(-60, 60):.5f}|{rng.uniform(-180, 180):.5f}",
+                f"00{rng.integers(10 ** 9)}", int(rng.integers(1000, 99999)) if rng.random() < 0.8 else "",
+                f"http://hotel{i}.example.com" if rng.random() < 0.5 else "",
+            ])
+
+
+def hotels_csv(args, directory: str) -> str:
+    if args.path:
+        return args.path
+    path = os.path.join(directory, "hotels.csv")
+    write_synthetic_hotels(path, args.rows)
+    return path
+
+
+def report(name: str, latencies: list):
+    latencies_ms = np.asarray(latencies) * 1000
+    print(f"{name}: p50 {np.percentile(latencies_ms, 50):.2f} ms, "
+          f"p95 {np.percentile(latencies_ms, 95):.2f} ms, "
+          f"p99 {np.percentile(latencies_ms, 99):.2f} ms")
+
+
+def benchmark_local(args):
+    """
+    Measure the query latency of LocalEmbeddingStorage on random vectors.
+    """
+    vectors = random_embeddings(args.rows, args.dimension)
+    queries = random_embeddings(args.queries, args.dimension, seed=1)
+
+    with tempfile.TemporaryDirectory() as directory:
+        storage = LocalEmbeddingStorage(
+            "benchmark", args.dimension, "hotels", directory)
+        start = time.perf_counter()
+        for offset in range(0, args.rows, args.chunksize):
+            storage.store({
+                i: {"values": vectors[i], "metadata": {"hotel_name": f"Hotel {i}"}}
+                for i in range(offset, min(offset + args.chunksize, args.rows))
+            })
+        print(f"Stored {args.rows} vectors in {time.perf_counter() - start:.2f} s")
+
+        latencies = []
+        for query in queries:
+            start = time.perf_counter()
+            storage.query(query, top_k=args.top_k, include_metadata=True)
+            latencies.append(time.perf_counter() - start)
+        report(f"Local query (top_k={args.top_k})", latencies)
+
+
+def benchmark_ann(args):
+    """
+    Compare recall and latency of the IVF index against exact search for several probe counts.
+    Uses the vectors of an existing index if --path is given, clustered random vectors otherwise.
+    """
+    with tempfile.TemporaryDirectory() as directory:
+        storage = IVFEmbeddingStorage(args.index_name, args.dimension, args.namespace,
+                                      args.path or directory, nlist=args.nlist)
+        if not args.path:
+            vectors = clustered_embeddings(
+                args.rows, args.dimension, args.clusters)
+            start = time.perf_counter()
+            for offset in range(0, args.rows, args.chunksize):
+                storage.store({
+                    i: {"values": vectors[i], "metadata": {}}
+                    for i in range(offset, min(offset + args.chunksize, args.rows))
+                })
+            print(f"Stored and indexed {args.rows} vectors in {time.perf_counter() - start:.2f} s")
+
+        local_namespace = storage.get_namespace(args.namespace)
+        ivf_index = storage.get_ivf_index(args.namespace)
+        matrix = local_namespace.matrix()
+        if not ivf_index.trained:
+            ivf_index.train(matrix)
+            ivf_index.assign_all(matrix)
+
+        rng = np.random.default_rng(1)
+        queries = matrix[rng.choice(len(matrix), args.queries)] + \
+            0.1 * rng.standard_normal((args.queries, args.dimension), dtype=np.float32)
+
+        exact_rows = []
+        latencies = []
+        for query in queries:
+            start = time.perf_counter()
+            rows, _ = local_namespace.search(query, args.top_k)
+            latencies.append(time.perf_counter() - start)
+            exact_rows.append(set(rows.tolist()))
+        report(f"Exact (top_k={args.top_k})", latencies)
+
+        for nprobe in args.nprobe:
+            recall = 0
+            latencies = []
+            for query, expected in zip(queries, exact_rows):
+                start = time.perf_counter()
+                rows, _ = ivf_index.search(matrix, query, args.top_k, nprobe)
+                latencies.append(time.perf_counter() - start)
+                recall += len(expected.intersection(rows.tolist())) / len(expected)
+            report(f"IVF nlist={len(ivf_index.centroids)} nprobe={nprobe} "
+                   f"recall@{args.top_k} {recall / len(queries):.3f}", latencies)
+
+
+def benchmark_collector(args):
+    """
+    Compare the rows/sec of the row-by-row, the columnar and the parallel HotelDataCollector.
+    """
+    variants = [("Hotel objects", False, 1), ("HotelBatch", True, 1)] + \
+        [(f"HotelBatch, {workers} processes", True, workers)
+         for workers in args.workers]
+    with tempfile.TemporaryDirectory() as directory:
+        path = hotels_csv(args, directory)
+        for name, columnar, workers in variants:
+            collector = HotelDataCollector(
+                path, args.chunksize, args.nrows, columnar=columnar, workers=workers)
+            start = time.perf_counter()
+            rows = sum(len(chunk) for _, chunk in collector.collect())
+            duration = time.perf_counter() - start
+            print(f"{name}: {rows} rows in {duration:.2f} s ({rows / duration:.0f} rows/sec)")
+
+
+def benchmark_memory(args):
+    """
+    Compare the memory of a chunk collected as Hotel objects and as a HotelBatch,
+    including the dictionaries the embedding creators request twice per hotel.
+    """
+    with tempfile.TemporaryDirectory() as directory:
+        path = hotels_csv(args, directory)
+        for name, columnar in [("Hotel objects", False), ("HotelBatch", True)]:
+            collector = HotelDataCollector(
+                path, args.chunksize, args.chunksize, columnar=columnar)
+            tracemalloc.start()
+            chunks = collector.collect()
+            _, chunk = next(chunks)
+            # release the reader and the DataFrame of the chunk
+            chunks.close()
+            del chunks
+            gc.collect()
+            collected, _ = tracemalloc.get_traced_memory()
+            start = time.perf_counter()
+            for _ in range(2):
+                if columnar:
+                    chunk.to_dicts()
+                else:
+                    [hotel.to_dict() for hotel in chunk]
+            duration = time.perf_counter() - start
+            serialized, _ = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            print(f"{name}: {len(chunk)} hotels, {collected / 2 ** 20:.1f} MiB collected, "
+                  f"{serialized / 2 ** 20:.1f} MiB with dictionaries, to_dict twice in {duration * 1000:.1f} ms")
+            del chunk
+
+
+def benchmark_attractions(args):
+    """
+    Compare parsing the Attractions column value by value into objects and as a whole into structured arrays.
+    """
+    with tempfile.TemporaryDirectory() as directory:
+        path = hotels_csv(args, directory)
+        frame = read_csv(path, encoding=HotelDataCollector.ENCODING,
+                         nrows=args.nrows, skipinitialspace=True)
+        texts = frame["Attractions"].tolist()
+
+    start = time.perf_counter()
+    # extract_attractions only reads UNKNOWN_VALUE from the collector
+    parsed = [extract_attractions(HotelDataCollector, text) for text in texts]
+    duration = time.perf_counter() - start
+    count = sum(len(result["attractions"]) for result in parsed
+                if isinstance(result["attractions"], list))
+    print(f"extract_attractions: {len(texts)} values, {count} attractions in {duration:.2f} s "
+          f"({len(texts) / duration:.0f} values/sec)")
+
+    start = time.perf_counter()
+    attractions, airports = extract_attractions_batch(texts)
+    duration = time.perf_counter() - start
+    print(f"extract_attractions_batch: {len(texts)} values, {len(attractions)} attractions, "
+          f"{len(airports)} airports in {duration:.2f} s ({len(texts) / duration:.0f} values/sec)")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Offline benchmarks for the data service.")
+    subparsers = parser.add_subparsers(dest="benchmark", required=True)
+
+    local_parser = subparsers.add_parser(
+        "local", help="Query latency of the local embedding storage")
+    local_parser.add_argument("--rows", type=int, default=100_000)
+    local_parser.add_argument("--dimension", type=int, default=768)
+    local_parser.add_argument("--queries", type=int, default=100)
+    local_parser.add_argument("--top-k", type=int, default=100)
+    local_parser.add_argument("--chunksize", type=int, default=10_000)
+    local_parser.set_defaults(run=benchmark_local)
+
+    ann_parser = subparsers.add_parser(
+        "ann", help="Recall vs. latency of the IVF index against exact search")
+    ann_parser.add_argument("--path", help="Directory of an existing index")
+    ann_parser.add_argument("--index-name", default="benchmark")
+    ann_parser.add_argument("--namespace", default="hotels")
+    ann_parser.add_argument("--rows", type=int, default=200_000)
+    ann_parser.add_argument("--dimension", type=int, default=768)
+    ann_parser.add_argument("--clusters", type=int, default=2_000)
+    ann_parser.add_argument("--nlist", type=int, default=1024)
+    ann_parser.add_argument("--nprobe", type=int, nargs="+",
+                            default=[1, 4, 16, 64])
+    ann_parser.add_argument("--queries", type=int, default=100)
+    ann_parser.add_argument("--top-k", type=int, default=100)
+    ann_parser.add_argument("--chunksize", type=int, default=10_000)
+    ann_parser.set_defaults(run=benchmark_ann)
+
+    collector_parser = subparsers.add_parser(
+        "collector", help="Rows/sec of the row-by-row and the columnar hotel collector")
+    collector_parser.add_argument(
+        "--path", help="Path of hotels.csv (a synthetic file is generated otherwise)")
+    collector_parser.add_argument("--rows", type=int, default=100_000,
+                                  help="Rows of the synthetic file")
+    collector_parser.add_argument("--nrows", type=int)
+    collector_parser.add_argument("--chunksize", type=int, default=10_000)
+    collector_parser.add_argument("--workers", type=int, nargs="*", default=[2, 4],
+                                  help="Process counts of the parallel collector")
+    collector_parser.set_defaults(run=benchmark_collector)
+
+    memory_parser = subparsers.add_parser(
+        "memory", help="Memory of a chunk as Hotel objects and as HotelBatch")
+    memory_parser.add_argument(
+        "--path", help="Path of hotels.csv (a synthetic file is generated otherwise)")
+    memory_parser.add_argument("--rows", type=int, default=50_000,
+                               help="Rows of the synthetic file")
+    memory_parser.add_argument("--chunksize", type=int, default=50_000)
+    memory_parser.set_defaults(run=benchmark_memory)
+
+    attractions_parser = subparsers.add_parser(
+        "attractions", help="Values/sec of the attraction parser")
+    attractions_parser.add_argument(
+        "--path", help="Path of hotels.csv (a synthetic file is generated otherwise)")
+    attractions_parser.add_argument("--rows", type=int, default=100_000,
+                                    help="Rows of the synthetic file")
+    attractions_parser.add_argument("--nrows", type=int)
+    attractions_parser.set_defaults(run=benchmark_attractions)
+
+    args = parser.parse_args()
+    args.run(args)
@@ -0,0 +1,238 @@
+import hashlib
+from collections import Counter
+from functools import lru_cache
+import os
+import shutil
+import numpy as np
+from typing import List
+from gazetteer import normalize_name
+from index_builder import IndexBuilder, hotel_columns
+from model import Hotel, HotelBatch
+
+# Words too common in hotel texts to help ranking
+STOPWORDS = {"a", "an", "and", "are", "as", "at", "be", "by", "for", "from", "has", "have", "in", "is",
+             "it", "its", "of", "on", "or", "our", "the", "this", "to", "with", "you", "your", "der", "die",
+             "das", "und", "mit", "im", "am"}
+
+# Term frequencies are stored in one byte
+MAX_TERM_FREQUENCY = 255
+# Document lengths are stored in two bytes
+MAX_DOCUMENT_LENGTH = 65535
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Split a text into normalized words without stopwords (the backend tokenizes prompts the same way).
+    """
+    return [word for word in normalize_name(text).split() if word not in STOPWORDS]
+
+
+@lru_cache(maxsize=1 << 20)
+def term_hash(term: str) -> int:
+    """
+    Stable 64 bit hash of a term. The index stores term hashes instead of the vocabulary.
+    """
+    return int.from_bytes(hashlib.blake2b(term.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+def encode_varints(values: np.ndarray) -> np.ndarray:
+    """
+    Encode non-negative integers as LEB128 varints (7 bits per byte, high bit set on all but the last byte).
+    """
+    values = np.asarray(values, dtype=np.uint64)
+    lengths = np.ones(len(values), dtype=np.int64)
+    for shift in range(7, 64, 7):
+        lengths += values >= (np.uint64(1) << np.uint64(shift))
+    ends = np.cumsum(lengths)
+    positions = np.arange(ends[-1] if len(ends) else 0) - np.repeat(ends - lengths, lengths)
+    shifted = np.repeat(values, lengths) >> (7 * positions).astype(np.uint64)
+    encoded = (shifted & np.uint64(0x7F)).astype(np.uint8)
+    encoded[positions < np.repeat(lengths - 1, lengths)] |= 0x80
+    return encoded
+
+
+def decode_varints(encoded: np.ndarray) -> np.ndarray:
+    """
+    Decode the LEB128 varints of encode_varints.
+    """
+    ends = np.flatnonzero(encoded < 0x80)
+    if len(ends) == 0:
+        return np.empty(0, dtype=np.int64)
+    starts = np.concatenate([[0], ends[:-1] + 1])
+    positions = np.arange(len(encoded)) - np.repeat(starts, ends - starts + 1)
+    parts = (encoded & 0x7F).astype(np.uint64) << (7 * positions).astype(np.uint64)
+    return np.add.reduceat(parts, starts).astype(np.int64)
+
+
+class BM25IndexBuilder(IndexBuilder):
+    """
+    Builds an inverted index over the text fields of all hotels for BM25 keyword search, which finds
+    exact tokens (hotel names, facilities, pin codes) that dense embeddings miss.
+    The postings are compact: terms are stored as sorted 64 bit hashes, the documents of a term as
+    varint-encoded gaps between their rows and the term frequencies as single bytes.
+    Hotels are added once by id, so chunks that are added again are ignored.
+    The postings of the added chunks are buffered up to run_postings, then sorted by term and written
+    to a run file next to the index. save merges the saved index and the runs one range of term
+    hashes at a time, so memory use is bounded by about run_postings postings besides the compact output.
+    Hotels get increasing rows, so the rows of a term are in order when its postings of the saved
+    index and of the runs are taken in that order.
+    """
+
+    FIELDS = ["hotel_name", "hotel_facilities", "description", "address", "pin_code"]
+
+    def __init__(self, path: str, run_postings: int = 1 << 22):
+        super().__init__(path)
+        self.run_postings = run_postings
+        self.run_directory = path + ".runs"
+        # hotel id -> row
+        self.rows = {}
+        self.ids = []
+        self.lengths = []
+        # postings of the chunks added since the last run was written: term hashes, rows and term frequencies
+        self.buffer = []
+        self.buffered = 0
+        self.runs = 0
+        # rows of the saved index
+        self.saved_rows = 0
+        # the runs of an ingestion that ended before save hold hotels that are added again
+        if os.path.isdir(self.run_directory):
+            shutil.rmtree(self.run_directory)
+        if os.path.exists(path):
+            self.load()
+
+    def load(self):
+        with np.load(self.path) as index:
+            self.ids = index["ids"].tolist()
+            self.lengths = index["lengths"].tolist()
+        self.rows = {id: row for row, id in enumerate(self.ids)}
+        self.saved_rows = len(self.ids)
+
+    def add(self, data: List[Hotel] | HotelBatch):
+        ids, columns = hotel_columns(data, self.FIELDS)
+        hashes, rows, frequencies = [], [], []
+        for id, values in zip(ids, zip(*columns)):
+            id = int(id)
+            if id in self.rows:
+                continue
+            row = len(self.ids)
+            self.rows[id] = row
+            self.ids.append(id)
+
+            terms = [term for value in values if value != "Unknown" for term in tokenize(value)]
+            self.lengths.append(min(len(terms), MAX_DOCUMENT_LENGTH))
+            counts = Counter(terms)
+            for term, count in counts.items():
+                hashes.append(term_hash(term))
+                rows.append(row)
+                frequencies.append(min(count, MAX_TERM_FREQUENCY))
+        if hashes:
+            self.buffer.append((np.array(hashes, dtype=np.uint64), np.array(rows, dtype=np.int32),
+                                np.array(frequencies, dtype=np.uint8)))
+            self.buffered += len(hashes)
+            if self.buffered >= self.run_postings:
+                self.write_run()
+
+    def write_run(self):
+        """
+        Sort the buffered postings by term (the rows of a term stay ascending) and write them as a run.
+        """
+        if not self.buffer:
+            return
+        hashes, rows, frequencies = (np.concatenate(parts) for parts in zip(*self.buffer))
+        order = np.argsort(hashes, kind="stable")
+        os.makedirs(self.run_directory, exist_ok=True)
+        for name, values in [("hashes", hashes), ("rows", rows), ("frequencies", frequencies)]:
+            np.save(self.run_path(self.runs, name), values[order])
+        self.runs += 1
+        self.buffer = []
+        self.buffered = 0
+
+    def run_path(self, run: int, name: str) -> str:
+        return os.path.join(self.run_directory, f"{run:06d}.{name}.npy")
+
+    def save(self):
+        self.write_run()
+        if self.runs == 0 and len(self.ids) == self.saved_rows and os.path.exists(self.path):
+            return
+        runs = [tuple(np.load(self.run_path(run, name), mmap_mode="r")
+                      for name in ["hashes", "rows", "frequencies"]) for run in range(self.runs)]
+        saved = None
+        if os.path.exists(self.path):
+            with np.load(self.path) as index:
+                saved = {name: index[name] for name in
+                         ["term_hashes", "document_frequencies", "offsets", "postings", "term_frequencies"]}
+            saved["posting_starts"] = np.concatenate(
+                [[0], np.cumsum(saved["document_frequencies"], dtype=np.int64)])
+
+        total = sum(len(run[0]) for run in runs) + (int(saved["posting_starts"][-1]) if saved else 0)
+        ranges = max(1, -(-total // self.run_postings))
+        bounds = [np.uint64(i * (1 << 64) // ranges) for i in range(ranges)] + [None]
+        parts = []
+        for low, high in zip(bounds, bounds[1:]):
+            sources = ([saved_postings(saved, low, high)] if saved else []) + \
+                [run_postings(run, low, high) for run in runs]
+            hashes, rows, frequencies = (np.concatenate(values) for values in zip(*sources)) if sources \
+                else (np.empty(0, np.uint64), np.empty(0, np.int32), np.empty(0, np.uint8))
+            order = np.argsort(hashes, kind="stable")
+            parts.append(compress_postings(hashes[order], rows[order], frequencies[order]))
+        term_hashes, document_frequencies, postings, frequencies = (np.concatenate(values) for values in zip(*parts))
+        # byte offset of the postings of each term (every varint ends with a byte below 0x80)
+        ends = np.flatnonzero(postings < 0x80) + 1
+        offsets = np.concatenate([[0], ends[np.cumsum(document_frequencies) - 1]]) \
+            if len(ends) else np.zeros(1, dtype=np.int64)
+
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(self.path + ".tmp", "wb") as f:
+            np.savez(f, ids=np.array(self.ids, dtype=np.int64), lengths=np.array(self.lengths, dtype=np.uint16),
+                     term_hashes=term_hashes, document_frequencies=document_frequencies.astype(np.uint32),
+                     offsets=offsets.astype(np.int64), postings=postings, term_frequencies=frequencies)
+        os.replace(self.path + ".tmp", self.path)
+        del runs
+        shutil.rmtree(self.run_directory, ignore_errors=True)
+        self.runs = 0
+        self.saved_rows = len(self.ids)
+
+
+def run_postings(run: tuple, low: np.uint64, high: np.uint64) -> tuple:
+    """
+    Return the postings of a run whose term hashes are in [low, high) (high None for no upper bound).
+    """
+    hashes, rows, frequencies = run
+    start = np.searchsorted(hashes, low)
+    end = len(hashes) if high is None else np.searchsorted(hashes, high)
+    return np.asarray(hashes[start:end]), np.asarray(rows[start:end]), np.asarray(frequencies[start:end])
+
+
+def saved_postings(saved: dict, low: np.uint64, high: np.uint64) -> tuple:
+    """
+    Decode the postings of a saved index whose term hashes are in [low, high).
+    """
+    term_hashes = saved["term_hashes"]
+    first = np.searchsorted(term_hashes, low)
+    last = len(term_hashes) if high is None else np.searchsorted(term_hashes, high)
+    frequencies = saved["document_frequencies"][first:last].astype(np.int64)
+    gaps = decode_varints(saved["postings"][saved["offsets"][first]:saved["offsets"][last]])
+    if len(gaps) == 0:
+        return np.empty(0, np.uint64), np.empty(0, np.int32), np.empty(0, np.uint8)
+    # the gaps restart at every term
+    term_starts = np.cumsum(frequencies) - frequencies
+    totals = np.cumsum(gaps)
+    rows = totals - np.repeat(totals[term_starts] - gaps[term_starts], frequencies)
+    posting_starts = saved["posting_starts"]
+    return (np.repeat(term_hashes[first:last], frequencies), rows.astype(np.int32),
+            saved["term_frequencies"][posting_starts[first]:posting_starts[last]])
+
+
+def compress_postings(hashes: np.ndarray, rows: np.ndarray, frequencies: np.ndarray) -> tuple:
+    """
+    Return the terms, document frequencies, varint-encoded row gaps and term frequencies of postings
+    sorted by term hash (and by row within a term).
+    """
+    term_hashes, term_starts, document_frequencies = np.unique(
+        hashes, return_index=True, return_counts=True)
+    rows = rows.astype(np.int64)
+    gaps = np.diff(rows, prepend=0)
+    gaps[term_starts] = rows[term_starts]
+    return term_hashes, document_frequencies, encode_varints(gaps), frequencies
@@ -0,0 +1,102 @@
+import unittest
+import os
+import tempfile
+import numpy as np
+from bm25_index import BM25IndexBuilder, decode_varints, encode_varints, term_hash, tokenize
+from model import HotelBatch
+
+
+def hotel_batch(first_id: int, names: list) -> HotelBatch:
+    columns = {field: ["Unknown"] * len(names) for field in HotelBatch.FIELDS}
+    columns["hotel_name"] = names
+    return HotelBatch(list(range(first_id, first_id + len(names))), columns)
+
+
+class TestBM25IndexBuilder(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "indexes", "bm25_index.npz")
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def postings(self, term: str) -> tuple:
+        """
+        Decode the ids and term frequencies of the hotels containing a term from the saved index.
+        """
+        with np.load(self.path) as index:
+            position = np.searchsorted(index["term_hashes"], np.uint64(term_hash(term)))
+            if position == len(index["term_hashes"]) or index["term_hashes"][position] != term_hash(term):
+                return [], []
+            start, end = index["offsets"][position], index["offsets"][position + 1]
+            rows = np.cumsum(decode_varints(index["postings"][start:end]))
+            first = int(index["document_frequencies"][:position].sum())
+            frequencies = index["term_frequencies"][first:first + len(rows)]
+            return index["ids"][rows].tolist(), frequencies.tolist()
+
+    def test_varints_round_trip(self):
+        values = np.array([0, 1, 127, 128, 300, 2 ** 21, 2 ** 40], dtype=np.int64)
+        encoded = encode_varints(values)
+        self.assertEqual(1 + 1 + 1 + 2 + 2 + 4 + 6, len(encoded))
+        np.testing.assert_array_equal(values, decode_varints(encoded))
+
+    def test_tokenize(self):
+        self.assertEqual(["hotel", "spa", "munchen", "80331"], tokenize("The Hotel & Spa, München 80331"))
+
+    def test_postings_of_terms(self):
+        builder = BM25IndexBuilder(self.path)
+        builder.add(hotel_batch(1, ["Grand Hotel", "Hotel Spa Spa", "Beach Resort"]))
+        builder.save()
+
+        self.assertEqual(([1, 2], [1, 1]), self.postings("hotel"))
+        self.assertEqual(([2], [2]), self.postings("spa"))
+        self.assertEqual(([], []), self.postings("castle"))
+        with np.load(self.path) as index:
+            self.assertEqual([2, 3, 2], index["lengths"].tolist())
+
+    def test_hotels_are_added_once(self):
+        builder = BM25IndexBuilder(self.path)
+        builder.add(hotel_batch(1, ["Grand Hotel"]))
+        builder.add(hotel_batch(1, ["Grand Hotel"]))
+        builder.save()
+
+        self.assertEqual(([1], [1]), self.postings("grand"))
+
+    def test_saved_index_is_extended_by_the_next_run(self):
+        builder = BM25IndexBuilder(self.path)
+        builder.add(hotel_batch(1, ["Grand Hotel", "Beach Resort"]))
+        builder.save()
+
+        builder = BM25IndexBuilder(self.path)
+        builder.add(hotel_batch(2, ["Beach Resort", "Grand Beach Hotel"]))
+        builder.save()
+
+        self.assertEqual(([1, 3], [1, 1]), self.postings("grand"))
+        self.assertEqual(([2, 3], [1, 1]), self.postings("beach"))
+
+    def test_runs_are_merged_like_a_single_chunk(self):
+        names = [f"Hotel {i % 7} Beach {i % 3} Spa {i}" for i in range(60)]
+        single = BM25IndexBuilder(self.path)
+        single.add(hotel_batch(1, names))
+        single.save()
+        with np.load(self.path) as index:
+            expected = {name: index[name] for name in index.files}
+
+        os.remove(self.path)
+        builder = BM25IndexBuilder(self.path, run_postings=16)
+        for offset in range(0, 40, 10):
+            builder.add(hotel_batch(1 + offset, names[offset:offset + 10]))
+        builder.save()
+        builder = BM25IndexBuilder(self.path, run_postings=16)
+        builder.add(hotel_batch(41, names[40:]))
+        builder.save()
+
+        self.assertFalse(os.path.exists(builder.run_directory))
+        with np.load(self.path) as index:
+            for name, values in expected.items():
+                np.testing.assert_array_equal(values, index[name], err_msg=name)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,196 @@
+import json
+import os
+import sys
+import threading
+import time
+from typing import List
+
+
+class CheckpointJournal:
+    """
+    Durable, append-only journal of the ingestion progress.
+    Every chunk is identified by the range of ids it contains. The journal records when a range
+    was embedded and when it was stored. Embeddings that were created but not yet stored are kept
+    in a pending file, so a restart stores them without embedding (and paying for) them again.
+    The start of every run is recorded as well, so the throughput excludes the time between runs.
+    """
+
+    EMBEDDED = "embedded"
+    STORED = "stored"
+    STARTED = "started"
+
+    def __init__(self, path: str):
+        self.path = path
+        self.pending_directory = path + ".pending"
+        self.embedded = {}
+        self.stored = []
+        self.entries = []
+        # entries may be appended by several pipeline workers at once
+        self.lock = threading.Lock()
+        self.load()
+
+    def load(self):
+        if not os.path.exists(self.path):
+            return
+        line = ""
+        with open(self.path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    # a crash while appending leaves at most one incomplete line
+                    continue
+                self.apply(entry)
+        if line and not line.endswith("\n"):
+            # terminate the incomplete line, so the next entry starts on a line of its own
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write("\n")
+
+    def apply(self, entry: dict) -> List[tuple]:
+        """
+        Apply an entry to the state of the journal and return the pending ranges it releases,
+        i.e. the embedded ranges that are stored completely after a stored entry.
+        """
+        self.entries.append(entry)
+        if entry["event"] == self.STARTED:
+            return []
+        id_range = (entry["first_id"], entry["last_id"])
+        if entry["event"] == self.EMBEDDED:
+            self.embedded[id_range] = entry
+            return []
+        self.stored = merge_ranges(self.stored + [id_range])
+        # the chunk boundaries may have changed since a range was embedded
+        released = [pending for pending in self.embedded if self.is_stored(*pending)]
+        for pending in released:
+            del self.embedded[pending]
+        return released
+
+    def append(self, event: str, first_id: int = None, last_id: int = None, rows: int = 0) -> List[tuple]:
+        entry = {"event": event, "first_id": first_id, "last_id": last_id,
+                 "rows": rows, "time": time.time()}
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self.lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            return self.apply(entry)
+
+    def record_started(self):
+        self.append(self.STARTED)
+
+    def is_stored(self, first_id: int, last_id: int) -> bool:
+        for stored_first, stored_last in self.stored:
+            if stored_first <= first_id and last_id <= stored_last:
+                return True
+        return False
+
+    def record_embedded(self, first_id: int, last_id: int, embeddings: dict):
+        """
+        Persist the embeddings of a range before recording it as embedded.
+        """
+        os.makedirs(self.pending_directory, exist_ok=True)
+        path = self.pending_path(first_id, last_id)
+        with open(path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump({str(key): {"values": list(map(float, embedding["values"])), "metadata": embedding["metadata"]}
+                       for key, embedding in embeddings.items()}, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(path + ".tmp", path)
+        self.append(self.EMBEDDED, first_id, last_id, len(embeddings))
+
+    def record_stored(self, first_id: int, last_id: int, rows: int):
+        for pending_first, pending_last in self.append(self.STORED, first_id, last_id, rows):
+            path = self.pending_path(pending_first, pending_last)
+            if os.path.exists(path):
+                os.remove(path)
+
+    def pending_embeddings(self, first_id: int, last_id: int) -> dict:
+        """
+        Return the embeddings of the ids of a range that were embedded but not stored, keyed by id.
+        The embeddings are looked up in every pending range that overlaps the range, so they are
+        found even if the chunk boundaries changed since they were created. Ids that were not
+        embedded are missing from the result.
+        """
+        with self.lock:
+            overlapping = [(pending_first, pending_last) for pending_first, pending_last in self.embedded
+                           if pending_first <= last_id and first_id <= pending_last]
+        embeddings = {}
+        for pending_first, pending_last in sorted(overlapping):
+            path = self.pending_path(pending_first, pending_last)
+            if not os.path.exists(path):
+                continue
+            with open(path, encoding="utf-8") as f:
+                for key, embedding in json.load(f).items():
+                    if first_id <= int(key) <= last_id:
+                        embeddings[int(key)] = embedding
+        return embeddings
+
+    def pending_path(self, first_id: int, last_id: int) -> str:
+        return os.path.join(self.pending_directory, f"{first_id}-{last_id}.json")
+
+    def status(self, total_rows: int = None) -> dict:
+        """
+        Summarise the progress recorded in the journal and the throughput of the current (or last) run.
+        """
+        run_start = 0
+        for i, entry in enumerate(self.entries):
+            if entry["event"] == self.STARTED:
+                run_start = i
+        run_entries = self.entries[run_start:]
+        stored_entries = [
+            entry for entry in run_entries if entry["event"] == self.STORED]
+        rows_stored = sum(last - first + 1 for first, last in self.stored)
+        status = {
+            "rows_stored": rows_stored,
+            "rows_pending": sum(entry["rows"] for entry in self.embedded.values()),
+            "stored_ranges": self.stored,
+            "pending_ranges": sorted(self.embedded),
+            "rows_per_second": None,
+            "eta_seconds": None,
+        }
+        if stored_entries:
+            duration = stored_entries[-1]["time"] - run_entries[0]["time"]
+            rows = sum(entry["rows"] for entry in stored_entries)
+            if duration > 0:
+                status["rows_per_second"] = rows / duration
+        if total_rows and status["rows_per_second"]:
+            status["eta_seconds"] = max(
+                total_rows - rows_stored, 0) / status["rows_per_second"]
+        return status
+
+    def print_status(self, total_rows: int = None):
+        status = self.status(total_rows)
+        progress = f"{status['rows_stored']}"
+        if total_rows:
+            progress += f" / {total_rows} ({100 * status['rows_stored'] / total_rows:.1f}%)"
+        print(f"Checkpoint journal: {self.path}")
+        print(f"Rows stored: {progress}")
+        print(f"Rows embedded but not stored: {status['rows_pending']}")
+        print(f"Stored id ranges: {status['stored_ranges']}")
+        if status["rows_per_second"]:
+            print(f"Throughput: {status['rows_per_second']:.1f} rows/sec")
+        if status["eta_seconds"] is not None:
+            print(f"ETA: {status['eta_seconds'] / 60:.1f} minutes")
+
+
+def merge_ranges(ranges: List[tuple]) -> List[tuple]:
+    """
+    Merge overlapping and adjacent inclusive id ranges.
+    """
+    merged = []
+    for first, last in sorted(ranges):
+        if merged and first <= merged[-1][1] + 1:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], last))
+        else:
+            merged.append((first, last))
+    return merged
+
+
+if __name__ == '__main__':
+    if len(sys.argv) < 2:
+        raise ValueError("Please provide the path of the checkpoint journal as an argument.")
+    CheckpointJournal(sys.argv[1]).print_status(
+        int(sys.argv[2]) if len(sys.argv) > 2 else None)
@@ -0,0 +1,99 @@
+import unittest
+import os
+import tempfile
+from unittest import mock
+from checkpoint import CheckpointJournal, merge_ranges
+
+
+class TestCheckpointJournal(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "ingestion.jsonl")
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_stored_ranges_survive_a_restart(self):
+        journal = CheckpointJournal(self.path)
+        journal.record_stored(1, 50, 50)
+        journal.record_stored(51, 100, 50)
+
+        reloaded = CheckpointJournal(self.path)
+
+        self.assertEqual([(1, 100)], reloaded.stored)
+        self.assertTrue(reloaded.is_stored(51, 100))
+        self.assertFalse(reloaded.is_stored(101, 150))
+
+    def test_embedded_but_not_stored_embeddings_are_kept(self):
+        journal = CheckpointJournal(self.path)
+        journal.record_embedded(
+            1, 2, {1: {"values": [0.5], "metadata": {"a": "b"}}, 2: {"values": [1], "metadata": {}}})
+
+        reloaded = CheckpointJournal(self.path)
+        embeddings = reloaded.pending_embeddings(1, 2)
+
+        self.assertEqual({"values": [0.5], "metadata": {"a": "b"}}, embeddings[1])
+        self.assertEqual(2, reloaded.status()["rows_pending"])
+
+        reloaded.record_stored(1, 2, 2)
+        self.assertEqual({}, reloaded.pending_embeddings(1, 2))
+        self.assertEqual(2, reloaded.status()["rows_stored"])
+
+    def test_pending_embeddings_are_found_by_id(self):
+        journal = CheckpointJournal(self.path)
+        journal.record_embedded(1, 4, {key: {"values": [key], "metadata": {}} for key in range(1, 5)})
+        journal.record_embedded(5, 6, {key: {"values": [key], "metadata": {}} for key in range(5, 7)})
+
+        self.assertEqual([3, 4, 5], sorted(journal.pending_embeddings(3, 5)))
+
+        # the pending files are removed once all of their ids are stored
+        journal.record_stored(1, 3, 3)
+        self.assertEqual([(1, 4), (5, 6)], journal.status()["pending_ranges"])
+        journal.record_stored(4, 8, 5)
+        self.assertEqual([], journal.status()["pending_ranges"])
+        self.assertEqual([], os.listdir(journal.pending_directory))
+
+    def test_incomplete_last_line_is_ignored(self):
+        CheckpointJournal(self.path).record_stored(1, 50, 50)
+        with open(self.path, "a") as f:
+            f.write('{"event": "stored", "fir')
+
+        reloaded = CheckpointJournal(self.path)
+        reloaded.record_stored(51, 60, 10)
+
+        self.assertEqual([(1, 60)], CheckpointJournal(self.path).stored)
+
+    def test_throughput_is_measured_from_the_start_of_the_run(self):
+        journal = CheckpointJournal(self.path)
+        for now, record in [(0, journal.record_started), (10, lambda: journal.record_stored(1, 100, 100)),
+                            # the next run starts an hour later
+                            (3600, journal.record_started), (3610, lambda: journal.record_stored(101, 150, 50)),
+                            (3620, lambda: journal.record_stored(151, 200, 50))]:
+            with mock.patch("checkpoint.time.time", return_value=now):
+                record()
+
+        status = CheckpointJournal(self.path).status(total_rows=400)
+
+        self.assertEqual(200, status["rows_stored"])
+        self.assertEqual(5.0, status["rows_per_second"])
+        self.assertEqual(40.0, status["eta_seconds"])
+
+    def test_throughput_of_a_run_with_one_stored_chunk(self):
+        journal = CheckpointJournal(self.path)
+        for now, record in [(0, journal.record_started), (10, lambda: journal.record_stored(1, 100, 100))]:
+            with mock.patch("checkpoint.time.time", return_value=now):
+                record()
+
+        status = CheckpointJournal(self.path).status(total_rows=300)
+
+        self.assertEqual(10.0, status["rows_per_second"])
+        self.assertEqual(20.0, status["eta_seconds"])
+
+    def test_merge_ranges(self):
+        self.assertEqual([(1, 20), (30, 40)], merge_ranges(
+            [(11, 20), (30, 40), (1, 10), (5, 8)]))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,63 @@
+import threading
+from pinecone import Pinecone, ServerlessSpec
+from google import genai
+
+
+class ClientPool:
+    """
+    Shares API clients and index handles across an ingestion run.
+    Every client keeps its HTTP connections alive, so reusing it avoids a new connection
+    (and the index lookup) for every chunk. The pool counts how often each kind of handle
+    was created and how often it was reused.
+    """
+
+    def __init__(self):
+        self.handles = {}
+        self.created = {}
+        self.reused = {}
+        # the pool is shared by the pipeline workers
+        self.lock = threading.RLock()
+
+    def get(self, kind: str, key: tuple, factory):
+        with self.lock:
+            if (kind, key) in self.handles:
+                self.reused[kind] = self.reused.get(kind, 0) + 1
+            else:
+                self.handles[(kind, key)] = factory()
+                self.created[kind] = self.created.get(kind, 0) + 1
+            return self.handles[(kind, key)]
+
+    def pinecone(self, api_key: str) -> Pinecone:
+        return self.get("pinecone", (api_key,), lambda: Pinecone(api_key=api_key))
+
+    def gemini(self, api_key: str) -> genai.Client:
+        return self.get("gemini", (api_key,), lambda: genai.Client(api_key=api_key))
+
+    def pinecone_index(self, api_key: str, index_name: str, dimension: int):
+        """
+        Return a handle of the index, creating the index on the first call if it does not exist.
+        """
+        def create_index():
+            pc = self.pinecone(api_key)
+            if not pc.has_index(index_name):
+                pc.create_index(
+                    name=index_name,
+                    dimension=dimension,
+                    metric="cosine",
+                    spec=ServerlessSpec(
+                        cloud="aws",
+                        region="us-east-1"
+                    )
+                )
+            return pc.Index(index_name)
+
+        return self.get("pinecone_index", (api_key, index_name), create_index)
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {kind: {"created": self.created.get(kind, 0), "reused": self.reused.get(kind, 0)}
+                    for kind in sorted(set(self.created) | set(self.reused))}
+
+
+# pool shared by all embedding creators and storages that are not given a pool of their own
+default_pool = ClientPool()
@@ -0,0 +1,33 @@
+import unittest
+from client_pool import ClientPool
+
+
+class TestClientPool(unittest.TestCase):
+
+    def test_handles_are_created_once_per_key(self):
+        pool = ClientPool()
+        created = []
+
+        def factory():
+            created.append(object())
+            return created[-1]
+
+        first = pool.get("index", ("key", "hotels"), factory)
+        second = pool.get("index", ("key", "hotels"), factory)
+        other = pool.get("index", ("key", "other"), factory)
+
+        self.assertIs(first, second)
+        self.assertIsNot(first, other)
+        self.assertEqual(2, len(created))
+        self.assertEqual({"index": {"created": 2, "reused": 1}}, pool.stats())
+
+    def test_clients_are_reused(self):
+        pool = ClientPool()
+
+        self.assertIs(pool.gemini("key"), pool.gemini("key"))
+        self.assertIs(pool.pinecone("key"), pool.pinecone("key"))
+        self.assertEqual({"created": 1, "reused": 1}, pool.stats()["gemini"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,8 +1,34 @@
 from abc import ABC, abstractmethod
-from pandas import read_csv
-from model import Hotel
+from pandas import DataFrame, read_csv
+from model import Hotel, HotelBatch, INTERNED_FIELDS
+from attraction_extractor import extract_attractions_batch
 from typing import List, Sequence, Generator
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+import io
 import math
+import sys
+import numpy as np
+
+# columns of the hotels CSV and the Hotel fields they are stored in
+HOTEL_COLUMNS = {
+    "countyCode": "country_code",
+    "countyName": "country_name",
+    "cityCode": "city_code",
+    "cityName": "city_name",
+    "HotelCode": "hotel_code",
+    "HotelName": "hotel_name",
+    "HotelRating": "hotel_rating",
+    "Address": "address",
+    "Attractions": "attractions",
+    "Description": "description",
+    "FaxNumber": "fax_number",
+    "HotelFacilities": "hotel_facilities",
+    "Map": "map_coordinates",
+    "PhoneNumber": "phone_number",
+    "PinCode": "pin_code",
+    "HotelWebsiteUrl": "hotel_website_url",
+}
 
 
 class DataCollector(ABC):
@@ -55,15 +81,22 @@ class CSVDataCollector(DataCollector):
             }
         }
         """
+        for i, chunk in self.collect_frames():
+            yield i, {
+                "source": self.source,
+                "data": chunk.to_dict(orient='index')
+            }
+
+    def collect_frames(self) -> Generator[int, DataFrame, None]:
+        """
+        Collect data from a CSV file and return each chunk as a DataFrame.
+        """
         reader = read_csv(self.source, encoding=self.encoding,
                           sep=self.separator, header=0, chunksize=self.chunksize, nrows=self.nrows, skiprows=self.skiprows)
         # remove leading and trailing whitespaces
         for i, chunk in enumerate(reader):
             chunk.columns = chunk.columns.str.strip()
-            yield i, {
-                "source": self.source,
-                "data": chunk.to_dict(orient='index')
-            }
+            yield i, chunk
 
 
 class HotelDataCollector(DataCollector):
@@ -73,13 +106,33 @@ class HotelDataCollector(DataCollector):
 
     UNKNOWN_VALUE = "Unknown"
 
-    def __init__(self, file_path: str, chunksize: int = 1000, nrows: int = None, skiprows: int = 0):
+    ENCODING = "Windows-1252"
+
+    def __init__(self, file_path: str, chunksize: int = 1000, nrows: int = None, skiprows: int = 0, columnar: bool = False, workers: int = 1, parse_attractions: bool = False):
         super().__init__(file_path, chunksize)
+        # skip the first skiprows records after the header row
         self.csv_data_collector = CSVDataCollector(
-            file_path,  chunksize, nrows, range(2, 2 + skiprows), "Windows-1252", ",")
+            file_path,  chunksize, nrows, range(1, 1 + skiprows), self.ENCODING, ",")
+        self.nrows = nrows
         self.skiprows = skiprows
+        # Yield a HotelBatch per chunk, built with vectorized DataFrame operations
+        self.columnar = columnar
+        # Parse the chunks in a pool of worker processes
+        self.workers = workers
+        # Parse the attractions of each HotelBatch into structured arrays
+        if parse_attractions and not columnar:
+            raise ValueError(
+                "Structured attractions are only available for columnar collection.")
+        self.parse_attractions = parse_attractions
 
     def collect(self) -> Generator[int, List[Hotel], None]:
+        if self.workers > 1:
+            for i, batch in self.collect_parallel():
+                yield i, batch if self.columnar else list(batch)
+            return
+        if self.columnar:
+            yield from self.collect_batches()
+            return
 
         id = 1 + self.skiprows
         for i, data in self.csv_data_collector.collect():
@@ -87,13 +140,13 @@ class HotelDataCollector(DataCollector):
             for _, row in data["data"].items():
                 hotel = Hotel(id)
                 id += 1
-                hotel.country_code = self.extract_str(row["countyCode"])
-                hotel.country_name = self.extract_str(row["countyName"])
-                hotel.city_code = self.extract_str(row["cityCode"])
-                hotel.city_name = self.extract_str(row["cityName"])
+                hotel.country_code = sys.intern(self.extract_str(row["countyCode"]))
+                hotel.country_name = sys.intern(self.extract_str(row["countyName"]))
+                hotel.city_code = sys.intern(self.extract_str(row["cityCode"]))
+                hotel.city_name = sys.intern(self.extract_str(row["cityName"]))
                 hotel.hotel_code = self.extract_str(row["HotelCode"])
                 hotel.hotel_name = self.extract_str(row["HotelName"])
-                hotel.hotel_rating = self.extract_str(row["HotelRating"])
+                hotel.hotel_rating = sys.intern(self.extract_str(row["HotelRating"]))
                 hotel.address = self.extract_str(row["Address"])
                 hotel.attractions = self.extract_str(row["Attractions"])
                 hotel.description = self.extract_str(row["Description"])
@@ -110,6 +163,41 @@ class HotelDataCollector(DataCollector):
 
             yield i, hotels
 
+    def collect_batches(self) -> Generator[int, HotelBatch, None]:
+        """
+        Collect the hotels of each chunk as a HotelBatch. Missing values are replaced and all
+        values are cast to strings column by column, with the same result as extract_str.
+        """
+        id = 1 + self.skiprows
+        for i, chunk in self.csv_data_collector.collect_frames():
+            yield i, to_hotel_batch(chunk, id, self.parse_attractions)
+            id += len(chunk)
+
+    def collect_parallel(self) -> Generator[int, HotelBatch, None]:
+        """
+        Split the file into byte ranges of chunksize records and parse them in worker processes.
+        The ranges are the same chunks the serial collector reads, so the hotels get the same IDs.
+        """
+        header = read_csv(self.source, encoding=self.ENCODING, nrows=0)
+        columns = header.columns.str.strip().tolist()
+        offsets = find_record_offsets(self.source)
+        first = min(self.skiprows, len(offsets) - 1)
+        last = len(offsets) - 1 if self.nrows is None else min(
+            first + self.nrows, len(offsets) - 1)
+        starts = range(first, last, self.chunksize)
+
+        with ProcessPoolExecutor(self.workers) as executor:
+            pending = deque()
+            for i, start in enumerate(starts):
+                end = min(start + self.chunksize, last)
+                pending.append(executor.submit(
+                    parse_hotel_range, self.source, int(offsets[start]), int(offsets[end]), columns, 1 + start, self.parse_attractions))
+                # bound the number of parsed chunks waiting to be consumed
+                if len(pending) >= 2 * self.workers:
+                    yield i - len(pending) + 1, pending.popleft().result()
+            while pending:
+                yield len(starts) - len(pending), pending.popleft().result()
+
     def extract_str(self, value):
         if value is None:
             return self.UNKNOWN_VALUE
@@ -117,7 +205,65 @@ class HotelDataCollector(DataCollector):
             return self.UNKNOWN_VALUE
         return str(value)
 
+
+def to_hotel_batch(chunk: DataFrame, first_id: int, parse_attractions: bool = False) -> HotelBatch:
     """
+    Convert a chunk of the hotels CSV to a HotelBatch. Missing values are replaced and all
+    values are cast to strings column by column, with the same result as extract_str.
+    """
+    frame = chunk[list(HOTEL_COLUMNS)].rename(columns=HOTEL_COLUMNS)
+    frame = frame.astype(object).where(
+        frame.notna(), HotelDataCollector.UNKNOWN_VALUE).astype(str)
+    ids = list(range(first_id, first_id + len(frame)))
+    batch = HotelBatch(ids, {field: list(map(sys.intern, frame[field].tolist())) if field in INTERNED_FIELDS
+                             else frame[field].tolist() for field in HotelBatch.FIELDS})
+    if parse_attractions:
+        batch.attraction_table, batch.airport_table = extract_attractions_batch(
+            batch.columns["attractions"])
+    return batch
+
 
+def parse_hotel_range(path: str, start: int, end: int, columns: List[str], first_id: int, parse_attractions: bool = False) -> HotelBatch:
+    """
+    Parse the records between two byte offsets of the hotels CSV (runs in a worker process).
+    """
+    with open(path, "rb") as f:
+        f.seek(start)
+        data = f.read(end - start)
+    chunk = read_csv(io.BytesIO(data), encoding=HotelDataCollector.ENCODING,
+                     sep=",", header=None, names=columns)
+    return to_hotel_batch(chunk, first_id, parse_attractions)
 
-"""
+
+def find_record_offsets(path: str, block_size: int = 1 << 24) -> np.ndarray:
+    """
+    Return the byte offset at which each record of a CSV file starts, followed by the size of the file.
+    Offset 0 is the start of the first record after the header row. A line break ends a record
+    only if it is preceded by an even number of quotes, so quoted fields may span several lines.
+    """
+    ends = []
+    parity = 0
+    position = 0
+    with open(path, "rb") as f:
+        while block := f.read(block_size):
+            data = np.frombuffer(block, dtype=np.uint8)
+            # the sum wraps around in uint8, which keeps its parity
+            quotes = np.cumsum(data == ord('"'), dtype=np.uint8) + parity
+            line_breaks = np.flatnonzero(
+                (data == ord("\n")) & (quotes % 2 == 0))
+            ends.append(line_breaks + position + 1)
+            parity = int(quotes[-1] % 2)
+            position += len(block)
+
+    offsets = np.concatenate(ends) if ends else np.empty(0, dtype=np.int64)
+    if len(offsets) == 0 or offsets[-1] < position:
+        # the last record has no line break
+        offsets = np.append(offsets, position)
+    return offsets
+
+
+def count_records(path: str) -> int:
+    """
+    Return the number of records of a CSV file (without the header row).
+    """
+    return len(find_record_offsets(path)) - 1
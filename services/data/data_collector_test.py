@@ -1,5 +1,15 @@
 import unittest
-from data_collector import HotelDataCollector
+import os
+import tempfile
+from data_collector import HotelDataCollector, count_records, find_record_offsets
+from model import HotelBatch
+
+HEADER = "countyCode, countyName, cityCode, cityName, HotelCode, HotelName, HotelRating, Address, Attractions, Description, FaxNumber, HotelFacilities, Map, PhoneNumber, PinCode, HotelWebsiteUrl"
+ROWS = [
+    'AL,Albania,106078,Albanien,1003300,De Paris Hotel,FourStar,Nr. 7 Brigada Viii Street Tirane ,,"Hotel de Paris is a charming boutique hotel.\n\nRooms are ""luxuriously"" furnished.",42268822,Private parking,41.32213|19.81665,00355 4226 5009,1000,http://example.com',
+    'AL,Albania,106078,Albanien,1003301,Hotel Green,ThreeStar,"Rruga Kavajes, Km 2",<p>Skanderbeg Square - 1.2 km / 0.7 mi <br /></p>,,,Free WiFi,41.3|19.8,,,',
+    'DE,Germany,100001,Berlin,1003302,Hotel Café,All,Unter den Linden 1,,Central.,,Spa,52.5|13.4,030 123,10117,',
+]
 
 
 class TestHotelDataCollector(unittest.TestCase):
@@ -34,5 +44,101 @@ class TestHotelDataCollector(unittest.TestCase):
                 self.assertTrue(hotel.to_dict())
 
 
+class TestHotelDataCollectorColumnar(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "hotels.csv")
+        with open(self.path, "w", encoding="Windows-1252", newline="") as f:
+            f.write("\n".join([HEADER] + ROWS) + "\n")
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_columnar_batches_equal_hotels(self):
+        hotels = [hotel for _, chunk in HotelDataCollector(
+            self.path, 2).collect() for hotel in chunk]
+        batches = [batch for _, batch in HotelDataCollector(
+            self.path, 2, columnar=True).collect()]
+
+        self.assertTrue(all(isinstance(batch, HotelBatch) for batch in batches))
+        self.assertEqual([2, 1], [len(batch) for batch in batches])
+        self.assertEqual([hotel.id for hotel in hotels],
+                         [id for batch in batches for id in batch.ids])
+        self.assertEqual([hotel.to_dict() for hotel in hotels],
+                         [hotel_dict for batch in batches for hotel_dict in batch.to_dicts()])
+
+    def test_columnar_batch_values(self):
+        _, batch = next(HotelDataCollector(
+            self.path, 10, columnar=True).collect())
+
+        self.assertEqual("1003300", batch.columns["hotel_code"][0])
+        self.assertEqual("Unknown", batch.columns["attractions"][0])
+        self.assertEqual("Hotel Café", batch[2].hotel_name)
+        self.assertIn('Rooms are "luxuriously" furnished.', batch[0].description)
+
+    def test_repeated_values_are_interned(self):
+        hotels = next(HotelDataCollector(self.path, 10).collect())[1]
+        _, batch = next(HotelDataCollector(self.path, 10, columnar=True).collect())
+
+        self.assertIs(hotels[0].country_name, hotels[1].country_name)
+        self.assertIs(batch.columns["city_name"][0], batch.columns["city_name"][1])
+        self.assertIs(hotels[0].city_name, batch.columns["city_name"][0])
+
+    def test_parse_attractions_adds_structured_arrays(self):
+        _, batch = next(HotelDataCollector(
+            self.path, 10, columnar=True, parse_attractions=True).collect())
+
+        self.assertEqual([1], batch.attraction_table["hotel_index"].tolist())
+        self.assertEqual(["Skanderbeg Square"], batch.attraction_table["name"].tolist())
+        self.assertEqual(0, len(batch.airport_table))
+
+    def test_parse_attractions_requires_columnar(self):
+        with self.assertRaises(ValueError):
+            HotelDataCollector(self.path, 10, parse_attractions=True)
+
+    def test_skiprows_skips_the_first_records(self):
+        _, hotels = next(HotelDataCollector(self.path, 10, skiprows=1).collect())
+
+        self.assertEqual([2, 3], [hotel.id for hotel in hotels])
+        self.assertEqual("Hotel Green", hotels[0].hotel_name)
+
+
+class TestHotelDataCollectorParallel(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "hotels.csv")
+        with open(self.path, "w", encoding="Windows-1252", newline="") as f:
+            f.write("\n".join([HEADER] + ROWS * 5) + "\n")
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_record_offsets_respect_quoted_line_breaks(self):
+        offsets = find_record_offsets(self.path, block_size=64)
+
+        self.assertEqual(16, len(offsets))
+        with open(self.path, "rb") as f:
+            data = f.read()
+        self.assertEqual(len(data), offsets[-1])
+        self.assertTrue(data[offsets[1]:].startswith(b"AL,Albania,106078,Albanien,1003301"))
+        self.assertEqual(15, count_records(self.path))
+
+    def test_parallel_chunks_equal_serial_chunks(self):
+        for skiprows, nrows in [(0, None), (4, 7), (14, None)]:
+            with self.subTest(skiprows=skiprows, nrows=nrows):
+                serial = list(HotelDataCollector(
+                    self.path, 3, nrows, skiprows, columnar=True).collect())
+                parallel = list(HotelDataCollector(
+                    self.path, 3, nrows, skiprows, columnar=True, workers=2).collect())
+
+                self.assertEqual([i for i, _ in serial], [i for i, _ in parallel])
+                self.assertEqual([list(batch.ids) for _, batch in serial],
+                                 [list(batch.ids) for _, batch in parallel])
+                self.assertEqual([batch.to_dicts() for _, batch in serial],
+                                 [batch.to_dicts() for _, batch in parallel])
+
+
 if __name__ == '__main__':
     unittest.main()
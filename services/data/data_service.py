@@ -1,36 +1,289 @@
 import kagglehub
 from typing import List
-from data_collector import DataCollector, HotelDataCollector
+from model import HotelBatch
+from data_collector import DataCollector, HotelDataCollector, count_records
 from embedding_creator import EmbeddingCreator, HotelPineconeEmbeddingCreator, HotelGeminiEmbeddingCreator
-from embedding_storage import EmbeddingStorage, PineconeEmbeddingStorage
+from embedding_storage import EmbeddingStorage, PineconeEmbeddingStorage, LocalEmbeddingStorage
+from ann_index import IVFEmbeddingStorage
+from checkpoint import CheckpointJournal
+from embedding_cache import EmbeddingCache
+from client_pool import default_pool
+from index_builder import IndexBuilder
+from gazetteer import GazetteerBuilder
+from bm25_index import BM25IndexBuilder
+from geo_index import GeoIndexBuilder
+from telemetry import IngestionTelemetry
 import os
+import queue
+import sys
+import threading
 import time
 
 
 class DataService:
-    def __init__(self, data_collectors: List[DataCollector], embedding_creator: EmbeddingCreator, embedding_storage: EmbeddingStorage):
+    def __init__(self, data_collectors: List[DataCollector], embedding_creator: EmbeddingCreator, embedding_storage: EmbeddingStorage, pipelined: bool = False, embed_workers: int = 1, store_workers: int = 1, queue_size: int = 2, checkpoint: CheckpointJournal = None, index_builders: List[IndexBuilder] = None, telemetry: IngestionTelemetry = None, embed_rows: int = None):
         self.data_collectors = data_collectors
         self.embedding_creator = embedding_creator
         self.embedding_storage = embedding_storage
         self.chunks_completed = 0
+        # Chunks recorded as stored in the checkpoint journal are skipped
+        self.checkpoint = checkpoint
+        # Pipelined mode: collect, embed and store run concurrently, connected by bounded queues
+        self.pipelined = pipelined
+        self.embed_workers = embed_workers
+        self.store_workers = store_workers
+        self.queue_size = queue_size
+        # Consecutive chunks are merged until they hold embed_rows rows before they are embedded and
+        # stored, so the size of the embedding requests does not depend on the rows read at a time
+        self.embed_rows = embed_rows
+        # Search artifacts built from every collected chunk, e.g. the location gazetteer
+        self.index_builders = index_builders or []
+        # Rows per second and latencies of the stages, the per-chunk messages go through it as well
+        self.telemetry = telemetry or IngestionTelemetry()
 
     def run(self):
+        self.telemetry.start()
+        if self.checkpoint is not None:
+            self.checkpoint.record_started()
+        try:
+            if self.pipelined:
+                self.run_pipelined()
+            else:
+                self.run_serial()
+        finally:
+            # the builders are idempotent, so a partial index is completed by the next run
+            for index_builder in self.index_builders:
+                index_builder.save()
+            self.telemetry.finish()
+
+    def run_serial(self):
         print("Running data service...")
         for data_collector in self.data_collectors:
             print(f"Collecting data from {data_collector.source}...")
-            for i, data in data_collector.collect():
-                print(f"Processing chunk {i + 1}...")
-                print(f"Collected data: {data}")
-                print(
+            for i, chunks, data in self.merged_chunks(data_collector):
+                if data is None:
+                    self.chunks_completed += chunks
+                    continue
+                id_range = self.id_range(data)
+                self.telemetry.log(
                     f"Creating embeddings for {data_collector.source}...")
-                embeddings = self.embedding_creator.create(data)
-                print(
+                embeddings = self.create_embeddings(data, id_range, i)
+                self.telemetry.log(
                     f"Storing embeddings in index {self.embedding_storage.index_name}...")
-                self.embedding_storage.store(embeddings)
-                self.chunks_completed += 1
+                self.store_embeddings(embeddings, id_range, i)
+                self.chunks_completed += chunks
 
         print("Data service completed.")
 
+    def collect(self, data_collector: DataCollector):
+        """
+        Yield the chunks of a collector, recording the time spent waiting for each as the parse stage.
+        """
+        chunks = iter(data_collector.collect())
+        while True:
+            start = time.perf_counter()
+            try:
+                i, data = next(chunks)
+            except StopIteration:
+                return
+            self.telemetry.record("parse", len(data), time.perf_counter() - start, i)
+            yield i, data
+
+    def merged_chunks(self, data_collector: DataCollector):
+        """
+        Yield (index of the last chunk, number of chunks, data) for the chunks of a collector that are
+        not stored yet, after adding every chunk to the indexes. Unless embed_rows is None, consecutive
+        chunks are merged until they hold embed_rows rows. Stored chunks are skipped, yielding None
+        as their data.
+        """
+        pending = []
+        for i, data in self.collect(data_collector):
+            self.telemetry.log(f"Processing chunk {i + 1}...")
+            self.add_to_indexes(data, i)
+            if self.is_stored(self.id_range(data)):
+                if pending:
+                    yield i - 1, len(pending), merge_chunks(pending)
+                    pending = []
+                self.telemetry.log(f"Chunk {i + 1} is already stored, skipping...")
+                self.telemetry.skip(len(data))
+                yield i, 1, None
+                continue
+            pending.append(data)
+            if self.embed_rows is None or sum(map(len, pending)) >= self.embed_rows:
+                yield i, len(pending), merge_chunks(pending)
+                pending = []
+        if pending:
+            yield i, len(pending), merge_chunks(pending)
+
+    def add_to_indexes(self, data, chunk: int = None):
+        if not self.index_builders:
+            return
+        start = time.perf_counter()
+        for index_builder in self.index_builders:
+            index_builder.add(data)
+        self.telemetry.record("index", len(data), time.perf_counter() - start, chunk)
+
+    def id_range(self, data) -> tuple:
+        """
+        Return the first and last id of a chunk if it is tracked in the checkpoint journal.
+        """
+        if self.checkpoint is None or len(data) == 0:
+            return None
+        return data[0].id, data[-1].id
+
+    def is_stored(self, id_range: tuple) -> bool:
+        return id_range is not None and self.checkpoint.is_stored(*id_range)
+
+    def create_embeddings(self, data, id_range: tuple, chunk: int = None) -> dict:
+        """
+        Create the embeddings of a chunk, reusing the embeddings the checkpoint journal still holds
+        for its ids, so only the ids without them are embedded.
+        """
+        start = time.perf_counter()
+        if id_range is None:
+            embeddings = self.embedding_creator.create(data)
+        else:
+            embeddings = self.checkpoint.pending_embeddings(*id_range)
+            ids = data.ids if isinstance(data, HotelBatch) else [hotel.id for hotel in data]
+            missing = [position for position, id in enumerate(ids) if id not in embeddings]
+            if missing:
+                # only the rows without pending embeddings are sent to the embedding creator
+                rows = data if len(missing) == len(ids) else [data[position] for position in missing]
+                embeddings.update(self.embedding_creator.create(rows))
+                self.checkpoint.record_embedded(*id_range, embeddings)
+        self.telemetry.record("embed", len(data), time.perf_counter() - start, chunk)
+        return embeddings
+
+    def store_embeddings(self, embeddings: dict, id_range: tuple, chunk: int = None):
+        start = time.perf_counter()
+        self.embedding_storage.store(embeddings)
+        if id_range is not None:
+            self.checkpoint.record_stored(*id_range, len(embeddings))
+        self.telemetry.record("upsert", len(embeddings), time.perf_counter() - start, chunk)
+        self.telemetry.complete(len(embeddings))
+
+    def run_pipelined(self):
+        """
+        Run collection, embedding and storage as a pipeline.
+        Chunks may be stored out of order, but chunks_completed only counts the chunks
+        up to the first unfinished one, so resuming from it never skips a chunk.
+        The first error of any stage stops the pipeline and is raised again.
+        """
+        print(
+            f"Running data service with {self.embed_workers} embedding and {self.store_workers} storage workers...")
+        embed_queue = queue.Queue(maxsize=self.queue_size)
+        store_queue = queue.Queue(maxsize=self.queue_size)
+        self.telemetry.watch_queue("embed", embed_queue)
+        self.telemetry.watch_queue("store", store_queue)
+        stop = threading.Event()
+        errors = []
+        finished = set()
+        lock = threading.Lock()
+
+        def put(target: queue.Queue, item) -> bool:
+            while not stop.is_set():
+                try:
+                    target.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    pass
+            return False
+
+        def get(source: queue.Queue):
+            while not stop.is_set():
+                try:
+                    return source.get(timeout=0.1)
+                except queue.Empty:
+                    pass
+            return None
+
+        def fail(error: Exception):
+            with lock:
+                errors.append(error)
+            stop.set()
+
+        def embed():
+            while not stop.is_set():
+                item = get(embed_queue)
+                if item is None:
+                    return
+                sequence, chunks, source, i, data = item
+                try:
+                    self.telemetry.log(f"Creating embeddings for chunk {i + 1} of {source}...")
+                    id_range = self.id_range(data)
+                    put(store_queue, (sequence, chunks, i, id_range,
+                        self.create_embeddings(data, id_range, i)))
+                except Exception as e:
+                    fail(e)
+
+        def complete(sequence: int, chunks: int):
+            with lock:
+                finished.update(range(sequence, sequence + chunks))
+                while self.chunks_completed in finished:
+                    finished.remove(self.chunks_completed)
+                    self.chunks_completed += 1
+
+        def store():
+            while not stop.is_set():
+                item = get(store_queue)
+                if item is None:
+                    return
+                sequence, chunks, i, id_range, embeddings = item
+                try:
+                    self.telemetry.log(
+                        f"Storing embeddings of chunk {i + 1} in index {self.embedding_storage.index_name}...")
+                    self.store_embeddings(embeddings, id_range, i)
+                except Exception as e:
+                    fail(e)
+                    continue
+                complete(sequence, chunks)
+
+        embed_threads = [threading.Thread(target=embed, daemon=True)
+                         for _ in range(self.embed_workers)]
+        store_threads = [threading.Thread(target=store, daemon=True)
+                         for _ in range(self.store_workers)]
+        for thread in embed_threads + store_threads:
+            thread.start()
+
+        try:
+            sequence = self.chunks_completed
+            for data_collector in self.data_collectors:
+                print(f"Collecting data from {data_collector.source}...")
+                for i, chunks, data in self.merged_chunks(data_collector):
+                    if data is None:
+                        complete(sequence, chunks)
+                    elif not put(embed_queue, (sequence, chunks, data_collector.source, i, data)):
+                        break
+                    sequence += chunks
+                if stop.is_set():
+                    break
+        except Exception as e:
+            fail(e)
+        finally:
+            for _ in embed_threads:
+                put(embed_queue, None)
+            for thread in embed_threads:
+                thread.join()
+            for _ in store_threads:
+                put(store_queue, None)
+            for thread in store_threads:
+                thread.join()
+
+        if errors:
+            raise errors[0]
+        print("Data service completed.")
+
+
+def merge_chunks(chunks: list):
+    """
+    Return the rows of consecutive chunks (lists of hotels or HotelBatches) as one chunk.
+    """
+    if len(chunks) == 1:
+        return chunks[0]
+    if all(isinstance(chunk, HotelBatch) for chunk in chunks):
+        return HotelBatch.concat(chunks)
+    return [item for chunk in chunks for item in chunk]
+
 # Enum for type of embedding creator
 
 
@@ -38,6 +291,14 @@ class EmbeddingType:
     PINECONE = "Pinecone"
     GEMINI = "Gemeni"
 
+# Enum for type of embedding storage
+
+
+class StorageType:
+    PINECONE = "Pinecone"
+    LOCAL = "Local"
+    IVF = "IVF"
+
 
 if __name__ == '__main__':
 
@@ -59,18 +320,63 @@ if __name__ == '__main__':
 
     EMBEDDING_TYPE = EmbeddingType.GEMINI
 
+    # Local vector index (used instead of Pinecone for StorageType.LOCAL and StorageType.IVF)
+    STORAGE_TYPE = StorageType.PINECONE
+    LOCAL_INDEX_PATH = "indexes"
+    IVF_NLIST = 1024  # Number of clusters of the approximate index
+    IVF_NPROBE = 16  # Number of clusters scored per query
+    # Gazetteer of the city and country names for the backend, or 'None' to not build it
+    GAZETTEER_PATH = "indexes/gazetteer.json"
+    # Grid index of the hotel positions and attractions for "near X" queries, or 'None' to not build it
+    GEO_INDEX_PATH = "indexes/geo_index.npz"
+    # Inverted index of the hotel texts for BM25 keyword search, or 'None' to not build it
+    BM25_INDEX_PATH = "indexes/bm25_index.npz"
+
     # Gemeni
     # Replace with your Gemeni API key
 
+    # Cache of created embeddings, so unchanged hotels are not embedded again, or 'None' to disable it
+    EMBEDDING_CACHE_PATH = "cache/embeddings.sqlite"
+    EMBEDDING_CACHE_MAX_ENTRIES = 2_000_000
+
     # Data processing
-    CHUNKSIZE = 50  # Specify the number of rows to read, embed and store at a time
+    # Specify the number of rows to read at a time
+    CHUNKSIZE = 50
+    # Specify the number of rows to embed and store at a time: consecutive chunks are merged up to it
+    # (embedding requests are split further to match the provider's limits)
+    EMBED_ROWS = 200
     NROWS = None  # Specify the number of rows to process, or 'None' to process all rows
     # Specify the number of rows to skip initially (excluding the header row)
     SKIPROWS = 0
     # Specify the number of minutes to wait before running the data service again
     SCHEDULE_MINUTES = 1
+    # Collect hotels column by column as HotelBatch instead of one Hotel object per row
+    COLUMNAR = True
+    PARSE_WORKERS = 1  # Number of processes parsing the CSV file (more than 1 splits it into byte ranges)
+    PARSE_ATTRACTIONS = False  # Parse the attractions of each batch into structured arrays (requires COLUMNAR)
+    # Journal of embedded and stored chunks, or 'None' to resume from the number of completed chunks
+    CHECKPOINT_PATH = "checkpoints/ingestion.jsonl"
+    # Run collection, embedding and storage concurrently
+    PIPELINED = False
+    EMBED_WORKERS = 2  # Number of chunks embedded at the same time
+    STORE_WORKERS = 2  # Number of chunks stored at the same time
+    QUEUE_SIZE = 4  # Number of chunks buffered between two stages
+    # Telemetry
+    QUIET = False  # Print only the summary of a run instead of a message per chunk and the progress reports
+    REPORT_SECONDS = 10  # Seconds between two progress reports (rows/sec, latencies, queue depths, ETA)
+    TELEMETRY_LOG_PATH = "logs/ingestion_telemetry.jsonl"  # JSON log of the chunks and reports, or 'None'
     ########################################################################################
 
+    checkpoint = CheckpointJournal(
+        CHECKPOINT_PATH) if CHECKPOINT_PATH else None
+
+    # 'python data_service.py status' prints the progress of the ingestion and exits
+    if len(sys.argv) > 1 and sys.argv[1] == "status":
+        if checkpoint is None:
+            raise ValueError("No checkpoint journal configured.")
+        checkpoint.print_status(NROWS)
+        sys.exit(0)
+
     if not os.path.exists(DATASET_PATH):
         print("Downloading dataset...")
         kagglehub.dataset_download(
@@ -78,31 +384,62 @@ if __name__ == '__main__':
     else:
         print("Dataset already exists.")
 
+    embedding_cache = EmbeddingCache(
+        EMBEDDING_CACHE_PATH, EMBEDDING_CACHE_MAX_ENTRIES) if EMBEDDING_CACHE_PATH else None
+
     # switch between Pinecone and Gemeni
     embedding_creator = None
     match EMBEDDING_TYPE:
         case EmbeddingType.PINECONE:
-            embedding_creator = HotelPineconeEmbeddingCreator(PINECONE_API_KEY)
-            embedding_storage = PineconeEmbeddingStorage(
-                PINECONE_INDEX_NAME_PINECONE, 1024, PINECONE_NAMESPACE, PINECONE_API_KEY)
+            embedding_creator = HotelPineconeEmbeddingCreator(
+                PINECONE_API_KEY, embedding_cache)
+            index_name, dimension = PINECONE_INDEX_NAME_PINECONE, 1024
         case EmbeddingType.GEMINI:
-            embedding_creator = HotelGeminiEmbeddingCreator(GEMINI_API_KEY)
-            embedding_storage = PineconeEmbeddingStorage(
-                PINECONE_INDEX_NAME_GEMINI, 768, PINECONE_NAMESPACE, PINECONE_API_KEY)
+            embedding_creator = HotelGeminiEmbeddingCreator(
+                GEMINI_API_KEY, embedding_cache)
+            index_name, dimension = PINECONE_INDEX_NAME_GEMINI, 768
         case _:
             raise ValueError(
                 f"Invalid embedding creator type: {EMBEDDING_TYPE}")
 
+    # switch between Pinecone and the local vector indexes
+    match STORAGE_TYPE:
+        case StorageType.PINECONE:
+            embedding_storage = PineconeEmbeddingStorage(
+                index_name, dimension, PINECONE_NAMESPACE, PINECONE_API_KEY)
+        case StorageType.LOCAL:
+            embedding_storage = LocalEmbeddingStorage(
+                index_name, dimension, PINECONE_NAMESPACE, LOCAL_INDEX_PATH)
+        case StorageType.IVF:
+            embedding_storage = IVFEmbeddingStorage(
+                index_name, dimension, PINECONE_NAMESPACE, LOCAL_INDEX_PATH, IVF_NLIST, IVF_NPROBE)
+        case _:
+            raise ValueError(
+                f"Invalid embedding storage type: {STORAGE_TYPE}")
+
+    index_builders = []
+    if GAZETTEER_PATH:
+        index_builders.append(GazetteerBuilder(GAZETTEER_PATH))
+    if GEO_INDEX_PATH:
+        index_builders.append(GeoIndexBuilder(GEO_INDEX_PATH))
+    if BM25_INDEX_PATH:
+        index_builders.append(BM25IndexBuilder(BM25_INDEX_PATH))
+
+    # rows of the run, for the percentage and the ETA of the progress reports
+    total_rows = NROWS if NROWS is not None else max(count_records(DATASET_PATH) - SKIPROWS, 0)
+    telemetry = IngestionTelemetry(total_rows, TELEMETRY_LOG_PATH, QUIET, REPORT_SECONDS, sources={
+        "embedding_requests": embedding_creator.batcher.stats, "client_connections": default_pool.stats})
+
     # Skip specified rows (preserve the header row)
     skiprows = SKIPROWS
     reschedule = True
     while (reschedule):
         data_collectors = [
-            HotelDataCollector(DATASET_PATH, CHUNKSIZE, NROWS, skiprows)
+            HotelDataCollector(DATASET_PATH, CHUNKSIZE, NROWS, skiprows, COLUMNAR, PARSE_WORKERS, PARSE_ATTRACTIONS)
         ]
 
         data_service = DataService(
-            data_collectors, embedding_creator, embedding_storage)
+            data_collectors, embedding_creator, embedding_storage, PIPELINED, EMBED_WORKERS, STORE_WORKERS, QUEUE_SIZE, checkpoint, index_builders, telemetry, EMBED_ROWS)
 
         try:
             data_service.run()
@@ -112,5 +449,10 @@ if __name__ == '__main__':
             print(
                 f"Schedule data service to run again in {SCHEDULE_MINUTES} minutes...")
             time.sleep(SCHEDULE_MINUTES * 60)
-            # Skip the already processed rows (preserve the header row)
-            skiprows = SKIPROWS + data_service.chunks_completed * CHUNKSIZE
+            # With a checkpoint journal the stored chunks are skipped exactly on the next run,
+            # otherwise skip the already processed rows (preserve the header row)
+            if checkpoint is None:
+                skiprows = SKIPROWS + data_service.chunks_completed * CHUNKSIZE
+        finally:
+            print(f"Client connections: {default_pool.stats()}")
+            print(f"Embedding requests: {embedding_creator.batcher.stats()}")
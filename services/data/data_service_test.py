@@ -0,0 +1,199 @@
+import unittest
+import io
+import os
+import tempfile
+import threading
+from contextlib import redirect_stdout
+from types import SimpleNamespace
+from checkpoint import CheckpointJournal
+from data_collector import DataCollector
+from embedding_creator import EmbeddingCreator
+from embedding_storage import EmbeddingStorage
+from index_builder import IndexBuilder
+from telemetry import IngestionTelemetry
+from data_service import DataService
+
+
+class ListDataCollector(DataCollector):
+
+    def __init__(self, chunks: list):
+        super().__init__("test", 1)
+        self.chunks = chunks
+
+    def collect(self):
+        for i, chunk in enumerate(self.chunks):
+            yield i, chunk
+
+
+class IdentityEmbeddingCreator(EmbeddingCreator):
+
+    def __init__(self):
+        self.created = []
+        self.sizes = []
+
+    def create(self, data: list) -> dict:
+        self.created.extend(item.id for item in data)
+        self.sizes.append(len(data))
+        return {item.id: {"values": [float(item.id)], "metadata": {}} for item in data}
+
+
+class MemoryEmbeddingStorage(EmbeddingStorage):
+
+    def __init__(self, failing_id: int = None):
+        super().__init__("test", 1, "test")
+        self.failing_id = failing_id
+        self.stored = {}
+        self.lock = threading.Lock()
+
+    def store(self, embeddings: dict):
+        if self.failing_id in embeddings or str(self.failing_id) in embeddings:
+            raise RuntimeError("store failed")
+        with self.lock:
+            self.stored.update({int(key): value for key, value in embeddings.items()})
+
+
+class RecordingIndexBuilder(IndexBuilder):
+
+    def __init__(self):
+        super().__init__(None)
+        self.ids = set()
+        self.saved = 0
+
+    def add(self, data: list):
+        self.ids.update(item.id for item in data)
+
+    def save(self):
+        self.saved += 1
+
+
+class TestDataService(unittest.TestCase):
+
+    def setUp(self):
+        self.chunks = [[SimpleNamespace(id=2 * i + 1), SimpleNamespace(id=2 * i + 2)]
+                       for i in range(20)]
+        self.directory = tempfile.TemporaryDirectory()
+        self.checkpoint_path = os.path.join(
+            self.directory.name, "ingestion.jsonl")
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_pipelined_run_stores_every_chunk(self):
+        storage = MemoryEmbeddingStorage()
+        data_service = DataService([ListDataCollector(self.chunks)], IdentityEmbeddingCreator(
+        ), storage, pipelined=True, embed_workers=3, store_workers=2)
+
+        data_service.run()
+
+        self.assertEqual(20, data_service.chunks_completed)
+        self.assertEqual(set(range(1, 41)), set(storage.stored))
+
+    def test_pipelined_run_only_counts_chunks_before_a_failure(self):
+        storage = MemoryEmbeddingStorage(failing_id=15)
+        data_service = DataService([ListDataCollector(self.chunks)], IdentityEmbeddingCreator(
+        ), storage, pipelined=True, embed_workers=3, store_workers=2)
+
+        with self.assertRaises(RuntimeError):
+            data_service.run()
+
+        # chunk 7 holds the failing id, so at most the chunks before it count as completed
+        self.assertLessEqual(data_service.chunks_completed, 7)
+        for key in range(1, 2 * data_service.chunks_completed + 1):
+            self.assertIn(key, storage.stored)
+
+    def test_restart_with_checkpoint_neither_embeds_nor_stores_twice(self):
+        for pipelined in [False, True]:
+            with self.subTest(pipelined=pipelined):
+                checkpoint_path = f"{self.checkpoint_path}.{pipelined}"
+                creator = IdentityEmbeddingCreator()
+                failing_storage = MemoryEmbeddingStorage(failing_id=15)
+                with self.assertRaises(RuntimeError):
+                    DataService([ListDataCollector(self.chunks)], creator, failing_storage,
+                                pipelined, checkpoint=CheckpointJournal(checkpoint_path)).run()
+
+                storage = MemoryEmbeddingStorage()
+                DataService([ListDataCollector(self.chunks)], creator, storage,
+                            pipelined, checkpoint=CheckpointJournal(checkpoint_path)).run()
+
+                self.assertEqual(sorted(creator.created), list(range(1, 41)))
+                self.assertEqual(set(range(1, 41)),
+                                 set(storage.stored) | set(failing_storage.stored))
+                self.assertFalse(set(storage.stored) & set(failing_storage.stored))
+
+    def test_chunks_are_merged_up_to_embed_rows(self):
+        for pipelined in [False, True]:
+            with self.subTest(pipelined=pipelined):
+                checkpoint_path = f"{self.checkpoint_path}.{pipelined}"
+                creator = IdentityEmbeddingCreator()
+                with self.assertRaises(RuntimeError):
+                    DataService([ListDataCollector(self.chunks[:10])], creator, MemoryEmbeddingStorage(failing_id=15),
+                                pipelined, checkpoint=CheckpointJournal(checkpoint_path), embed_rows=6).run()
+
+                # rows 1..12 are stored and skipped on the restart, rows 13..18 are embedded already
+                # (the pipeline may have embedded more rows ahead of the failure)
+                first_sizes = len(creator.sizes)
+                storage = MemoryEmbeddingStorage()
+                data_service = DataService([ListDataCollector(self.chunks)], creator, storage, pipelined,
+                                           checkpoint=CheckpointJournal(checkpoint_path), embed_rows=6)
+                data_service.run()
+
+                self.assertEqual(20, data_service.chunks_completed)
+                self.assertEqual(sorted(creator.created), list(range(1, 41)))
+                if not pipelined:
+                    self.assertEqual([6, 6, 6, 4], creator.sizes[first_sizes:])
+                self.assertEqual(set(range(13, 41)), set(storage.stored))
+
+    def test_pending_embeddings_are_reused_when_the_chunk_boundaries_change(self):
+        for pipelined in [False, True]:
+            with self.subTest(pipelined=pipelined):
+                checkpoint_path = f"{self.checkpoint_path}.{pipelined}"
+                creator = IdentityEmbeddingCreator()
+                with self.assertRaises(RuntimeError):
+                    DataService([ListDataCollector(self.chunks)], creator, MemoryEmbeddingStorage(failing_id=15),
+                                pipelined, checkpoint=CheckpointJournal(checkpoint_path), embed_rows=6).run()
+
+                # rows 13..18 (and more in the pipeline) are embedded in ranges of 6 rows,
+                # the restart embeds 10 rows at a time without embedding any row twice
+                storage = MemoryEmbeddingStorage()
+                DataService([ListDataCollector(self.chunks)], creator, storage, pipelined,
+                            checkpoint=CheckpointJournal(checkpoint_path), embed_rows=10).run()
+
+                self.assertEqual(sorted(creator.created), list(range(1, 41)))
+                self.assertEqual(set(range(13, 41)), set(storage.stored))
+                self.assertEqual([], CheckpointJournal(checkpoint_path).status()["pending_ranges"])
+
+    def test_index_builders_see_every_chunk_and_are_saved(self):
+        for pipelined in [False, True]:
+            with self.subTest(pipelined=pipelined):
+                checkpoint = CheckpointJournal(f"{self.checkpoint_path}.{pipelined}")
+                index_builder = RecordingIndexBuilder()
+                with self.assertRaises(RuntimeError):
+                    DataService([ListDataCollector(self.chunks)], IdentityEmbeddingCreator(), MemoryEmbeddingStorage(failing_id=15),
+                                pipelined, checkpoint=checkpoint, index_builders=[index_builder]).run()
+                self.assertEqual(1, index_builder.saved)
+
+                # chunks that are already stored are added as well
+                index_builder = RecordingIndexBuilder()
+                DataService([ListDataCollector(self.chunks)], IdentityEmbeddingCreator(), MemoryEmbeddingStorage(),
+                            pipelined, checkpoint=checkpoint, index_builders=[index_builder]).run()
+                self.assertEqual(set(range(1, 41)), index_builder.ids)
+                self.assertEqual(1, index_builder.saved)
+
+    def test_telemetry_counts_the_rows_of_every_stage(self):
+        for pipelined in [False, True]:
+            with self.subTest(pipelined=pipelined):
+                telemetry = IngestionTelemetry(total_rows=40, quiet=True)
+                with redirect_stdout(io.StringIO()):
+                    DataService([ListDataCollector(self.chunks)], IdentityEmbeddingCreator(), MemoryEmbeddingStorage(),
+                                pipelined, index_builders=[RecordingIndexBuilder()], telemetry=telemetry).run()
+
+                snapshot = telemetry.snapshot()
+                self.assertEqual(40, snapshot["rows_done"])
+                self.assertEqual(0, snapshot["eta_seconds"])
+                for stage in ["parse", "index", "embed", "upsert"]:
+                    self.assertEqual((40, 20), (snapshot["stages"][stage]["rows"],
+                                                snapshot["stages"][stage]["chunks"]))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,97 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+import numpy as np
+from typing import List, Sequence
+
+
+class EmbeddingCache:
+    """
+    Persistent cache of embeddings, keyed by the model name and a hash of the embedded text.
+    The cache is a SQLite database. Once it holds more than max_entries embeddings, the least
+    recently used ones are evicted. The number of entries is counted once when the cache is opened
+    and then kept up to date in memory.
+    """
+
+    def __init__(self, path: str, max_entries: int = 2_000_000):
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # the connection is shared by the pipeline workers and guarded by the lock
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings (key BLOB PRIMARY KEY, vector BLOB NOT NULL, last_used INTEGER NOT NULL)")
+        self.connection.execute(
+            "CREATE INDEX IF NOT EXISTS embeddings_last_used ON embeddings (last_used)")
+        self.connection.commit()
+        (self.count,) = self.connection.execute("SELECT COUNT(*) FROM embeddings").fetchone()
+
+    @staticmethod
+    def key(model: str, text: str) -> bytes:
+        return hashlib.sha256(f"{model}\0{text}".encode("utf-8")).digest()
+
+    def get_many(self, model: str, texts: Sequence[str]) -> List[List[float]]:
+        """
+        Return the cached embedding of each text, or None for texts that are not cached.
+        """
+        keys = [self.key(model, text) for text in texts]
+        with self.lock:
+            found = dict(self.select(keys, "key, vector"))
+            if found:
+                now = time.time_ns()
+                self.connection.executemany(
+                    "UPDATE embeddings SET last_used = ? WHERE key = ?", [(now, key) for key in found])
+                self.connection.commit()
+            self.hits += len(found)
+            self.misses += len(keys) - len(found)
+
+        return [np.frombuffer(found[key], dtype=np.float32).tolist() if key in found else None
+                for key in keys]
+
+    def select(self, keys: Sequence[bytes], columns: str) -> list:
+        """
+        Return the given columns of the rows with the given keys (call with the lock held).
+        """
+        rows = []
+        # stay below SQLite's limit of host parameters per statement
+        for offset in range(0, len(keys), 500):
+            batch = keys[offset:offset + 500]
+            placeholders = ",".join("?" * len(batch))
+            rows.extend(self.connection.execute(
+                f"SELECT {columns} FROM embeddings WHERE key IN ({placeholders})", batch))
+        return rows
+
+    def put_many(self, model: str, texts: Sequence[str], vectors: Sequence[Sequence[float]]):
+        now = time.time_ns()
+        vectors_by_key = {self.key(model, text): np.asarray(vector, dtype=np.float32).tobytes()
+                          for text, vector in zip(texts, vectors)}
+        with self.lock:
+            # replaced rows do not change the number of entries
+            existing = len(self.select(list(vectors_by_key), "key"))
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, vector, last_used) VALUES (?, ?, ?)",
+                [(key, vector, now) for key, vector in vectors_by_key.items()])
+            self.count += len(vectors_by_key) - existing
+            self.evict()
+            self.connection.commit()
+
+    def evict(self):
+        if self.count > self.max_entries:
+            self.connection.execute(
+                "DELETE FROM embeddings WHERE key IN (SELECT key FROM embeddings ORDER BY last_used LIMIT ?)",
+                (self.count - self.max_entries,))
+            self.count = self.max_entries
+
+    def __len__(self) -> int:
+        with self.lock:
+            return self.count
+
+    def close(self):
+        self.connection.close()
@@ -0,0 +1,86 @@
+import unittest
+import os
+import tempfile
+from embedding_cache import EmbeddingCache
+from embedding_creator import HotelEmbeddingCreator
+from model import Hotel
+
+
+class CountingEmbeddingCreator(HotelEmbeddingCreator):
+
+    model = "test-model"
+    max_batch_items = 100
+
+    def __init__(self, cache: EmbeddingCache):
+        super().__init__("", cache)
+        self.embedded = []
+
+    def embed(self, texts):
+        self.embedded.extend(texts)
+        return [[float(len(text)), 1.0] for text in texts]
+
+
+class TestEmbeddingCache(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "embeddings.sqlite")
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_cached_vectors_are_returned_per_model(self):
+        cache = EmbeddingCache(self.path)
+        cache.put_many("a", ["hello"], [[0.5, 1.5]])
+
+        self.assertEqual([[0.5, 1.5], None], cache.get_many("a", ["hello", "world"]))
+        self.assertEqual([None], cache.get_many("b", ["hello"]))
+        self.assertEqual(1, cache.hits)
+        self.assertEqual(2, cache.misses)
+
+    def test_cache_is_persistent(self):
+        cache = EmbeddingCache(self.path)
+        cache.put_many("a", ["hello"], [[0.5]])
+        cache.close()
+
+        self.assertEqual([[0.5]], EmbeddingCache(self.path).get_many("a", ["hello"]))
+
+    def test_least_recently_used_entries_are_evicted(self):
+        cache = EmbeddingCache(self.path, max_entries=2)
+        cache.put_many("a", ["first", "second"], [[1.0], [2.0]])
+        cache.get_many("a", ["first"])
+        cache.put_many("a", ["third"], [[3.0]])
+
+        self.assertEqual(2, len(cache))
+        self.assertEqual([[1.0], None, [3.0]], cache.get_many(
+            "a", ["first", "second", "third"]))
+
+    def test_entries_are_counted_without_replaced_ones(self):
+        cache = EmbeddingCache(self.path, max_entries=3)
+        cache.put_many("a", ["first", "second"], [[1.0], [2.0]])
+        cache.put_many("a", ["second", "third", "third"], [[2.5], [3.0], [3.0]])
+
+        self.assertEqual(3, len(cache))
+        self.assertEqual([[1.0], [2.5], [3.0]], cache.get_many("a", ["first", "second", "third"]))
+        cache.close()
+        self.assertEqual(3, len(EmbeddingCache(self.path)))
+
+    def test_creator_only_embeds_new_or_changed_hotels(self):
+        creator = CountingEmbeddingCreator(EmbeddingCache(self.path))
+        hotels = [Hotel(1), Hotel(2)]
+        hotels[0].hotel_name = "A"
+        hotels[1].hotel_name = "B"
+        first = creator.create(hotels)
+
+        # a later run collects new Hotel objects (to_dict is cached per object)
+        changed = Hotel(2)
+        changed.hotel_name = "Changed"
+        second = creator.create([hotels[0], changed, Hotel(3)])
+
+        self.assertEqual(4, len(creator.embedded))
+        self.assertEqual(first[1]["values"], second[1]["values"])
+        self.assertEqual("Changed", second[2]["metadata"]["hotel_name"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,8 +1,10 @@
 from abc import ABC, abstractmethod
-from pinecone import Pinecone, ServerlessSpec
 from typing import List
-from model import Hotel
-from google import genai
+from model import Hotel, HotelBatch
+from embedding_cache import EmbeddingCache
+from client_pool import ClientPool, default_pool
+from batching import AdaptiveBatcher
+from hotel_metadata import filter_fields
 
 
 class EmbeddingCreator(ABC):
@@ -23,62 +25,107 @@ class EmbeddingCreator(ABC):
         pass
 
 
-class HotelPineconeEmbeddingCreator(EmbeddingCreator):
+class HotelEmbeddingCreator(EmbeddingCreator):
     """
-    Creates embeddings for hotels using Pinecone.
+    Abstract class for creators that embed the dictionary representation of hotels.
+    If a cache is given, only hotels whose text is not cached for the model are sent to the provider.
+    Requests are split into batches within the provider's limits and retried on rate limits.
+    The metadata of each embedding holds the hotel fields plus the typed fields derived from them,
+    which vector queries filter on and the backend sorts by (see hotel_metadata.filter_fields).
+    Only the hotel fields are embedded.
     """
 
-    def __init__(self, api_key: str):
+    model: str
+    # provider limits of a single embedding request
+    max_batch_items: int
+    max_batch_tokens: int = None
+
+    def __init__(self, api_key: str, cache: EmbeddingCache = None, pool: ClientPool = None):
         self.api_key = api_key
+        self.cache = cache
+        self.pool = pool or default_pool
+        self.batcher = AdaptiveBatcher(
+            self.max_batch_items, self.max_batch_tokens)
 
-    def create(self, data: List[Hotel]) -> dict:
-        pc = Pinecone(api_key=self.api_key)
+    @abstractmethod
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        """
+        Embed the given texts with the provider and return one vector per text.
+        """
+        pass
 
-        hotel_data = []
-        for hotel in data:
-            hotel_data.append(str(hotel.to_dict()))
-
-        embeddings = pc.inference.embed(
-            model="multilingual-e5-large",
-            inputs=hotel_data,
-            parameters={"input_type": "passage", "truncate": "END"}
-        )
+    def create(self, data: List[Hotel] | HotelBatch) -> dict:
+        if isinstance(data, HotelBatch):
+            ids, metadata = data.ids, data.to_dicts()
+        else:
+            ids, metadata = [hotel.id for hotel in data], [
+                hotel.to_dict() for hotel in data]
+        vectors = self.embed_cached([str(hotel_dict) for hotel_dict in metadata])
 
         # create key-value pairs for embeddings
         embeddings_dict = {}
-        for hotel, embedding in zip(data, embeddings):
-            embeddings_dict[hotel.id] = {
-                "values": embedding["values"],
-                "metadata": hotel.to_dict()
+        for id, hotel_dict, vector in zip(ids, metadata, vectors):
+            embeddings_dict[id] = {
+                "values": vector,
+                "metadata": {**hotel_dict, **filter_fields(hotel_dict)}
             }
 
         return embeddings_dict
 
+    def embed_batched(self, texts: List[str]) -> List[List[float]]:
+        return self.batcher.run(texts, self.embed)
+
+    def embed_cached(self, texts: List[str]) -> List[List[float]]:
+        if self.cache is None:
+            return self.embed_batched(texts)
+
+        vectors = self.cache.get_many(self.model, texts)
+        missing = [i for i, vector in enumerate(vectors) if vector is None]
+        if missing:
+            missing_texts = [texts[i] for i in missing]
+            created = self.embed_batched(missing_texts)
+            self.cache.put_many(self.model, missing_texts, created)
+            for i, vector in zip(missing, created):
+                vectors[i] = vector
+        return vectors
+
+
+class HotelPineconeEmbeddingCreator(HotelEmbeddingCreator):
+    """
+    Creates embeddings for hotels using Pinecone.
+    """
+
+    model = "multilingual-e5-large"
+    # longer inputs are truncated to 507 tokens by the provider
+    max_batch_items = 96
+
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        pc = self.pool.pinecone(self.api_key)
+
+        embeddings = pc.inference.embed(
+            model=self.model,
+            inputs=texts,
+            parameters={"input_type": "passage", "truncate": "END"}
+        )
 
-class HotelGeminiEmbeddingCreator(EmbeddingCreator):
+        return [embedding["values"] for embedding in embeddings]
+
+
+class HotelGeminiEmbeddingCreator(HotelEmbeddingCreator):
     """
     Creates embeddings for hotels using Gemeni.
     """
 
-    def __init__(self, api_key: str):
-        self.api_key = api_key
+    model = "text-embedding-004"
+    max_batch_items = 100
+    max_batch_tokens = 20_000
 
-    def create(self, data: List[Hotel]) -> dict:
-        client = genai.Client(api_key=self.api_key)
-        embeddings_dict = {}
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        client = self.pool.gemini(self.api_key)
 
-        hotel_data = []
-        for hotel in data:
-            hotel_data.append(str(hotel.to_dict()))
         result = client.models.embed_content(
-            model="text-embedding-004",
-            contents=hotel_data
+            model=self.model,
+            contents=texts
         )
 
-        for hotel, embedding in zip(data, result.embeddings):
-            embeddings_dict[hotel.id] = {
-                "values": embedding.values,
-                "metadata": hotel.to_dict()
-            }
-
-        return embeddings_dict
+        return [embedding.values for embedding in result.embeddings]
@@ -1,5 +1,11 @@
 from abc import ABC, abstractmethod
-from pinecone import Pinecone, ServerlessSpec
+from client_pool import ClientPool, default_pool
+from typing import List, Sequence
+from metadata_index import MetadataIndex
+import numpy as np
+import json
+import os
+import threading
 
 
 class EmbeddingStorage(ABC):
@@ -25,24 +31,14 @@ class PineconeEmbeddingStorage(EmbeddingStorage):
     Stores embeddings in Pinecone.
     """
 
-    def __init__(self, index_name: str, dimension: int, namespace: str, api_key: str):
+    def __init__(self, index_name: str, dimension: int, namespace: str, api_key: str, pool: ClientPool = None):
         super().__init__(index_name, dimension, namespace)
         self.api_key = api_key
+        self.pool = pool or default_pool
 
     def store(self, embeddings: dict):
-        pc = Pinecone(api_key=self.api_key)
-        if not pc.has_index(self.index_name):
-            pc.create_index(
-                name=self.index_name,
-                dimension=self.dimension,
-                metric="cosine",
-                spec=ServerlessSpec(
-                    cloud="aws",
-                    region="us-east-1"
-                )
-            )
-
-        index = pc.Index(self.index_name)
+        index = self.pool.pinecone_index(
+            self.api_key, self.index_name, self.dimension)
 
         vectors = []
         for key, embedding in embeddings.items():
@@ -56,3 +52,248 @@ class PineconeEmbeddingStorage(EmbeddingStorage):
             vectors=vectors,
             namespace=self.namespace
         )
+
+
+class LocalEmbeddingStorage(EmbeddingStorage):
+    """
+    Stores embeddings locally in a memory-mapped float32 matrix with a JSON lines metadata sidecar.
+    Vectors are unit-normalised on write, so a cosine query is a single matrix-vector product.
+    The query surface mirrors the one of a Pinecone index, including metadata filters.
+    """
+
+    VECTORS_FILE = "vectors.f32"
+    METADATA_FILE = "metadata.jsonl"
+
+    def __init__(self, index_name: str, dimension: int, namespace: str, path: str = "indexes"):
+        super().__init__(index_name, dimension, namespace)
+        self.path = path
+        self.namespaces = {}
+        # stores may come from several pipeline workers at once
+        self.lock = threading.Lock()
+
+    def store(self, embeddings: dict):
+        with self.lock:
+            self.get_namespace(self.namespace).upsert(embeddings)
+
+    def query(self, vector: Sequence[float], top_k: int = 10, namespace: str = None, include_values: bool = False, include_metadata: bool = False, filter: dict = None) -> dict:
+        """
+        Return the top_k most similar vectors of the namespace by cosine similarity.
+        If a Pinecone-style metadata filter is given, only the vectors whose metadata match it are ranked.
+        The returned dictionary has the same structure as a Pinecone query response:
+        {
+            "namespace": "namespace",
+            "matches": [
+                {"id": "1", "score": 0.9, "metadata": {...}},
+                ...
+            ]
+        }
+        """
+        namespace = namespace or self.namespace
+        # a concurrent store appends to the ids, the metadata and the matrix of the namespace
+        with self.lock:
+            local_namespace = self.get_namespace(namespace)
+            rows, scores = local_namespace.search(
+                vector, top_k, local_namespace.filter_mask(filter))
+            return self.to_response(namespace, local_namespace, rows, scores, include_values, include_metadata)
+
+    def to_response(self, namespace: str, local_namespace: "LocalNamespace", rows: np.ndarray, scores: np.ndarray, include_values: bool, include_metadata: bool) -> dict:
+        matches = []
+        for row, score in zip(rows, scores):
+            match = {"id": local_namespace.ids[row], "score": float(score)}
+            if include_values:
+                match["values"] = local_namespace.matrix()[row].tolist()
+            if include_metadata:
+                match["metadata"] = local_namespace.metadata[row]
+            matches.append(match)
+
+        return {"namespace": namespace, "matches": matches}
+
+    def count(self, namespace: str = None) -> int:
+        with self.lock:
+            return len(self.get_namespace(namespace or self.namespace).ids)
+
+    def get_namespace(self, namespace: str) -> "LocalNamespace":
+        if namespace not in self.namespaces:
+            self.namespaces[namespace] = LocalNamespace(
+                os.path.join(self.path, self.index_name, namespace), self.dimension)
+        return self.namespaces[namespace]
+
+
+class LocalNamespace:
+    """
+    A single namespace of a LocalEmbeddingStorage.
+    Row i of the vector file belongs to ids[i] and metadata[i]. New vectors are appended before their
+    metadata, and rows a crash left without metadata (or metadata without vector) are dropped on load.
+    """
+
+    def __init__(self, directory: str, dimension: int):
+        self.directory = directory
+        self.dimension = dimension
+        self.vectors_path = os.path.join(
+            directory, LocalEmbeddingStorage.VECTORS_FILE)
+        self.metadata_path = os.path.join(
+            directory, LocalEmbeddingStorage.METADATA_FILE)
+        self.ids = []
+        self.metadata = []
+        self.rows = {}
+        self.metadata_index = MetadataIndex(self.metadata)
+        self._matrix = None
+        self.load()
+
+    def load(self):
+        complete = True
+        if os.path.exists(self.metadata_path):
+            # later lines overwrite earlier lines of the same row
+            with open(self.metadata_path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        # a crash while appending leaves at most one incomplete line
+                        complete = False
+                        continue
+                    row = entry["row"]
+                    if row == len(self.ids):
+                        self.ids.append(entry["id"])
+                        self.metadata.append(entry["metadata"])
+                    else:
+                        self.ids[row] = entry["id"]
+                        self.metadata[row] = entry["metadata"]
+                    self.rows[entry["id"]] = row
+
+        stored_rows = self.stored_rows()
+        if len(self.ids) > stored_rows:
+            del self.ids[stored_rows:], self.metadata[stored_rows:]
+            self.rows = {key: row for row, key in enumerate(self.ids)}
+            complete = False
+        if not complete:
+            self.rewrite_metadata()
+        if os.path.exists(self.vectors_path) and os.path.getsize(self.vectors_path) != len(self.ids) * 4 * self.dimension:
+            with open(self.vectors_path, "r+b") as f:
+                f.truncate(len(self.ids) * 4 * self.dimension)
+
+    def rewrite_metadata(self):
+        """
+        Replace the metadata file by one line per row.
+        """
+        with open(self.metadata_path + ".tmp", "w", encoding="utf-8") as f:
+            for row, (key, metadata) in enumerate(zip(self.ids, self.metadata)):
+                f.write(json.dumps({"row": row, "id": key, "metadata": metadata}) + "\n")
+        os.replace(self.metadata_path + ".tmp", self.metadata_path)
+
+    def upsert(self, embeddings: dict) -> List[int]:
+        """
+        Insert or overwrite the given embeddings and return the rows they were written to.
+        """
+        if not embeddings:
+            return []
+        os.makedirs(self.directory, exist_ok=True)
+
+        ids = [str(key) for key in embeddings]
+        values = normalize(np.asarray(
+            [embedding["values"] for embedding in embeddings.values()], dtype=np.float32))
+        if values.shape[1] != self.dimension:
+            raise ValueError(
+                f"Expected vectors of dimension {self.dimension}, got {values.shape[1]}")
+
+        # the vectors of new rows are appended first, so every row with metadata has a vector
+        new_ids = set()
+        new_positions = []
+        for i, key in enumerate(ids):
+            if key not in self.rows and key not in new_ids:
+                new_ids.add(key)
+                new_positions.append(i)
+        with open(self.vectors_path, "ab") as f:
+            f.write(values[new_positions].tobytes())
+
+        rows = []
+        with open(self.metadata_path, "a", encoding="utf-8") as f:
+            for i, (key, embedding) in enumerate(zip(ids, embeddings.values())):
+                row = self.rows.get(key)
+                if row is None:
+                    row = len(self.ids)
+                    self.rows[key] = row
+                    self.ids.append(key)
+                    self.metadata.append(embedding.get("metadata", {}))
+                    self.metadata_index.add(row, self.metadata[row])
+                else:
+                    self.metadata[row] = embedding.get("metadata", {})
+                    self.metadata_index.reset()
+                    self.overwrite(row, values[i])
+                f.write(json.dumps(
+                    {"row": row, "id": key, "metadata": self.metadata[row]}) + "\n")
+                rows.append(row)
+
+        self._matrix = None
+        return rows
+
+    def overwrite(self, row: int, vector: np.ndarray):
+        matrix = np.memmap(self.vectors_path, dtype=np.float32, mode="r+",
+                           shape=(self.stored_rows(), self.dimension))
+        matrix[row] = vector
+        matrix.flush()
+        self._matrix = None
+
+    def stored_rows(self) -> int:
+        if not os.path.exists(self.vectors_path):
+            return 0
+        return os.path.getsize(self.vectors_path) // (4 * self.dimension)
+
+    def matrix(self) -> np.ndarray:
+        if self._matrix is None:
+            rows = self.stored_rows()
+            if rows == 0:
+                return np.empty((0, self.dimension), dtype=np.float32)
+            self._matrix = np.memmap(self.vectors_path, dtype=np.float32, mode="r",
+                                     shape=(rows, self.dimension))
+        return self._matrix
+
+    def filter_mask(self, filter: dict = None) -> np.ndarray:
+        """
+        Return the boolean mask of the rows whose metadata match the filter, or None without a filter.
+        """
+        if filter is None:
+            return None
+        return self.metadata_index.mask(filter, len(self.matrix()))
+
+    def search(self, vector: Sequence[float], top_k: int, mask: np.ndarray = None) -> tuple:
+        """
+        Return the rows and scores of the top_k most similar vectors, best first.
+        If a mask is given, only the rows it selects are scored.
+        """
+        matrix = self.matrix()
+        if len(matrix) == 0 or top_k <= 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        query = normalize(np.asarray(vector, dtype=np.float32))
+        if mask is None:
+            return top_k_rows(matrix @ query, top_k)
+
+        eligible = np.flatnonzero(mask)
+        if len(eligible) > len(matrix) // 2:
+            # gathering most of the rows costs more than scoring all of them
+            scores = matrix @ query
+            scores[~mask] = -np.inf
+            return top_k_rows(scores, min(top_k, len(eligible)))
+        rows, scores = top_k_rows(matrix[eligible] @ query, top_k)
+        return eligible[rows], scores
+
+
+def normalize(vectors: np.ndarray) -> np.ndarray:
+    """
+    Scale vectors (or a single vector) to unit length, leaving zero vectors untouched.
+    """
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    norms[norms == 0] = 1
+    return vectors / norms
+
+
+def top_k_rows(scores: np.ndarray, top_k: int) -> tuple:
+    """
+    Return the indices and values of the top_k highest scores, best first.
+    """
+    if top_k < len(scores):
+        rows = np.argpartition(-scores, top_k - 1)[:top_k]
+    else:
+        rows = np.arange(len(scores))
+    rows = rows[np.argsort(-scores[rows], kind="stable")]
+    return rows, scores[rows]
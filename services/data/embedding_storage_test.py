@@ -0,0 +1,134 @@
+import unittest
+import tempfile
+import threading
+import numpy as np
+from embedding_storage import LocalEmbeddingStorage
+
+
+class TestLocalEmbeddingStorage(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.storage = LocalEmbeddingStorage(
+            "hotels", 3, "hotels", self.directory.name)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_query_returns_most_similar_first(self):
+        self.storage.store({
+            1: {"values": [1, 0, 0], "metadata": {"hotel_name": "A"}},
+            2: {"values": [0, 1, 0], "metadata": {"hotel_name": "B"}},
+            3: {"values": [1, 1, 0], "metadata": {"hotel_name": "C"}},
+        })
+
+        result = self.storage.query(
+            [1, 0.1, 0], top_k=2, include_metadata=True)
+
+        self.assertEqual(["1", "3"], [m["id"] for m in result["matches"]])
+        self.assertEqual("A", result["matches"][0]["metadata"]["hotel_name"])
+        self.assertAlmostEqual(
+            result["matches"][0]["score"], 1 / np.sqrt(1.01), places=5)
+
+    def test_upsert_overwrites_existing_ids(self):
+        self.storage.store({1: {"values": [1, 0, 0], "metadata": {"v": 1}}})
+        self.storage.store({1: {"values": [0, 0, 1], "metadata": {"v": 2}}})
+
+        result = self.storage.query([0, 0, 1], top_k=5, include_metadata=True)
+
+        self.assertEqual(1, self.storage.count())
+        self.assertEqual({"v": 2}, result["matches"][0]["metadata"])
+        self.assertAlmostEqual(1.0, result["matches"][0]["score"], places=5)
+
+    def test_storage_is_reloaded_from_disk(self):
+        self.storage.store({
+            1: {"values": [1, 0, 0], "metadata": {}},
+            2: {"values": [0, 1, 0], "metadata": {}},
+        })
+
+        reloaded = LocalEmbeddingStorage(
+            "hotels", 3, "hotels", self.directory.name)
+        result = reloaded.query([0, 1, 0], top_k=1, include_values=True)
+
+        self.assertEqual(2, reloaded.count())
+        self.assertEqual("2", result["matches"][0]["id"])
+        self.assertEqual([0, 1, 0], result["matches"][0]["values"])
+
+    def test_rows_of_an_interrupted_upsert_are_dropped_on_load(self):
+        self.storage.store({1: {"values": [1, 0, 0], "metadata": {}}})
+        namespace = self.storage.get_namespace("hotels")
+        # the vector of row 1 was appended, its metadata only partially
+        with open(namespace.vectors_path, "ab") as f:
+            f.write(np.array([0, 1, 0], dtype=np.float32).tobytes())
+        with open(namespace.metadata_path, "a", encoding="utf-8") as f:
+            f.write('{"row": 1, "id": "2", "meta')
+
+        reloaded = LocalEmbeddingStorage("hotels", 3, "hotels", self.directory.name)
+        self.assertEqual(1, reloaded.count())
+        self.assertEqual(1, reloaded.get_namespace("hotels").stored_rows())
+
+        reloaded.store({3: {"values": [0, 0, 1], "metadata": {"v": 3}}})
+        result = LocalEmbeddingStorage("hotels", 3, "hotels", self.directory.name).query(
+            [0, 0, 1], top_k=1, include_metadata=True)
+        self.assertEqual(("3", {"v": 3}), (result["matches"][0]["id"], result["matches"][0]["metadata"]))
+        self.assertAlmostEqual(1.0, result["matches"][0]["score"], places=5)
+
+    def test_metadata_without_vectors_is_dropped_on_load(self):
+        self.storage.store({1: {"values": [1, 0, 0], "metadata": {}}})
+        namespace = self.storage.get_namespace("hotels")
+        with open(namespace.metadata_path, "a", encoding="utf-8") as f:
+            f.write('{"row": 1, "id": "2", "metadata": {}}\n')
+
+        reloaded = LocalEmbeddingStorage("hotels", 3, "hotels", self.directory.name)
+
+        self.assertEqual(1, reloaded.count())
+        with open(namespace.metadata_path, encoding="utf-8") as f:
+            self.assertEqual(1, len(f.readlines()))
+
+    def test_query_ranks_only_rows_matching_the_filter(self):
+        self.storage.store({
+            1: {"values": [1, 0, 0], "metadata": {"city_name": "Rome", "star_rating": 3}},
+            2: {"values": [1, 0.1, 0], "metadata": {"city_name": "Milan", "star_rating": 5}},
+            3: {"values": [0, 1, 0], "metadata": {"city_name": "Rome", "star_rating": 5}},
+        })
+
+        result = self.storage.query([1, 0, 0], top_k=5, filter={"city_name": "Rome"})
+        self.assertEqual(["1", "3"], [m["id"] for m in result["matches"]])
+
+        result = self.storage.query([1, 0, 0], top_k=5, filter={
+            "city_name": "Rome", "star_rating": {"$gte": 4}})
+        self.assertEqual(["3"], [m["id"] for m in result["matches"]])
+
+    def test_filter_sees_overwritten_metadata(self):
+        self.storage.store({1: {"values": [1, 0, 0], "metadata": {"city_name": "Rome"}}})
+        self.assertEqual(1, len(self.storage.query(
+            [1, 0, 0], filter={"city_name": "Rome"})["matches"]))
+
+        self.storage.store({1: {"values": [1, 0, 0], "metadata": {"city_name": "Milan"}}})
+        self.assertEqual([], self.storage.query(
+            [1, 0, 0], filter={"city_name": "Rome"})["matches"])
+
+    def test_namespaces_are_separate(self):
+        self.storage.store({1: {"values": [1, 0, 0], "metadata": {}}})
+
+        result = self.storage.query([1, 0, 0], namespace="other")
+
+        self.assertEqual([], result["matches"])
+
+    def test_queries_during_stores_see_consistent_rows(self):
+        def store():
+            for key in range(200):
+                self.storage.store({key: {"values": [1, key, 0], "metadata": {"id": str(key)}}})
+
+        writer = threading.Thread(target=store)
+        writer.start()
+        while writer.is_alive():
+            for match in self.storage.query([1, 0, 0], top_k=5, include_metadata=True)["matches"]:
+                self.assertEqual(match["id"], match["metadata"]["id"])
+        writer.join()
+
+        self.assertEqual(200, self.storage.count())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,197 @@
+import json
+import os
+import re
+import unicodedata
+from typing import List
+from index_builder import IndexBuilder, hotel_columns
+from model import Hotel, HotelBatch
+
+# Names of countries in English, German and the local language, by ISO country code
+COUNTRY_ALIASES = {
+    "AL": ["Albania", "Albanien", "Shqipëria", "Shqipëri"],
+    "AT": ["Austria", "Österreich"],
+    "AE": ["United Arab Emirates", "Vereinigte Arabische Emirate", "UAE", "Emirates"],
+    "AU": ["Australia", "Australien"],
+    "BE": ["Belgium", "Belgien", "België", "Belgique"],
+    "BG": ["Bulgaria", "Bulgarien", "България"],
+    "BR": ["Brazil", "Brasilien", "Brasil"],
+    "CA": ["Canada", "Kanada"],
+    "CH": ["Switzerland", "Schweiz", "Suisse", "Svizzera"],
+    "CN": ["China", "中国"],
+    "CY": ["Cyprus", "Zypern", "Κύπρος"],
+    "CZ": ["Czech Republic", "Czechia", "Tschechien", "Česko"],
+    "DE": ["Germany", "Deutschland"],
+    "DK": ["Denmark", "Dänemark", "Danmark"],
+    "EG": ["Egypt", "Ägypten", "مصر"],
+    "ES": ["Spain", "Spanien", "España"],
+    "FI": ["Finland", "Finnland", "Suomi"],
+    "FR": ["France", "Frankreich"],
+    "GB": ["United Kingdom", "UK", "Great Britain", "England", "Großbritannien", "Vereinigtes Königreich"],
+    "GR": ["Greece", "Griechenland", "Ελλάδα", "Hellas"],
+    "HR": ["Croatia", "Kroatien", "Hrvatska"],
+    "HU": ["Hungary", "Ungarn", "Magyarország"],
+    "ID": ["Indonesia", "Indonesien"],
+    "IE": ["Ireland", "Irland", "Éire"],
+    "IN": ["India", "Indien", "Bharat"],
+    "IS": ["Iceland", "Island"],
+    "IT": ["Italy", "Italien", "Italia"],
+    "JP": ["Japan", "日本"],
+    "MA": ["Morocco", "Marokko", "Maroc"],
+    "ME": ["Montenegro", "Crna Gora"],
+    "MK": ["North Macedonia", "Nordmazedonien", "Македонија"],
+    "MT": ["Malta"],
+    "MV": ["Maldives", "Malediven"],
+    "MX": ["Mexico", "Mexiko", "México"],
+    "MY": ["Malaysia"],
+    "NL": ["Netherlands", "Niederlande", "Nederland", "Holland"],
+    "NO": ["Norway", "Norwegen", "Norge"],
+    "NZ": ["New Zealand", "Neuseeland"],
+    "PL": ["Poland", "Polen", "Polska"],
+    "PT": ["Portugal"],
+    "RO": ["Romania", "Rumänien", "România"],
+    "RS": ["Serbia", "Serbien", "Србија", "Srbija"],
+    "SE": ["Sweden", "Schweden", "Sverige"],
+    "SG": ["Singapore", "Singapur"],
+    "SI": ["Slovenia", "Slowenien", "Slovenija"],
+    "SK": ["Slovakia", "Slowakei", "Slovensko"],
+    "TH": ["Thailand", "ประเทศไทย"],
+    "TR": ["Turkey", "Türkei", "Türkiye"],
+    "US": ["United States", "USA", "United States of America", "Vereinigte Staaten", "America"],
+    "VN": ["Vietnam", "Việt Nam"],
+    "ZA": ["South Africa", "Südafrika"],
+}
+
+# Names of cities in English, German and the local language
+CITY_ALIASES = [
+    ["Athens", "Athen", "Αθήνα"],
+    ["Brussels", "Brüssel", "Bruxelles", "Brussel"],
+    ["Cologne", "Köln"],
+    ["Copenhagen", "Kopenhagen", "København"],
+    ["Florence", "Florenz", "Firenze"],
+    ["Geneva", "Genf", "Genève"],
+    ["Lisbon", "Lissabon", "Lisboa"],
+    ["Milan", "Mailand", "Milano"],
+    ["Moscow", "Moskau", "Москва"],
+    ["Munich", "München"],
+    ["Naples", "Neapel", "Napoli"],
+    ["Nuremberg", "Nürnberg"],
+    ["Prague", "Prag", "Praha"],
+    ["Rome", "Rom", "Roma"],
+    ["Tirana", "Tirane", "Tiranë"],
+    ["Venice", "Venedig", "Venezia"],
+    ["Vienna", "Wien"],
+    ["Warsaw", "Warschau", "Warszawa"],
+]
+
+# aliases shorter than this are too ambiguous to be matched in prompts
+MIN_ALIAS_LENGTH = 3
+
+# Everyday words that are also place names ("hotel with a spa", "the best hotels", "a nice view").
+# Aliases made only of these words or of facility keywords are saved as cued aliases, which the
+# backend only matches after a location cue ("in Spa", "near Bath")
+COMMON_WORDS = {
+    "bath", "bay", "beach", "best", "central", "city", "garden", "golf", "grand", "green", "harbour",
+    "hope", "island", "lake", "marina", "mobile", "nice", "ocean", "old", "palm", "paradise", "park",
+    "pool", "port", "quiet", "reading", "royal", "sea", "split", "spa", "star", "sun", "view", "village",
+}
+
+NON_ALPHANUMERIC_PATTERN = re.compile(r"[\W_]+")
+
+
+def normalize_name(name: str) -> str:
+    """
+    Lowercase a name, remove its accents and replace punctuation by single spaces.
+    The backend normalizes prompts the same way before matching them against the gazetteer.
+    """
+    folded = name.lower()
+    # ASCII text has no accents to remove
+    if not folded.isascii():
+        folded = "".join(character for character in unicodedata.normalize("NFKD", folded)
+                         if not unicodedata.combining(character))
+    return NON_ALPHANUMERIC_PATTERN.sub(" ", folded).strip()
+
+
+def alias_groups(groups: List[List[str]]) -> dict:
+    """
+    Map every normalized name of the groups to all names of its group.
+    """
+    return {normalize_name(name): group for group in groups for name in group}
+
+
+COUNTRY_ALIAS_GROUPS = alias_groups(list(COUNTRY_ALIASES.values()))
+CITY_ALIAS_GROUPS = alias_groups(CITY_ALIASES)
+
+
+class GazetteerBuilder(IndexBuilder):
+    """
+    Collects the city and country names of all hotels into a gazetteer.
+    Every name is stored under its normalized aliases: the name itself, its part before a comma
+    ("New York,   New York" is also found as "new york") and the names of the alias tables.
+    The backend finds the locations of a prompt in the gazetteer instead of asking an LLM.
+    """
+
+    FIELDS = ["country_code", "country_name", "city_name"]
+
+    def __init__(self, path: str):
+        super().__init__(path)
+        # country and city names of the dataset -> country code
+        self.countries = {}
+        self.cities = {}
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                gazetteer = json.load(f)
+            self.countries = gazetteer["countries"]
+            self.cities = gazetteer["cities"]
+
+    def add(self, data: List[Hotel] | HotelBatch):
+        _, (country_codes, country_names, city_names) = hotel_columns(
+            data, self.FIELDS)
+        for country_code, country_name, city_name in zip(country_codes, country_names, city_names):
+            if country_name != "Unknown":
+                self.countries[country_name] = country_code
+            if city_name != "Unknown":
+                self.cities[city_name] = country_code
+
+    def aliases(self) -> dict:
+        """
+        Return the dataset values of each normalized alias.
+        """
+        aliases = {}
+
+        def add_alias(alias: str, value: str):
+            alias = normalize_name(alias)
+            if len(alias) >= MIN_ALIAS_LENGTH:
+                values = aliases.setdefault(alias, [])
+                if value not in values:
+                    values.append(value)
+
+        for value, country_code in sorted(self.countries.items()):
+            for name in [value] + COUNTRY_ALIASES.get(country_code, []) + \
+                    COUNTRY_ALIAS_GROUPS.get(normalize_name(value), []):
+                add_alias(name, value)
+        for value in sorted(self.cities):
+            name = value.split(",")[0]
+            for other_name in [value, name] + CITY_ALIAS_GROUPS.get(normalize_name(name), []):
+                add_alias(other_name, value)
+        return aliases
+
+    @staticmethod
+    def cued_aliases(aliases: dict) -> List[str]:
+        """
+        Return the aliases that are everyday words or facility keywords, sorted.
+        """
+        # hotel_metadata imports normalize_name from this module
+        from hotel_metadata import FACILITY_KEYWORDS
+        words = COMMON_WORDS | {word for phrases in FACILITY_KEYWORDS.values()
+                                for phrase in phrases for word in phrase.split()}
+        return sorted(alias for alias in aliases if all(word in words for word in alias.split()))
+
+    def save(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(self.path + ".tmp", "w", encoding="utf-8") as f:
+            aliases = self.aliases()
+            json.dump({"countries": self.countries, "cities": self.cities, "aliases": aliases,
+                       "cued_aliases": self.cued_aliases(aliases)}, f, ensure_ascii=False)
+        os.replace(self.path + ".tmp", self.path)
@@ -0,0 +1,85 @@
+import unittest
+import json
+import os
+import tempfile
+from gazetteer import GazetteerBuilder, normalize_name
+from model import Hotel, HotelBatch
+
+
+def hotel_batch(first_id: int, locations: list) -> HotelBatch:
+    columns = {field: ["Unknown"] * len(locations) for field in HotelBatch.FIELDS}
+    columns["country_code"] = [location[0] for location in locations]
+    columns["country_name"] = [location[1] for location in locations]
+    columns["city_name"] = [location[2] for location in locations]
+    return HotelBatch(list(range(first_id, first_id + len(locations))), columns)
+
+
+class TestGazetteerBuilder(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "indexes", "gazetteer.json")
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def load_aliases(self) -> dict:
+        with open(self.path, encoding="utf-8") as f:
+            return json.load(f)["aliases"]
+
+    def test_aliases_of_countries_and_cities(self):
+        builder = GazetteerBuilder(self.path)
+        builder.add(hotel_batch(1, [("AL", "Albania", "Tiranë"),
+                                    ("US", "United States", "New York,   New York"),
+                                    ("IT", "Italy", "Unknown")]))
+        builder.save()
+
+        aliases = self.load_aliases()
+        self.assertEqual(["Albania"], aliases["albanien"])
+        self.assertEqual(["Albania"], aliases["shqiperia"])
+        self.assertEqual(["Tiranë"], aliases["tirana"])
+        self.assertEqual(["New York,   New York"], aliases["new york"])
+        self.assertEqual(["Italy"], aliases["italien"])
+        self.assertNotIn("unknown", aliases)
+
+    def test_hotel_lists_are_added_like_batches(self):
+        hotel = Hotel(1)
+        hotel.country_code, hotel.country_name, hotel.city_name = "DE", "Germany", "München"
+        builder = GazetteerBuilder(self.path)
+        builder.add([hotel])
+        builder.save()
+
+        self.assertEqual(["München"], self.load_aliases()["munich"])
+
+    def test_saved_gazetteer_is_extended_by_the_next_run(self):
+        builder = GazetteerBuilder(self.path)
+        builder.add(hotel_batch(1, [("AL", "Albania", "Durres")]))
+        builder.save()
+
+        builder = GazetteerBuilder(self.path)
+        builder.add(hotel_batch(2, [("AL", "Albania", "Durres"), ("GR", "Greece", "Athens")]))
+        builder.save()
+
+        aliases = self.load_aliases()
+        self.assertEqual(["Durres"], aliases["durres"])
+        self.assertEqual(["Athens"], aliases["athen"])
+        self.assertEqual(["Albania"], aliases["albania"])
+
+    def test_city_names_that_are_everyday_words_are_cued(self):
+        builder = GazetteerBuilder(self.path)
+        builder.add(hotel_batch(1, [("BE", "Belgium", "Spa"), ("GB", "United Kingdom", "Bath"),
+                                    ("HR", "Croatia", "Split"), ("FR", "France", "Nice"),
+                                    ("IS", "Iceland", "Reykjavik")]))
+        builder.save()
+
+        with open(self.path, encoding="utf-8") as f:
+            gazetteer = json.load(f)
+        self.assertEqual(["bath", "island", "nice", "spa", "split"], gazetteer["cued_aliases"])
+        self.assertEqual(["Spa"], gazetteer["aliases"]["spa"])
+
+    def test_normalize_name(self):
+        self.assertEqual("tirane shqiperia", normalize_name(" Tiranë, Shqipëria!"))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,101 @@
+import os
+import numpy as np
+from typing import List
+from attraction_extractor import parse_entries
+from gazetteer import normalize_name
+from hotel_metadata import coordinates
+from index_builder import IndexBuilder, hotel_columns
+from model import Hotel, HotelBatch
+
+# Side length of the cells of the grid in degrees (about 11 km of latitude)
+CELL_DEGREES = 0.1
+LONGITUDE_CELLS = int(round(360 / CELL_DEGREES))
+
+# An attraction is located at the hotel closest to it, so only attractions at most this far
+# from a hotel are located
+MAX_ATTRACTION_DISTANCE_KM = 2.0
+
+
+def cell_keys(latitudes: np.ndarray, longitudes: np.ndarray) -> np.ndarray:
+    """
+    Return the grid cell of each position, numbered row by row from (-90, -180).
+    """
+    latitude_cells = np.floor((np.asarray(latitudes) + 90) / CELL_DEGREES).astype(np.int64)
+    longitude_cells = np.floor((np.asarray(longitudes) + 180) / CELL_DEGREES).astype(np.int64)
+    return latitude_cells * LONGITUDE_CELLS + np.minimum(longitude_cells, LONGITUDE_CELLS - 1)
+
+
+class GeoIndexBuilder(IndexBuilder):
+    """
+    Collects the positions of all hotels (from their Map value) into a grid index for radius and
+    k-nearest queries, and locates the attractions of the hotels for "near X" queries.
+    Hotels are stored sorted by grid cell, so the hotels of a row of adjacent cells are one slice.
+    An attraction is placed at the position of the hotel closest to it (per attraction name and city),
+    which is at most MAX_ATTRACTION_DISTANCE_KM off.
+    The index is a single npz file; the attraction names and cities are stored as newline-joined UTF-8.
+    """
+
+    FIELDS = ["city_name", "map_coordinates", "attractions"]
+
+    def __init__(self, path: str):
+        super().__init__(path)
+        # hotel id -> (latitude, longitude)
+        self.positions = {}
+        # (normalized attraction name, city name) -> (distance km, latitude, longitude)
+        self.attractions = {}
+        if os.path.exists(path):
+            with np.load(path) as index:
+                self.positions = dict(zip(index["ids"].tolist(), zip(
+                    index["latitudes"].tolist(), index["longitudes"].tolist())))
+                names = self.decode(index["attraction_names"])
+                cities = self.decode(index["attraction_cities"])
+                self.attractions = dict(zip(zip(names, cities), zip(
+                    index["attraction_distances"].tolist(), index["attraction_latitudes"].tolist(),
+                    index["attraction_longitudes"].tolist())))
+
+    def add(self, data: List[Hotel] | HotelBatch):
+        ids, (city_names, map_coordinates, attractions) = hotel_columns(
+            data, self.FIELDS)
+        for id, city_name, map_value, attractions_value in zip(ids, city_names, map_coordinates, attractions):
+            position = coordinates(map_value)
+            if position is None:
+                continue
+            self.positions[int(id)] = position
+
+            entries, _ = parse_entries(attractions_value)
+            for name, km_distance, _ in entries:
+                distance = float(km_distance)
+                key = (normalize_name(name), city_name)
+                if distance <= MAX_ATTRACTION_DISTANCE_KM and key[0] and \
+                        distance < self.attractions.get(key, (np.inf,))[0]:
+                    self.attractions[key] = (distance, *position)
+
+    def save(self):
+        ids = np.fromiter(self.positions, dtype=np.int64, count=len(self.positions))
+        positions = np.array(list(self.positions.values()), dtype=np.float64).reshape(-1, 2)
+        keys = cell_keys(positions[:, 0], positions[:, 1])
+        order = np.argsort(keys, kind="stable")
+
+        attraction_keys = list(self.attractions)
+        attraction_values = np.array(list(self.attractions.values()), dtype=np.float64).reshape(-1, 3)
+
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(self.path + ".tmp", "wb") as f:
+            np.savez(f, cell_degrees=CELL_DEGREES, ids=ids[order], cell_keys=keys[order],
+                     latitudes=positions[order, 0], longitudes=positions[order, 1],
+                     attraction_names=self.encode([name for name, _ in attraction_keys]),
+                     attraction_cities=self.encode([city for _, city in attraction_keys]),
+                     attraction_distances=attraction_values[:, 0],
+                     attraction_latitudes=attraction_values[:, 1],
+                     attraction_longitudes=attraction_values[:, 2])
+        os.replace(self.path + ".tmp", self.path)
+
+    @staticmethod
+    def encode(strings: List[str]) -> np.ndarray:
+        return np.frombuffer("\n".join(strings).encode("utf-8"), dtype=np.uint8)
+
+    @staticmethod
+    def decode(encoded: np.ndarray) -> List[str]:
+        return encoded.tobytes().decode("utf-8").split("\n") if len(encoded) else []
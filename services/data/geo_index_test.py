@@ -0,0 +1,67 @@
+import unittest
+import os
+import tempfile
+import numpy as np
+from geo_index import GeoIndexBuilder, cell_keys
+from model import HotelBatch
+
+ATTRACTIONS = "Distances are displayed to the nearest 0.1 mile and kilometer. <br /> <p>{}</p>"
+
+
+def hotel_batch(first_id: int, hotels: list) -> HotelBatch:
+    columns = {field: ["Unknown"] * len(hotels) for field in HotelBatch.FIELDS}
+    columns["city_name"] = [hotel[0] for hotel in hotels]
+    columns["map_coordinates"] = [hotel[1] for hotel in hotels]
+    columns["attractions"] = [ATTRACTIONS.format(hotel[2]) for hotel in hotels]
+    return HotelBatch(list(range(first_id, first_id + len(hotels))), columns)
+
+
+class TestGeoIndexBuilder(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "indexes", "geo_index.npz")
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_hotels_are_stored_sorted_by_cell(self):
+        builder = GeoIndexBuilder(self.path)
+        builder.add(hotel_batch(1, [("Rome", "41.9|12.5", ""), ("Tirana", "41.33|19.82", ""),
+                                    ("Unknown", "Unknown", ""), ("Rome", "41.91|12.49", "")]))
+        builder.save()
+
+        with np.load(self.path) as index:
+            self.assertEqual({1, 2, 4}, set(index["ids"].tolist()))
+            self.assertTrue((np.diff(index["cell_keys"]) >= 0).all())
+            np.testing.assert_array_equal(index["cell_keys"], cell_keys(
+                index["latitudes"], index["longitudes"]))
+
+    def test_attractions_are_located_at_the_closest_hotel(self):
+        builder = GeoIndexBuilder(self.path)
+        builder.add(hotel_batch(1, [
+            ("Tirana", "41.33|19.82", "Skanderbeg Square - 0.4 km / 0.2 mi <br /> Dajti Mountain - 9.1 km / 5.7 mi"),
+            ("Tirana", "41.32|19.81", "Skanderbeg Square - 0.1 km / 0.1 mi")]))
+        builder.save()
+
+        with np.load(self.path) as index:
+            self.assertEqual(["skanderbeg square"], GeoIndexBuilder.decode(index["attraction_names"]))
+            self.assertEqual(["Tirana"], GeoIndexBuilder.decode(index["attraction_cities"]))
+            self.assertEqual([41.32], index["attraction_latitudes"].tolist())
+
+    def test_saved_index_is_extended_by_the_next_run(self):
+        builder = GeoIndexBuilder(self.path)
+        builder.add(hotel_batch(1, [("Tirana", "41.33|19.82", "Skanderbeg Square - 0.4 km / 0.2 mi")]))
+        builder.save()
+
+        builder = GeoIndexBuilder(self.path)
+        builder.add(hotel_batch(2, [("Rome", "41.9|12.5", "Pantheon - 0.2 km / 0.1 mi")]))
+        builder.save()
+
+        builder = GeoIndexBuilder(self.path)
+        self.assertEqual({1: (41.33, 19.82), 2: (41.9, 12.5)}, builder.positions)
+        self.assertEqual({("skanderbeg square", "Tirana"), ("pantheon", "Rome")}, set(builder.attractions))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,88 @@
+import re
+from typing import List
+from attraction_extractor import parse_entries
+from gazetteer import normalize_name
+
+# Stars of the HotelRating values of the dataset ("All" and unknown ratings have 0 stars)
+STAR_RATINGS = {"OneStar": 1, "TwoStar": 2, "ThreeStar": 3, "FourStar": 4, "FiveStar": 5}
+
+# Facilities that prompts can ask for, with the phrases that indicate them in the normalized
+# HotelFacilities text (the backend matches prompts against a copy of them, see backend/data_tables_test.py)
+FACILITY_KEYWORDS = {
+    "wifi": ["wifi", "wi fi", "wireless internet", "internet access"],
+    "parking": ["parking"],
+    "pool": ["pool", "swimming"],
+    "spa": ["spa", "sauna", "massage", "hot tub", "jacuzzi"],
+    "gym": ["fitness", "gym"],
+    "restaurant": ["restaurant"],
+    "bar": ["bar", "bars", "lounge"],
+    "breakfast": ["breakfast"],
+    "airport_shuttle": ["airport shuttle", "airport transfer", "airport transportation"],
+    "accessible": ["wheelchair"],
+    "air_conditioning": ["air conditioning", "air conditioned"],
+    "beach": ["beach"],
+    "family": ["kids club", "childrens club", "playground", "babysitting", "family rooms"],
+    "laundry": ["laundry"],
+    "room_service": ["room service"],
+    "non_smoking": ["smoke free", "non smoking"],
+    "meeting_rooms": ["meeting room", "meeting rooms", "conference"],
+    "kitchen": ["kitchen", "kitchenette"],
+    "ev_charging": ["electric vehicle charging", "ev charging"],
+}
+
+# one alternation of all phrases, longest first, matching whole words only
+FACILITY_PATTERN = re.compile(r"\b(" + "|".join(sorted(
+    (re.escape(phrase) for phrases in FACILITY_KEYWORDS.values() for phrase in phrases), key=len, reverse=True)) + r")\b")
+FACILITY_OF_PHRASE = {phrase: facility for facility,
+                      phrases in FACILITY_KEYWORDS.items() for phrase in phrases}
+
+
+def star_rating(hotel_rating: str) -> int:
+    return STAR_RATINGS.get(hotel_rating, 0)
+
+
+def facility_tags(hotel_facilities: str) -> List[str]:
+    """
+    Return the facilities of FACILITY_KEYWORDS mentioned in a HotelFacilities text, sorted.
+    """
+    phrases = set(FACILITY_PATTERN.findall(normalize_name(hotel_facilities)))
+    return sorted({FACILITY_OF_PHRASE[phrase] for phrase in phrases})
+
+
+def coordinates(map_coordinates: str) -> tuple:
+    """
+    Split a Map value ("latitude|longitude") into floats, or return None if it is not a valid position.
+    """
+    parts = map_coordinates.split("|")
+    if len(parts) != 2:
+        return None
+    try:
+        latitude, longitude = float(parts[0]), float(parts[1])
+    except ValueError:
+        return None
+    if not (-90 <= latitude <= 90 and -180 <= longitude <= 180) or (latitude == 0 and longitude == 0):
+        return None
+    return latitude, longitude
+
+
+def filter_fields(hotel_dict: dict) -> dict:
+    """
+    Return the typed metadata fields derived from a hotel dictionary, which vector queries filter on
+    and the backend sorts by. They are stored next to the hotel fields but are not part of the
+    embedded text. Unknown numbers are left out, since Pinecone metadata cannot hold null values.
+    """
+    fields = {
+        "star_rating": star_rating(hotel_dict["hotel_rating"]),
+        "facilities": facility_tags(hotel_dict["hotel_facilities"]),
+    }
+    position = coordinates(hotel_dict["map_coordinates"])
+    if position is not None:
+        fields["latitude"], fields["longitude"] = position
+
+    entries, airport_entry = parse_entries(hotel_dict["attractions"])
+    fields["attraction_count"] = len(entries)
+    if entries:
+        fields["nearest_attraction_km"] = min(float(km_distance) for _, km_distance, _ in entries)
+    if airport_entry:
+        fields["airport_km"] = float(airport_entry[1])
+    return fields
@@ -0,0 +1,40 @@
+import unittest
+from hotel_metadata import coordinates, facility_tags, filter_fields, star_rating
+
+
+class TestHotelMetadata(unittest.TestCase):
+
+    def test_star_rating(self):
+        self.assertEqual(4, star_rating("FourStar"))
+        self.assertEqual(0, star_rating("All"))
+
+    def test_facility_tags(self):
+        facilities = "Free WiFi, Outdoor swimming pool, Number of bars/lounges - 2, Barbecue grill(s), Spa tub"
+        self.assertEqual(["bar", "pool", "spa", "wifi"], facility_tags(facilities))
+        self.assertEqual([], facility_tags("Unknown"))
+
+    def test_coordinates(self):
+        self.assertEqual((41.32755, 19.81887), coordinates("41.32755|19.81887"))
+        self.assertIsNone(coordinates("Unknown"))
+        self.assertIsNone(coordinates("0|0"))
+        self.assertIsNone(coordinates("123.4|19.8"))
+
+    def test_filter_fields(self):
+        fields = filter_fields({
+            "hotel_rating": "FiveStar",
+            "hotel_facilities": "24-hour fitness facilities, Free self parking",
+            "map_coordinates": "41.32755|19.81887",
+            "attractions": "Distances are displayed to the nearest 0.1 mile and kilometer. <br /> <p>Skanderbeg Square - 0.4 km / 0.2 mi <br /> "
+                           "Et'hem Bey Mosque - 0.3 km / 0.2 mi <br /> </p><p>The preferred airport for Hotel is Tirana Intl. Airport (TIA) - 17.6 km / 10.9 mi </p>",
+        })
+        self.assertEqual({"star_rating": 5, "facilities": ["gym", "parking"], "latitude": 41.32755, "longitude": 19.81887,
+                          "attraction_count": 2, "nearest_attraction_km": 0.3, "airport_km": 17.6}, fields)
+
+    def test_unknown_numbers_are_left_out(self):
+        fields = filter_fields({"hotel_rating": "All", "hotel_facilities": "Unknown",
+                                "map_coordinates": "Unknown", "attractions": "Unknown"})
+        self.assertEqual({"star_rating": 0, "facilities": [], "attraction_count": 0}, fields)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,37 @@
+from abc import ABC, abstractmethod
+from typing import List
+from model import Hotel, HotelBatch
+
+
+class IndexBuilder(ABC):
+    """
+    Abstract class for builders of search artifacts that the backend loads next to the vector index.
+    The data service adds every collected chunk (including chunks that are already stored),
+    so add must be idempotent, and saves the builders when it finishes.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+
+    @abstractmethod
+    def add(self, data: List[Hotel] | HotelBatch):
+        """
+        Add the hotels of a chunk to the index.
+        """
+        pass
+
+    @abstractmethod
+    def save(self):
+        """
+        Write the index to its path.
+        """
+        pass
+
+
+def hotel_columns(data: List[Hotel] | HotelBatch, fields: List[str]) -> tuple:
+    """
+    Return the ids and the values of the given fields of a chunk, one list per field.
+    """
+    if isinstance(data, HotelBatch):
+        return list(data.ids), [data.columns[field] for field in fields]
+    return [hotel.id for hotel in data], [[getattr(hotel, field) for hotel in data] for field in fields]
@@ -0,0 +1,136 @@
+import numpy as np
+from array import array
+from typing import List
+
+
+class MetadataIndex:
+    """
+    Inverted index of the metadata of a LocalNamespace for Pinecone-style metadata filters.
+    For every field used in a filter, each value maps to the rows that have it (elements of list
+    values are indexed one by one). A filter is evaluated to a boolean mask (bitmap) of the eligible
+    rows, so similarity only has to be computed for them.
+    The postings of a field are built on its first use and extended as rows are added.
+    For range operators the numeric values of a field are kept sorted with their rows concatenated
+    in the same order, so a range is two binary searches and one slice of rows (e.g. a latitude band).
+    Supported operators: $eq, $ne, $in, $nin, $gt, $gte, $lt, $lte, $exists, $and and $or.
+    """
+
+    RANGE_OPERATORS = {"$gt", "$gte", "$lt", "$lte"}
+
+    def __init__(self, metadata: List[dict]):
+        # the metadata list of the namespace, row i holds the metadata of row i
+        self.metadata = metadata
+        self.postings = {}
+        # field -> (sorted numeric values, their rows concatenated, start offset of each value's rows)
+        self.ranges = {}
+
+    def add(self, row: int, metadata: dict):
+        """
+        Index a row appended to the namespace.
+        """
+        for field, postings in self.postings.items():
+            self.index_value(postings, row, metadata.get(field))
+        self.ranges = {}
+
+    def reset(self):
+        """
+        Drop all postings, e.g. after the metadata of an existing row changed.
+        """
+        self.postings = {}
+        self.ranges = {}
+
+    def field_postings(self, field: str) -> dict:
+        if field not in self.postings:
+            postings = {}
+            for row, metadata in enumerate(self.metadata):
+                self.index_value(postings, row, metadata.get(field))
+            self.postings[field] = postings
+        return self.postings[field]
+
+    def field_ranges(self, field: str) -> tuple:
+        if field not in self.ranges:
+            postings = self.field_postings(field)
+            values = sorted(value for value in postings if isinstance(
+                value, (int, float)) and not isinstance(value, bool))
+            rows = [postings[value] for value in values]
+            offsets = np.zeros(len(values) + 1, dtype=np.int64)
+            np.cumsum([len(value_rows) for value_rows in rows], out=offsets[1:])
+            self.ranges[field] = (np.array(values, dtype=np.float64),
+                                  np.concatenate([np.array(value_rows, dtype=np.int64) for value_rows in rows])
+                                  if rows else np.empty(0, dtype=np.int64), offsets)
+        return self.ranges[field]
+
+    @staticmethod
+    def index_value(postings: dict, row: int, value):
+        if value is None:
+            return
+        for element in value if isinstance(value, list) else [value]:
+            postings.setdefault(element, array("q")).append(row)
+
+    def mask(self, filter: dict, size: int) -> np.ndarray:
+        """
+        Return a boolean mask of the first size rows that match the filter.
+        """
+        mask = np.ones(size, dtype=bool)
+        for key, condition in filter.items():
+            if key == "$and":
+                for sub_filter in condition:
+                    mask &= self.mask(sub_filter, size)
+            elif key == "$or":
+                any_mask = np.zeros(size, dtype=bool)
+                for sub_filter in condition:
+                    any_mask |= self.mask(sub_filter, size)
+                mask &= any_mask
+            else:
+                mask &= self.field_mask(key, condition, size)
+        return mask
+
+    def field_mask(self, field: str, condition, size: int) -> np.ndarray:
+        if not isinstance(condition, dict):
+            condition = {"$eq": condition}
+        postings = self.field_postings(field)
+        mask = np.ones(size, dtype=bool)
+        for operator, operand in condition.items():
+            if operator == "$eq":
+                mask &= self.rows_mask(postings, [operand], size)
+            elif operator == "$ne":
+                mask &= ~self.rows_mask(postings, [operand], size)
+            elif operator == "$in":
+                mask &= self.rows_mask(postings, operand, size)
+            elif operator == "$nin":
+                mask &= ~self.rows_mask(postings, operand, size)
+            elif operator in self.RANGE_OPERATORS:
+                mask &= self.range_mask(field, operator, operand, size)
+            elif operator == "$exists":
+                exists = self.rows_mask(postings, list(postings), size)
+                mask &= exists if operand else ~exists
+            else:
+                raise ValueError(f"Unsupported filter operator: {operator}")
+        return mask
+
+    def range_mask(self, field: str, operator: str, operand: float, size: int) -> np.ndarray:
+        values, rows, offsets = self.field_ranges(field)
+        start, end = 0, len(values)
+        if operator == "$gt":
+            start = np.searchsorted(values, operand, side="right")
+        elif operator == "$gte":
+            start = np.searchsorted(values, operand, side="left")
+        elif operator == "$lt":
+            end = np.searchsorted(values, operand, side="left")
+        else:
+            end = np.searchsorted(values, operand, side="right")
+        mask = np.zeros(size, dtype=bool)
+        if start < end:
+            selected = rows[offsets[start]:offsets[end]]
+            mask[selected[selected < size]] = True
+        return mask
+
+    @staticmethod
+    def rows_mask(postings: dict, values: list, size: int) -> np.ndarray:
+        mask = np.zeros(size, dtype=bool)
+        for value in values:
+            rows = postings.get(value)
+            if rows:
+                rows = np.array(rows, dtype=np.int64)
+                mask[rows[rows < size]] = True
+        return mask
@@ -0,0 +1,57 @@
+import unittest
+import numpy as np
+from metadata_index import MetadataIndex
+
+
+class TestMetadataIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.metadata = [
+            {"city_name": "Rome", "star_rating": 3, "facilities": ["wifi", "pool"]},
+            {"city_name": "Milan", "star_rating": 5, "facilities": ["spa"]},
+            {"city_name": "Rome", "star_rating": 4, "facilities": []},
+            {"city_name": "Venice"},
+        ]
+        self.index = MetadataIndex(self.metadata)
+
+    def rows(self, filter: dict) -> list:
+        return np.flatnonzero(self.index.mask(filter, len(self.metadata))).tolist()
+
+    def test_equality_and_membership(self):
+        self.assertEqual([0, 2], self.rows({"city_name": "Rome"}))
+        self.assertEqual([1, 3], self.rows({"city_name": {"$ne": "Rome"}}))
+        self.assertEqual([1, 3], self.rows(
+            {"city_name": {"$in": ["Milan", "Venice"]}}))
+        self.assertEqual([0, 2], self.rows(
+            {"city_name": {"$nin": ["Milan", "Venice"]}}))
+
+    def test_list_values_match_any_element(self):
+        self.assertEqual([0], self.rows({"facilities": {"$in": ["pool"]}}))
+        self.assertEqual([0, 1], self.rows(
+            {"facilities": {"$in": ["pool", "spa"]}}))
+
+    def test_range_and_logical_operators(self):
+        self.assertEqual([1, 2], self.rows({"star_rating": {"$gte": 4}}))
+        self.assertEqual([0, 2], self.rows(
+            {"star_rating": {"$gt": 2, "$lt": 5}}))
+        self.assertEqual([2], self.rows({"$and": [
+            {"city_name": "Rome"}, {"star_rating": {"$gte": 4}}]}))
+        self.assertEqual([1, 2, 3], self.rows({"$or": [
+            {"city_name": "Venice"}, {"star_rating": {"$gte": 4}}]}))
+        self.assertEqual([3], self.rows({"star_rating": {"$exists": False}}))
+
+    def test_added_rows_are_indexed(self):
+        self.assertEqual([0, 2], self.rows({"city_name": "Rome"}))
+
+        self.metadata.append({"city_name": "Rome"})
+        self.index.add(4, self.metadata[4])
+
+        self.assertEqual([0, 2, 4], self.rows({"city_name": "Rome"}))
+
+    def test_unsupported_operator(self):
+        with self.assertRaises(ValueError):
+            self.rows({"city_name": {"$regex": "Ro.*"}})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,4 +1,20 @@
+from array import array
+from typing import Dict, List
+
+# fields whose values repeat across many hotels; the collector interns their strings to store them only once
+INTERNED_FIELDS = {"country_code", "country_name",
+                   "city_code", "city_name", "hotel_rating"}
+
+
 class Hotel:
+    """
+    A hotel of the dataset. Instances have no __dict__, and the dictionary returned by
+    to_dict is cached, so the fields must be set before to_dict is called.
+    """
+
+    __slots__ = ("id", "country_code", "country_name", "city_code", "city_name", "hotel_code", "hotel_name", "hotel_rating", "address",
+                 "attractions", "description", "fax_number", "hotel_facilities", "map_coordinates", "phone_number", "pin_code", "hotel_website_url", "_dict")
+
     id: int
     country_code: str
     country_name: str
@@ -35,6 +51,7 @@ class Hotel:
         self.phone_number = ""
         self.pin_code = ""
         self.hotel_website_url = ""
+        self._dict = None
 
     def __str__(self):
         return f"Hotel '{self.hotel_name}' (ID: '{self.id})'"
@@ -43,6 +60,15 @@ class Hotel:
         return f"Hotel '{self.hotel_name}' (ID: '{self.id})'"
 
     def to_dict(self) -> dict:
+        """
+        Return the fields of the hotel (without the ID). The returned dictionary is created on the
+        first call and shared between calls, so it must not be modified.
+        """
+        if self._dict is None:
+            self._dict = self.create_dict()
+        return self._dict
+
+    def create_dict(self) -> dict:
         return {
             "country_code": self.country_code,
             "country_name": self.country_name,
@@ -61,3 +87,69 @@ class Hotel:
             "pin_code": self.pin_code,
             "hotel_website_url": self.hotel_website_url
         }
+
+
+class HotelBatch:
+    """
+    Columnar batch of hotels with one list of values per Hotel field.
+    Collectors can yield a HotelBatch instead of a list of Hotel objects; it can be consumed
+    directly by the embedding creators. Indexing or iterating creates Hotel objects on demand.
+    IDs are stored in a compact array and the dictionaries returned by to_dicts are cached.
+    If the collector parses attractions, attraction_table and airport_table hold the structured
+    arrays returned by attraction_extractor.extract_attractions_batch, indexed by position in the batch.
+    """
+
+    __slots__ = ("ids", "columns", "attraction_table", "airport_table", "_dicts")
+
+    FIELDS = ["country_code", "country_name", "city_code", "city_name", "hotel_code", "hotel_name", "hotel_rating", "address",
+              "attractions", "description", "fax_number", "hotel_facilities", "map_coordinates", "phone_number", "pin_code", "hotel_website_url"]
+
+    def __init__(self, ids: List[int], columns: Dict[str, List[str]]):
+        self.ids = array("q", ids)
+        self.columns = columns
+        self.attraction_table = None
+        self.airport_table = None
+        self._dicts = None
+
+    @classmethod
+    def concat(cls, batches: List["HotelBatch"]) -> "HotelBatch":
+        """
+        Return one batch of the hotels of the given batches, in order (without their attraction tables).
+        """
+        ids = array("q")
+        for batch in batches:
+            ids.extend(batch.ids)
+        merged = cls([], {field: [value for batch in batches for value in batch.columns[field]]
+                          for field in cls.FIELDS})
+        merged.ids = ids
+        return merged
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __getitem__(self, index: int) -> Hotel:
+        hotel = Hotel(self.ids[index])
+        for field in self.FIELDS:
+            setattr(hotel, field, self.columns[field][index])
+        return hotel
+
+    def __iter__(self):
+        for index in range(len(self.ids)):
+            yield self[index]
+
+    def __str__(self):
+        return f"HotelBatch({len(self)} hotels, IDs: {self.ids[0] if self.ids else '-'}..{self.ids[-1] if self.ids else '-'})"
+
+    def __repr__(self):
+        return str(self)
+
+    def to_dicts(self) -> List[dict]:
+        """
+        Return the same dictionaries as calling Hotel.to_dict on every hotel of the batch.
+        The list is cached and shared between calls, so it must not be modified.
+        """
+        if self._dicts is None:
+            columns = [self.columns[field] for field in self.FIELDS]
+            self._dicts = [dict(zip(self.FIELDS, values))
+                           for values in zip(*columns)]
+        return self._dicts
@@ -0,0 +1,50 @@
+import unittest
+import pickle
+from model import Hotel, HotelBatch
+
+
+class TestHotel(unittest.TestCase):
+
+    def test_hotel_has_no_instance_dict(self):
+        self.assertFalse(hasattr(Hotel(1), "__dict__"))
+
+    def test_to_dict_is_cached(self):
+        hotel = Hotel(1)
+        hotel.hotel_name = "A"
+        first = hotel.to_dict()
+
+        self.assertEqual("A", first["hotel_name"])
+        self.assertIs(first, hotel.to_dict())
+
+    def test_hotel_can_be_pickled(self):
+        hotel = Hotel(1)
+        hotel.city_name = "Berlin"
+
+        self.assertEqual(hotel.to_dict(), pickle.loads(
+            pickle.dumps(hotel)).to_dict())
+
+
+class TestHotelBatch(unittest.TestCase):
+
+    def test_batch_equals_hotels(self):
+        columns = {field: [f"{field} 1", f"{field} 2"]
+                   for field in HotelBatch.FIELDS}
+        batch = HotelBatch([7, 8], columns)
+
+        self.assertEqual(8, batch[1].id)
+        self.assertEqual([hotel.to_dict() for hotel in batch], batch.to_dicts())
+        self.assertIs(batch.to_dicts(), batch.to_dicts())
+        self.assertIs(batch.columns["city_name"][0], batch[0].city_name)
+
+    def test_batches_are_concatenated_in_order(self):
+        first = HotelBatch([1, 2], {field: ["a", "b"] for field in HotelBatch.FIELDS})
+        second = HotelBatch([3], {field: ["c"] for field in HotelBatch.FIELDS})
+
+        batch = HotelBatch.concat([first, second])
+
+        self.assertEqual([1, 2, 3], list(batch.ids))
+        self.assertEqual(first.to_dicts() + second.to_dicts(), batch.to_dicts())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,189 @@
+import json
+import os
+import queue
+import threading
+import time
+from collections import deque
+from typing import Callable, Dict
+import numpy as np
+
+
+class StageStats:
+    """
+    Rows, chunks and busy time of one ingestion stage, with the latencies of its last chunks.
+    """
+
+    def __init__(self, window: int):
+        self.rows = 0
+        self.chunks = 0
+        self.seconds = 0.0
+        self.latencies = deque(maxlen=window)
+
+    def add(self, rows: int, seconds: float):
+        self.rows += rows
+        self.chunks += 1
+        self.seconds += seconds
+        self.latencies.append(seconds)
+
+    def snapshot(self, elapsed: float) -> dict:
+        snapshot = {
+            "rows": self.rows,
+            "chunks": self.chunks,
+            # rows per second of wall time (of all workers of the stage together)
+            "rows_per_second": round(self.rows / elapsed, 1) if elapsed > 0 else None,
+            # rows per second while a worker was busy with the stage
+            "busy_rows_per_second": round(self.rows / self.seconds, 1) if self.seconds > 0 else None,
+        }
+        if self.latencies:
+            p50, p95, p99 = np.percentile(np.fromiter(self.latencies, dtype=np.float64), [50, 95, 99])
+            snapshot.update(p50_ms=round(p50 * 1000, 1), p95_ms=round(p95 * 1000, 1), p99_ms=round(p99 * 1000, 1))
+        return snapshot
+
+
+class IngestionTelemetry:
+    """
+    Progress telemetry of an ingestion run: rows per second and chunk latency percentiles per stage
+    (e.g. parse, embed, upsert), the depths of the pipeline queues, the overall rate and the ETA.
+    Every report_interval seconds a progress line is printed and, if log_path is given, a JSON object
+    per progress report and per chunk is appended to the log (one per line). In quiet mode only the
+    summary of the run is printed, the JSON log is written anyway.
+    The stages are recorded by several pipeline workers at once.
+    """
+
+    def __init__(self, total_rows: int = None, log_path: str = None, quiet: bool = False, report_interval: float = 10.0, latency_window: int = 1000, sources: Dict[str, Callable[[], dict]] = None):
+        # rows the run processes, or None if unknown (no ETA then)
+        self.total_rows = total_rows
+        self.log_path = log_path
+        self.quiet = quiet
+        self.report_interval = report_interval
+        self.latency_window = latency_window
+        # name -> function returning statistics of a component, e.g. the retries of the embedding requests
+        self.sources = sources or {}
+        self.queues = {}
+        self.lock = threading.Lock()
+        self.start()
+
+    def start(self):
+        """
+        Reset the statistics at the start of a run.
+        """
+        with self.lock:
+            self.started = time.monotonic()
+            self.last_report = self.started
+            self.stages = {}
+            self.rows_done = 0
+            self.rows_skipped = 0
+            self.queues.clear()
+
+    def watch_queue(self, name: str, watched: queue.Queue):
+        with self.lock:
+            self.queues[name] = watched
+
+    def log(self, message: str):
+        """
+        Print a message about a single chunk, unless in quiet mode.
+        """
+        if not self.quiet:
+            print(message)
+
+    def record(self, stage: str, rows: int, seconds: float, chunk: int = None):
+        """
+        Record that a stage processed a chunk of rows in the given number of seconds.
+        """
+        with self.lock:
+            stats = self.stages.get(stage)
+            if stats is None:
+                stats = self.stages[stage] = StageStats(self.latency_window)
+            stats.add(rows, seconds)
+        self.write({"event": "chunk", "time": time.time(), "stage": stage, "chunk": chunk, "rows": rows,
+                    "seconds": round(seconds, 4)})
+        self.report_if_due()
+
+    def complete(self, rows: int):
+        """
+        Record that rows are done, i.e. stored.
+        """
+        with self.lock:
+            self.rows_done += rows
+        self.report_if_due()
+
+    def skip(self, rows: int):
+        """
+        Record that rows are skipped as already stored: they are no longer remaining, but do not count
+        towards the throughput.
+        """
+        with self.lock:
+            self.rows_skipped += rows
+        self.report_if_due()
+
+    def snapshot(self) -> dict:
+        with self.lock:
+            elapsed = time.monotonic() - self.started
+            rows_per_second = self.rows_done / elapsed if elapsed > 0 else 0
+            eta = None
+            if self.total_rows and rows_per_second > 0:
+                eta = max(self.total_rows - self.rows_done - self.rows_skipped, 0) / rows_per_second
+            snapshot = {
+                "elapsed_seconds": round(elapsed, 1),
+                "rows_done": self.rows_done,
+                "rows_skipped": self.rows_skipped,
+                "total_rows": self.total_rows,
+                "rows_per_second": round(rows_per_second, 1),
+                "eta_seconds": round(eta, 1) if eta is not None else None,
+                "stages": {stage: stats.snapshot(elapsed) for stage, stats in self.stages.items()},
+                "queues": {name: watched.qsize() for name, watched in self.queues.items()},
+            }
+        for name, source in self.sources.items():
+            snapshot[name] = source()
+        return snapshot
+
+    def report_if_due(self):
+        now = time.monotonic()
+        with self.lock:
+            if now - self.last_report < self.report_interval:
+                return
+            self.last_report = now
+        self.report("progress")
+
+    def report(self, event: str = "progress") -> dict:
+        """
+        Print a progress line (or the summary of the run) and append the snapshot to the JSON log.
+        """
+        snapshot = self.snapshot()
+        self.write({"event": event, "time": time.time(), **snapshot})
+        if not self.quiet or event == "summary":
+            print(self.format(snapshot, event))
+        return snapshot
+
+    def finish(self) -> dict:
+        return self.report("summary")
+
+    @staticmethod
+    def format(snapshot: dict, event: str = "progress") -> str:
+        finished = snapshot["rows_done"] + snapshot["rows_skipped"]
+        progress = f"{finished}"
+        if snapshot["total_rows"]:
+            progress += f"/{snapshot['total_rows']} ({100 * finished / snapshot['total_rows']:.1f}%)"
+        line = f"[{event}] {progress} rows, {snapshot['rows_per_second']} rows/s"
+        if snapshot["rows_skipped"]:
+            line += f" ({snapshot['rows_skipped']} skipped as stored)"
+        if snapshot["eta_seconds"] is not None:
+            line += f", ETA {snapshot['eta_seconds'] / 60:.1f} min"
+        for stage, stats in snapshot["stages"].items():
+            line += f" | {stage} {stats['rows_per_second']} rows/s"
+            if "p95_ms" in stats:
+                line += f" p50 {stats['p50_ms']} ms p95 {stats['p95_ms']} ms"
+        if snapshot["queues"]:
+            line += " | queues " + " ".join(f"{name}={depth}" for name, depth in snapshot["queues"].items())
+        return line
+
+    def write(self, entry: dict):
+        if self.log_path is None:
+            return
+        directory = os.path.dirname(self.log_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        line = json.dumps(entry, default=str) + "\n"
+        with self.lock:
+            with open(self.log_path, "a", encoding="utf-8") as f:
+                f.write(line)
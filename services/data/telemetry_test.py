@@ -0,0 +1,90 @@
+import unittest
+import io
+import json
+import os
+import queue
+import tempfile
+from contextlib import redirect_stdout
+from unittest import mock
+from telemetry import IngestionTelemetry
+
+
+class TestIngestionTelemetry(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.log_path = os.path.join(self.directory.name, "logs", "telemetry.jsonl")
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_snapshot_reports_rates_latencies_and_eta(self):
+        with mock.patch("telemetry.time.monotonic", return_value=100.0):
+            telemetry = IngestionTelemetry(total_rows=1000, report_interval=float("inf"))
+        for seconds in [0.1, 0.2, 0.3, 0.4]:
+            telemetry.record("embed", 50, seconds)
+        telemetry.complete(200)
+        pending = queue.Queue()
+        pending.put(1)
+        telemetry.watch_queue("store", pending)
+
+        with mock.patch("telemetry.time.monotonic", return_value=110.0):
+            snapshot = telemetry.snapshot()
+
+        self.assertEqual(20.0, snapshot["rows_per_second"])
+        self.assertEqual(40.0, snapshot["eta_seconds"])
+        embed = snapshot["stages"]["embed"]
+        self.assertEqual((200, 4, 20.0, 200.0), (embed["rows"], embed["chunks"],
+                                                 embed["rows_per_second"], embed["busy_rows_per_second"]))
+        self.assertEqual(250.0, embed["p50_ms"])
+        self.assertEqual({"store": 1}, snapshot["queues"])
+
+    def test_quiet_mode_prints_only_the_summary_and_logs_json(self):
+        telemetry = IngestionTelemetry(log_path=self.log_path, quiet=True, report_interval=0,
+                                       sources={"requests": lambda: {"retries": 2}})
+        output = io.StringIO()
+        with redirect_stdout(output):
+            telemetry.log("Processing chunk 1...")
+            telemetry.record("upsert", 10, 0.5, chunk=0)
+            telemetry.complete(10)
+            telemetry.finish()
+
+        self.assertEqual(1, len(output.getvalue().splitlines()))
+        self.assertTrue(output.getvalue().startswith("[summary] 10 rows"))
+        with open(self.log_path) as f:
+            entries = [json.loads(line) for line in f]
+        self.assertEqual({"event": "chunk", "stage": "upsert", "chunk": 0, "rows": 10, "seconds": 0.5},
+                         {key: value for key, value in entries[0].items() if key != "time"})
+        self.assertEqual("summary", entries[-1]["event"])
+        self.assertEqual(10, entries[-1]["rows_done"])
+        self.assertEqual({"retries": 2}, entries[-1]["requests"])
+
+    def test_skipped_rows_are_remaining_but_not_throughput(self):
+        with mock.patch("telemetry.time.monotonic", return_value=100.0):
+            telemetry = IngestionTelemetry(total_rows=1000, report_interval=float("inf"))
+        telemetry.skip(600)
+        telemetry.complete(100)
+
+        with mock.patch("telemetry.time.monotonic", return_value=110.0):
+            snapshot = telemetry.snapshot()
+
+        self.assertEqual(10.0, snapshot["rows_per_second"])
+        self.assertEqual(30.0, snapshot["eta_seconds"])
+        self.assertTrue(IngestionTelemetry.format(snapshot).startswith(
+            "[progress] 700/1000 (70.0%) rows, 10.0 rows/s (600 skipped as stored)"))
+
+    def test_start_resets_the_statistics(self):
+        telemetry = IngestionTelemetry(report_interval=float("inf"))
+        telemetry.record("parse", 10, 0.1)
+        telemetry.complete(10)
+
+        telemetry.start()
+
+        snapshot = telemetry.snapshot()
+        self.assertEqual(0, snapshot["rows_done"])
+        self.assertEqual({}, snapshot["stages"])
+        self.assertIsNone(snapshot["eta_seconds"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -69,20 +69,39 @@ def chat_interface(backend_url: str):
 
             ui.update()
 
-            response = await send_to_backend(user_input)
-            thinking_label.set_content(response or "Sorry, no response.")
+            # show the answer while it is generated
+            response = ""
+            async for text in send_to_backend(user_input):
+                response += text
+                thinking_label.set_content(response)
+            if not response:
+                thinking_label.set_content("Sorry, no response.")
             ui.run_javascript("window.scrollTo(0, document.body.scrollHeight)")
 
         async def send_to_backend(user_prompt):
+            # the read timeout applies to every chunk, not to the whole answer
+            stream_url = backend_url.rstrip("/") + "/stream"
             try:
                 async with httpx.AsyncClient() as client:
-                    response = await client.post(backend_url, json={"user_prompt": user_prompt}, timeout=(10, 30))
-                    if response.status_code == 200:
-                        return response.json().get("answer", "No response from backend.")
-                    else:
-                        return f"Error: HTTP {response.status_code} - {response.text}"
+                    async with client.stream("POST", stream_url, json={"user_prompt": user_prompt}, timeout=(10, 60)) as response:
+                        if response.status_code == 404:
+                            # backends without a stream endpoint answer with JSON
+                            yield await request_answer(client, user_prompt)
+                            return
+                        if response.status_code != 200:
+                            await response.aread()
+                            yield f"Error: HTTP {response.status_code} - {response.text}"
+                            return
+                        async for text in response.aiter_text():
+                            yield text
             except Exception as e:
-                return f"Error: {repr(e)}"
+                yield f"Error: {repr(e)}"
+
+        async def request_answer(client, user_prompt):
+            response = await client.post(backend_url, json={"user_prompt": user_prompt}, timeout=(10, 60))
+            if response.status_code == 200:
+                return response.json().get("answer", "No response from backend.")
+            return f"Error: HTTP {response.status_code} - {response.text}"
 
         with ui.row().classes(
             "w-full max-w-4xl px-4 py-2 rounded-t-xl items-center fixed bottom-0"
@@ -23,6 +23,31 @@ app.post("/mock/backend/getResponse", (req, res) => {
     }, delay);
 });
 
+app.post("/mock/backend/getResponse/stream", (req, res) => {
+    console.log(req);
+
+    // delay the first chunk by 0-5 seconds
+    const delay = Math.floor(Math.random() * 5) * 1000;
+
+    console.log(delay);
+
+    // stream one of the answers word by word as plain text, like the backend's /api/hotel/stream
+    const randomIndex = Math.floor(Math.random() * answersJson.length);
+    const words = answersJson[randomIndex].answer.split(/(?<= )/);
+    res.set({ "Content-Type": "text/plain; charset=utf-8", "X-Accel-Buffering": "no" });
+
+    let index = 0;
+    const sendWord = () => {
+        if (index >= words.length) {
+            res.end();
+            return;
+        }
+        res.write(words[index++]);
+        setTimeout(sendWord, 50);
+    };
+    setTimeout(sendWord, delay);
+});
+
 const httpServer = http.createServer(app);
 const port = process.env.PORT ?? 8080;
 